@@ -1,7 +1,9 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
-from db import init_db
+import metrics
+import warmup
+from db import db_connection, pool_stats
 
 # Import blueprints
 from auth import auth_bp
@@ -20,8 +22,36 @@ app = Flask(__name__)
 
 CORS(app)  # Enables CORS for all routes
 
-# Initialize database
-init_db()
+# Request latency histograms, /metrics and optional Server-Timing headers
+metrics.init_app(app)
+
+# The schema is migrated at deploy time: python migrations.py upgrade
+
+
+# Load the model and indexes (see warmup.py for APP_WARMUP modes)
+warmup.start()
+
+
+# Liveness: the process is up and serving requests
+@app.route("/healthz")
+def healthz():
+    return jsonify({"status": "ok"}), 200
+
+
+# Readiness: warm-up finished and the database answers
+@app.route("/readyz")
+def readyz():
+    checks = {"warmup": warmup.status()}
+    ready = warmup.is_ready()
+    try:
+        with db_connection(timeout=1) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        checks["database"] = {"state": "ready", "pool": pool_stats()}
+    except Exception as e:
+        checks["database"] = {"state": "failed", "error": str(e), "pool": pool_stats()}
+        ready = False
+    return jsonify({"ready": ready, "checks": checks}), 200 if ready else 503
 
 
 # Root endpoint
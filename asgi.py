@@ -0,0 +1,95 @@
+"""Async serving mode for the auth, pantry and others endpoints.
+
+Same routes and JSON responses as app.py, but on Quart with an asyncpg
+pool (async_db.py), so a worker keeps thousands of client connections
+open while it waits on Postgres instead of tying up one thread each.
+Prediction and recipe endpoints are CPU-bound and stay on the sync app.
+
+Run with an ASGI server (see requirements-async.txt):
+
+    hypercorn asgi:app --bind 0.0.0.0:$PORT
+
+Each worker process opens its own pool of up to DB_POOL_SIZE connections.
+Compare with the sync stack using benchmarks/bench_async_load.py.
+"""
+from quart import Quart, jsonify
+from dotenv import load_dotenv
+import async_db
+
+try:
+    from quart_cors import cors
+except ImportError:
+    cors = None
+
+from async_auth import auth_bp
+from async_pantry import pantry_bp
+from async_others import others_bp
+
+# Load environment variables
+load_dotenv()
+
+app = Quart(__name__)
+
+if cors is not None:
+    app = cors(app, allow_origin="*")  # Enables CORS for all routes
+
+
+@app.before_serving
+async def open_pool():
+    await async_db.open_pool()
+
+
+@app.after_serving
+async def close_pool():
+    await async_db.close_pool()
+
+
+# Liveness: the process is up and serving requests
+@app.route("/healthz")
+async def healthz():
+    return jsonify({"status": "ok"}), 200
+
+
+# Readiness: the database answers (there is nothing to warm up here)
+@app.route("/readyz")
+async def readyz():
+    try:
+        async with async_db.db_connection(timeout=1) as conn:
+            await conn.fetchval("SELECT 1")
+        return jsonify({"ready": True, "checks": {"database": {"state": "ready"}}}), 200
+    except Exception as e:
+        return jsonify({
+            "ready": False,
+            "checks": {"database": {"state": "failed", "error": str(e)}}
+        }), 503
+
+
+# Root endpoint
+@app.route("/")
+async def hello_world():
+    return (
+        jsonify(
+            {
+                "message": "Welcome to FridgePilot API",
+                "status": "healthy",
+                "version": "1.0.0",
+                "documentation": "/docs",  # For future API documentation
+                "endpoints": {
+                    "auth": "/auth",
+                    "pantry": "/pantry",
+                    "others": "/others",
+                },
+            }
+        ),
+        200,
+    )
+
+
+# Register blueprints with URL prefixes
+app.register_blueprint(auth_bp, url_prefix="/auth")
+app.register_blueprint(pantry_bp, url_prefix="/pantry")
+app.register_blueprint(others_bp, url_prefix="/others")
+
+# Run the app
+if __name__ == "__main__":
+    app.run(debug=True)
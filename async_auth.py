@@ -0,0 +1,110 @@
+from quart import Blueprint, request, jsonify
+from async_db import db_connection
+from passwords import (
+    HashingBusy,
+    busy_response,
+    hash_password_async,
+    stats as hashing_stats,
+    verify_password_async,
+)
+
+# Async twin of auth.py: same routes and responses, served by asgi.py
+auth_bp = Blueprint("auth", __name__)
+
+@auth_bp.route("/signup", methods=["POST"])
+async def signup():
+    """Handle user registration"""
+    try:
+        # Get and validate request data
+        data = await request.get_json()
+        if not data:
+            return jsonify({"message": "No data provided"}), 400
+
+        user_name = data.get("user_name", "").strip()
+        user_id = data.get("user_id", "").strip()
+        password = data.get("password", "").strip()
+
+        # Validate required fields
+        if not user_id or not password:
+            return jsonify({"message": "Missing required fields"}), 400
+
+        # Hash before borrowing a database connection
+        try:
+            password_hash = await hash_password_async(password)
+        except HashingBusy:
+            return busy_response()
+
+        async with db_connection() as conn:
+            try:
+                await conn.execute(
+                    "INSERT INTO users (user_name, user_id, password) VALUES ($1, $2, $3)",
+                    user_name, user_id, password_hash
+                )
+                return jsonify({"message": "User created successfully"}), 201
+            except Exception as e:
+                # Check if error is due to duplicate user_id
+                if "duplicate key" in str(e).lower():
+                    return jsonify({"message": "User already exists"}), 409
+                return jsonify({"message": "Database error", "error": str(e)}), 500
+
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+@auth_bp.route("/login", methods=["POST"])
+async def login():
+    """Handle user login"""
+    try:
+        # Get and validate request data
+        data = await request.get_json()
+        if not data:
+            return jsonify({"message": "No data provided"}), 400
+
+        user_id = data.get("user_id", "").strip()
+        password = data.get("password", "").strip()
+
+        # Validate required fields
+        if not user_id or not password:
+            return jsonify({"message": "Missing required fields"}), 400
+
+        # The connection is returned before hashing
+        async with db_connection() as conn:
+            stored_hash = await conn.fetchval(
+                "SELECT password FROM users WHERE user_id = $1", user_id
+            )
+
+        if not stored_hash:
+            return jsonify({"message": "Invalid credentials"}), 401
+
+        try:
+            valid, new_hash = await verify_password_async(stored_hash, password)
+        except HashingBusy:
+            return busy_response()
+        if not valid:
+            return jsonify({"message": "Invalid credentials"}), 401
+
+        if new_hash:
+            await _replace_hash(user_id, stored_hash, new_hash)
+
+        return jsonify({
+            "message": "Login successful",
+            "user_id": user_id
+        }), 200
+
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+@auth_bp.route("/hashing-stats", methods=["GET"])
+async def hash_stats():
+    """Endpoint exposing password hashing pool counters."""
+    return jsonify(hashing_stats()), 200
+
+async def _replace_hash(user_id, old_hash, new_hash):
+    """Store a rehashed password unless it changed since it was read."""
+    try:
+        async with db_connection() as conn:
+            await conn.execute(
+                "UPDATE users SET password = $1 WHERE user_id = $2 AND password = $3",
+                new_hash, user_id, old_hash
+            )
+    except Exception as e:
+        print(f"Could not rehash password for {user_id}: {e}")
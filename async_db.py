@@ -0,0 +1,68 @@
+"""asyncpg connection pool for the async serving mode (asgi.py).
+
+Uses the same settings as db.py: DATABASE_URL, or DB_NAME / DB_USER /
+DB_PASSWORD / DB_HOST / DB_PORT, and DB_POOL_SIZE / DB_POOL_TIMEOUT.
+Queries use asyncpg's $1, $2 ... placeholders; sql() converts the
+psycopg2-style queries shared with the sync views.
+"""
+import os
+import re
+from typing import Optional
+
+import asyncpg
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ASYNC_DB_POOL_MIN_SIZE = int(os.getenv("ASYNC_DB_POOL_MIN_SIZE", "1"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+_pool: Optional[asyncpg.Pool] = None
+
+_PLACEHOLDER_RE = re.compile(r"%s|%%")
+
+
+def sql(query: str) -> str:
+    """Turn psycopg2 %s placeholders into asyncpg's $1, $2, ..."""
+    counter = iter(range(1, query.count("%s") + 1))
+    return _PLACEHOLDER_RE.sub(
+        lambda m: "%" if m.group() == "%%" else f"${next(counter)}", query
+    )
+
+
+async def open_pool() -> asyncpg.Pool:
+    """Create this process's pool (call once the event loop is running)."""
+    global _pool
+    if _pool is None:
+        database_url = os.getenv("DATABASE_URL")
+        if database_url:
+            params = {"dsn": database_url}
+        else:
+            params = {
+                "database": os.getenv("DB_NAME"),
+                "user": os.getenv("DB_USER"),
+                "password": os.getenv("DB_PASSWORD"),
+                "host": os.getenv("DB_HOST"),
+                "port": os.getenv("DB_PORT"),
+            }
+        _pool = await asyncpg.create_pool(
+            min_size=min(ASYNC_DB_POOL_MIN_SIZE, DB_POOL_SIZE),
+            max_size=DB_POOL_SIZE,
+            **params
+        )
+    return _pool
+
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def db_connection(timeout: Optional[float] = None):
+    """Borrow a pooled connection: async with db_connection() as conn: ..."""
+    if _pool is None:
+        raise RuntimeError("async database pool is not open")
+    return _pool.acquire(timeout=DB_POOL_TIMEOUT if timeout is None else timeout)
@@ -0,0 +1,121 @@
+from quart import Blueprint, request, jsonify
+from async_db import db_connection
+from passwords import HashingBusy, busy_response, hash_password_async
+from recommendation_cache import invalidate_recommendations
+from typing import Dict, Any, Tuple
+
+# Async twin of others.py: same routes and responses, served by asgi.py
+others_bp = Blueprint("others", __name__)
+
+class _UserNotFound(Exception):
+    """Rolls back the delete-profile transaction when the user is missing."""
+
+@others_bp.route("/get-name", methods=["GET"])
+async def getname() -> Tuple[Dict[str, Any], int]:
+    """Get user's name by user_id.
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    try:
+        user_id = request.args.get("user_id")
+        if not user_id:
+            return jsonify({"message": "Missing user_id"}), 400
+
+        async with db_connection() as conn:
+            try:
+                row = await conn.fetchrow(
+                    "SELECT user_name FROM users WHERE user_id = $1", user_id
+                )
+
+                if row is None:
+                    return jsonify({"message": "User not found"}), 404
+
+                return jsonify({
+                    "message": "User name retrieved successfully",
+                    "name": row[0]
+                }), 200
+            except Exception as e:
+                return jsonify({"message": "Error fetching user", "error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+@others_bp.route("/update-profile", methods=["PUT"])
+async def update_profile() -> Tuple[Dict[str, Any], int]:
+    """Update user's profile information.
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    try:
+        user_id = request.args.get("user_id")
+        if not user_id:
+            return jsonify({"message": "Missing user_id"}), 400
+
+        data = await request.get_json()
+        if not data:
+            return jsonify({"message": "Missing request data"}), 400
+
+        # Build update query dynamically but safely
+        updates = []
+        params = []
+        if "name" in data and data["name"].strip():
+            params.append(data["name"].strip())
+            updates.append(f"user_name = ${len(params)}")
+        if "password" in data and data["password"].strip():
+            try:
+                params.append(await hash_password_async(data["password"].strip()))
+            except HashingBusy:
+                return busy_response()
+            updates.append(f"password = ${len(params)}")
+
+        if not updates:
+            return jsonify({"message": "No valid fields to update"}), 400
+
+        params.append(user_id)
+        async with db_connection() as conn:
+            try:
+                query = f"UPDATE users SET {', '.join(updates)} WHERE user_id = ${len(params)}"
+                status = await conn.execute(query, *params)
+
+                # Command tag, e.g. "UPDATE 1"
+                if status.split()[-1] == "0":
+                    return jsonify({"message": "User not found"}), 404
+
+                return jsonify({"message": "Profile updated successfully"}), 200
+            except Exception as e:
+                return jsonify({"message": "Failed to update profile", "error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+@others_bp.route("/delete-profile", methods=["DELETE"])
+async def delete_profile() -> Tuple[Dict[str, Any], int]:
+    """Delete user's profile and associated data.
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    try:
+        user_id = request.args.get("user_id")
+        if not user_id:
+            return jsonify({"message": "Missing user_id"}), 400
+
+        async with db_connection() as conn:
+            try:
+                async with conn.transaction():
+                    # Delete pantry items first (foreign key constraint)
+                    await conn.execute("DELETE FROM pantry_items WHERE user_id = $1", user_id)
+                    status = await conn.execute("DELETE FROM users WHERE user_id = $1", user_id)
+                    if status.split()[-1] == "0":
+                        raise _UserNotFound()
+            except _UserNotFound:
+                return jsonify({"message": "User not found"}), 404
+            except Exception as e:
+                return jsonify({"message": "Failed to delete profile", "error": str(e)}), 500
+
+        invalidate_recommendations(user_id)
+        return jsonify({
+            "message": "Profile and associated data deleted successfully"
+        }), 200
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
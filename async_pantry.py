@@ -0,0 +1,441 @@
+import asyncio
+from quart import Blueprint, json, request, jsonify, stream_with_context
+from async_db import db_connection, sql
+from recommendation_cache import invalidate_recommendations
+from expiry_fill import kept_source_sql, schedule as schedule_expiry_backfill
+from pantry import (
+    ITEM_COLUMNS,
+    PANTRY_EXPIRING_DAYS,
+    PANTRY_EXPIRING_MAX_DAYS,
+    PANTRY_PAGE_MAX,
+    PANTRY_STREAM_FETCH_SIZE,
+    WRITE_COLUMNS,
+    _bulk_items,
+    _bulk_response,
+    _encode_cursor,
+    _items_query,
+    _row_to_item,
+    _validate_items,
+    _with_expiry,
+    _write_response,
+)
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+# Async twin of pantry.py: same routes and responses, served by asgi.py.
+# Request parsing, validation and row shaping are shared with pantry.py.
+pantry_bp = Blueprint("pantry", __name__)
+
+# Bulk rows are sent as one array per column and expanded with unnest()
+_UNNEST_ROWS = """
+    SELECT * FROM unnest(
+        $1::text[], $2::text[], $3::text[], $4::float8[], $5::date[],
+        $6::text[], $7::text[], $8::date[], $9::text[], $10::text[]
+    )
+"""
+
+def _columns(rows: List[Tuple[int, tuple]]) -> List[list]:
+    """Transpose validated bulk rows into the unnest() column arrays."""
+    return [list(column) for column in zip(*(row for _, row in rows))]
+
+@pantry_bp.route("/add-item", methods=["POST"])
+async def add_item() -> tuple[Dict[str, Any], int]:
+    """Add a new item to user's pantry.
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    try:
+        # Validate request data
+        data = await request.get_json()
+        user_id = request.args.get("user_id")
+        if not user_id or not data or not data.get("item"):
+            return jsonify({"message": "Missing user_id or item data"}), 400
+
+        # asyncpg needs typed parameters, so parse the item like a bulk row
+        results, rows = _validate_items([data["item"]], user_id)
+        if not rows:
+            return jsonify({"message": "Error adding item", "error": results[0]["error"]}), 500
+        # Expiry prediction is CPU work; keep it off the event loop
+        row = (await asyncio.to_thread(_with_expiry, rows))[0][1]
+
+        async with db_connection() as conn:
+            try:
+                await conn.execute(
+                    f"""
+                    INSERT INTO pantry_items ({WRITE_COLUMNS})
+                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+                    """,
+                    *row
+                )
+                invalidate_recommendations(user_id)
+                schedule_expiry_backfill()
+                return jsonify(_write_response("Item added successfully", row)), 201
+            except Exception as e:
+                return jsonify({"message": "Error adding item", "error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+@pantry_bp.route("/update-item", methods=["PUT"])
+async def update_item() -> tuple[Dict[str, Any], int]:
+    """Update an existing pantry item.
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    try:
+        # Validate request data
+        data = await request.get_json()
+        user_id = request.args.get("user_id")
+        if not user_id or not data or not data.get("item"):
+            return jsonify({"message": "Missing user_id or item data"}), 400
+
+        results, rows = _validate_items([data["item"]], user_id)
+        if not rows:
+            return jsonify({"message": "Error updating item", "error": results[0]["error"]}), 500
+        row = (await asyncio.to_thread(_with_expiry, rows))[0][1]
+        item_id, _, name, quantity, expiry_date, category, unit, added_date, notes, source = row
+
+        async with db_connection() as conn:
+            try:
+                stored = await conn.fetchrow(
+                    f"""
+                    UPDATE pantry_items
+                    SET item_name=$1, quantity=$2, expiry_date=$3, category=$4,
+                        unit=$5, added_date=$6, notes=$7,
+                        expiry_source={kept_source_sql("pantry_items", "$3", "$8")}
+                    WHERE id=$9 AND user_id=$10
+                    RETURNING expiry_date, expiry_source
+                    """,
+                    name, quantity, expiry_date, category, unit, added_date,
+                    notes, source, item_id, user_id
+                )
+                if stored:
+                    row = row[:4] + (stored[0],) + row[5:9] + (stored[1],)
+                invalidate_recommendations(user_id)
+                schedule_expiry_backfill()
+                return jsonify(_write_response("Item updated successfully", row)), 200
+            except Exception as e:
+                return jsonify({"message": "Error updating item", "error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+@pantry_bp.route("/delete-item", methods=["DELETE"])
+async def delete_item() -> tuple[Dict[str, Any], int]:
+    """Delete a pantry item.
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    try:
+        user_id = request.args.get("user_id")
+        item_id = request.args.get("id")
+        if not user_id or not item_id:
+            return jsonify({"message": "Missing user_id or item id"}), 400
+
+        async with db_connection() as conn:
+            try:
+                await conn.execute(
+                    "DELETE FROM pantry_items WHERE id=$1 AND user_id=$2",
+                    item_id, user_id
+                )
+                invalidate_recommendations(user_id)
+                return jsonify({"message": "Item deleted successfully"}), 200
+            except Exception as e:
+                return jsonify({"message": "Error deleting item", "error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+@pantry_bp.route("/bulk-add", methods=["POST"])
+async def bulk_add() -> tuple[Dict[str, Any], int]:
+    """Add many items to a user's pantry in one statement.
+
+    Same body and results as pantry.bulk_add.
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    try:
+        data = await request.get_json(silent=True)
+        user_id = request.args.get("user_id")
+        items, error = _bulk_items(data, "items")
+        if not user_id or error:
+            return jsonify({"message": error or "Missing user_id"}), 400
+        upsert = bool(data.get("upsert"))
+
+        results, rows = _validate_items(items, user_id)
+        rows = await asyncio.to_thread(_with_expiry, rows)
+        if upsert:
+            conflict = f"""
+                ON CONFLICT (id) DO UPDATE SET
+                    item_name = EXCLUDED.item_name, quantity = EXCLUDED.quantity,
+                    expiry_date = EXCLUDED.expiry_date, category = EXCLUDED.category,
+                    unit = EXCLUDED.unit, added_date = EXCLUDED.added_date,
+                    notes = EXCLUDED.notes, expiry_source = {kept_source_sql(
+                        "pantry_items", "EXCLUDED.expiry_date", "EXCLUDED.expiry_source"
+                    )}
+                WHERE pantry_items.user_id = EXCLUDED.user_id
+            """
+        else:
+            conflict = "ON CONFLICT (id) DO NOTHING"
+
+        written = {}
+        if rows:
+            async with db_connection() as conn:
+                try:
+                    # xmax is 0 only for freshly inserted row versions
+                    returned = await conn.fetch(
+                        f"""
+                        INSERT INTO pantry_items ({WRITE_COLUMNS})
+                        {_UNNEST_ROWS}
+                        {conflict}
+                        RETURNING id, (xmax = 0)
+                        """,
+                        *_columns(rows)
+                    )
+                    written = {row[0]: row[1] for row in returned}
+                except Exception as e:
+                    return jsonify({"message": "Error adding items", "error": str(e)}), 500
+        invalidate_recommendations(user_id)
+        schedule_expiry_backfill()
+
+        reason = "id belongs to another user" if upsert else "id already exists"
+        for index, row in rows:
+            item_id = row[0]
+            if item_id not in written:
+                results[index] = {"id": item_id, "status": "skipped", "error": reason}
+            else:
+                results[index] = {
+                    "id": item_id, "status": "inserted" if written[item_id] else "updated"
+                }
+        return jsonify(_bulk_response("Items processed", results)), 200
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+@pantry_bp.route("/bulk-update", methods=["PUT"])
+async def bulk_update() -> tuple[Dict[str, Any], int]:
+    """Update many pantry items with a single UPDATE ... FROM unnest(...).
+
+    Same body and results as pantry.bulk_update.
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    try:
+        data = await request.get_json(silent=True)
+        user_id = request.args.get("user_id")
+        items, error = _bulk_items(data, "items")
+        if not user_id or error:
+            return jsonify({"message": error or "Missing user_id"}), 400
+
+        results, rows = _validate_items(items, user_id)
+        rows = await asyncio.to_thread(_with_expiry, rows)
+
+        updated = set()
+        if rows:
+            async with db_connection() as conn:
+                try:
+                    returned = await conn.fetch(
+                        f"""
+                        UPDATE pantry_items AS p
+                        SET item_name = v.item_name, quantity = v.quantity,
+                            expiry_date = v.expiry_date, category = v.category,
+                            unit = v.unit, added_date = v.added_date, notes = v.notes,
+                            expiry_source = {kept_source_sql("p", "v.expiry_date", "v.expiry_source")}
+                        FROM ({_UNNEST_ROWS}) AS v
+                            (id, user_id, item_name, quantity, expiry_date,
+                             category, unit, added_date, notes, expiry_source)
+                        WHERE p.id = v.id AND p.user_id = v.user_id
+                        RETURNING p.id
+                        """,
+                        *_columns(rows)
+                    )
+                    updated = {row[0] for row in returned}
+                except Exception as e:
+                    return jsonify({"message": "Error updating items", "error": str(e)}), 500
+        invalidate_recommendations(user_id)
+        schedule_expiry_backfill()
+
+        for index, row in rows:
+            item_id = row[0]
+            if item_id in updated:
+                results[index] = {"id": item_id, "status": "updated"}
+            else:
+                results[index] = {"id": item_id, "status": "not_found", "error": "Item not found"}
+        return jsonify(_bulk_response("Items processed", results)), 200
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+@pantry_bp.route("/bulk-delete", methods=["DELETE"])
+async def bulk_delete() -> tuple[Dict[str, Any], int]:
+    """Delete many pantry items in one statement.
+
+    Same body and results as pantry.bulk_delete.
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    try:
+        data = await request.get_json(silent=True)
+        user_id = request.args.get("user_id")
+        ids, error = _bulk_items(data, "ids")
+        if not user_id or error:
+            return jsonify({"message": error or "Missing user_id"}), 400
+        ids = [str(item_id) for item_id in ids]
+
+        async with db_connection() as conn:
+            try:
+                returned = await conn.fetch(
+                    "DELETE FROM pantry_items WHERE user_id=$1 AND id = ANY($2::text[]) RETURNING id",
+                    user_id, ids
+                )
+                deleted = {row[0] for row in returned}
+                invalidate_recommendations(user_id)
+            except Exception as e:
+                return jsonify({"message": "Error deleting items", "error": str(e)}), 500
+
+        results = [
+            {"id": item_id, "status": "deleted"} if item_id in deleted
+            else {"id": item_id, "status": "not_found", "error": "Item not found"}
+            for item_id in ids
+        ]
+        return jsonify(_bulk_response("Items processed", results)), 200
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+@pantry_bp.route("/get-items", methods=["GET"])
+async def get_items() -> tuple[Dict[str, Any], int]:
+    """Get pantry items for a user.
+
+    Same query parameters as pantry.get_items, including limit/cursor
+    pagination and format=ndjson streaming.
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    try:
+        user_id = request.args.get("user_id")
+        if not user_id:
+            return jsonify({"message": "Missing user_id"}), 400
+
+        try:
+            query, params, limit = _items_query(user_id, request.args)
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+        query = sql(query)
+
+        if request.args.get("format") == "ndjson":
+            return stream_with_context(_stream_items)(query, params), 200, {"Content-Type": "application/x-ndjson"}
+
+        async with db_connection() as conn:
+            try:
+                rows = await conn.fetch(query, *params)
+
+                next_cursor = None
+                if limit is not None and len(rows) > limit:
+                    # We fetched one extra row to know whether a next page exists
+                    rows = rows[:limit]
+                    next_cursor = _encode_cursor(rows[-1][0])
+
+                response = {
+                    "message": "Items retrieved successfully",
+                    "data": [_row_to_item(row) for row in rows]
+                }
+                if limit is not None:
+                    response["next_cursor"] = next_cursor
+                return jsonify(response), 200
+            except Exception as e:
+                return jsonify({"message": "Error fetching items", "error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+@pantry_bp.route("/expiring", methods=["GET"])
+async def get_expiring() -> tuple[Dict[str, Any], int]:
+    """Expiry overview for a user's pantry.
+
+    Same buckets and items as pantry.get_expiring.
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    try:
+        user_id = request.args.get("user_id")
+        if not user_id:
+            return jsonify({"message": "Missing user_id"}), 400
+        try:
+            days = int(request.args.get("days", PANTRY_EXPIRING_DAYS))
+        except ValueError:
+            return jsonify({"message": "days must be an integer"}), 400
+        if not 0 <= days <= PANTRY_EXPIRING_MAX_DAYS:
+            return jsonify({
+                "message": f"days must be between 0 and {PANTRY_EXPIRING_MAX_DAYS}"
+            }), 400
+
+        async with db_connection() as conn:
+            try:
+                counts = await conn.fetchrow(
+                    """
+                    SELECT
+                        COALESCE(SUM(item_count) FILTER (
+                            WHERE expiry_date < CURRENT_DATE), 0),
+                        COALESCE(SUM(item_count) FILTER (
+                            WHERE expiry_date = CURRENT_DATE), 0),
+                        COALESCE(SUM(item_count) FILTER (
+                            WHERE expiry_date BETWEEN CURRENT_DATE + 1 AND CURRENT_DATE + 3), 0),
+                        COALESCE(SUM(item_count) FILTER (
+                            WHERE expiry_date BETWEEN CURRENT_DATE + 4 AND CURRENT_DATE + 7), 0),
+                        COALESCE(SUM(item_count) FILTER (
+                            WHERE expiry_date > CURRENT_DATE + 7 AND expiry_date < 'infinity'), 0),
+                        COALESCE(SUM(item_count) FILTER (
+                            WHERE expiry_date = 'infinity'), 0)
+                    FROM pantry_expiry_timeline
+                    WHERE user_id = $1
+                    """,
+                    user_id
+                )
+                buckets = dict(zip(
+                    ("expired", "today", "within3Days", "within7Days", "later", "noExpiry"),
+                    (int(count) for count in counts)
+                ))
+
+                rows = await conn.fetch(
+                    f"""
+                    SELECT {ITEM_COLUMNS}, expiry_date - CURRENT_DATE
+                    FROM pantry_items
+                    WHERE user_id = $1 AND expiry_date <= CURRENT_DATE + $2::int
+                    ORDER BY expiry_date, id
+                    LIMIT $3
+                    """,
+                    user_id, days, PANTRY_PAGE_MAX
+                )
+                items = []
+                for row in rows:
+                    item = _row_to_item(row)
+                    item["daysLeft"] = row[-1]
+                    items.append(item)
+
+                return jsonify({
+                    "message": "Expiring items retrieved successfully",
+                    "buckets": buckets,
+                    "days": days,
+                    "data": items
+                }), 200
+            except Exception as e:
+                return jsonify({"message": "Error fetching expiring items", "error": str(e)}), 500
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+async def _stream_items(query: str, params: tuple) -> AsyncIterator[str]:
+    """Yield items as NDJSON lines from a server-side cursor.
+
+    asyncpg cursors only live inside a transaction; rows arrive
+    PANTRY_STREAM_FETCH_SIZE at a time and the pooled connection stays
+    checked out until the stream ends or the client disconnects.
+    """
+    async with db_connection() as conn:
+        try:
+            async with conn.transaction():
+                async for row in conn.cursor(query, *params, prefetch=PANTRY_STREAM_FETCH_SIZE):
+                    yield json.dumps(_row_to_item(row)) + "\n"
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            yield json.dumps({"message": "Error fetching items", "error": str(e)}) + "\n"
@@ -1,6 +1,12 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-from db import get_db_connection
+from db import db_connection
+from passwords import (
+    HashingBusy,
+    busy_response,
+    hash_password,
+    stats as hashing_stats,
+    verify_password,
+)
 
 # Initialize blueprint
 auth_bp = Blueprint("auth", __name__)
@@ -22,28 +28,33 @@ def signup():
         if not user_id or not password:
             return jsonify({"message": "Missing required fields"}), 400
 
-        # Database operations
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
+        # Hash before borrowing a database connection
         try:
-            cursor.execute(
-                "INSERT INTO users (user_name, user_id, password) VALUES (%s, %s, %s)",
-                (user_name, user_id, generate_password_hash(password))
-            )
-            conn.commit()
-            return jsonify({"message": "User created successfully"}), 201
-
-        except Exception as e:
-            conn.rollback()
-            # Check if error is due to duplicate user_id
-            if "duplicate key" in str(e).lower():
-                return jsonify({"message": "User already exists"}), 409
-            return jsonify({"message": "Database error", "error": str(e)}), 500
-
-        finally:
-            cursor.close()
-            conn.close()
+            password_hash = hash_password(password)
+        except HashingBusy:
+            return busy_response()
+
+        # Database operations
+        with db_connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                cursor.execute(
+                    "INSERT INTO users (user_name, user_id, password) VALUES (%s, %s, %s)",
+                    (user_name, user_id, password_hash)
+                )
+                conn.commit()
+                return jsonify({"message": "User created successfully"}), 201
+
+            except Exception as e:
+                conn.rollback()
+                # Check if error is due to duplicate user_id
+                if "duplicate key" in str(e).lower():
+                    return jsonify({"message": "User already exists"}), 409
+                return jsonify({"message": "Database error", "error": str(e)}), 500
+
+            finally:
+                cursor.close()
 
     except Exception as e:
         return jsonify({"message": "Server error", "error": str(e)}), 500
@@ -64,25 +75,62 @@ def login():
         if not user_id or not password:
             return jsonify({"message": "Missing required fields"}), 400
 
-        # Database operations
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        # Database operations; the connection is returned before hashing
+        with db_connection() as conn:
+            cursor = conn.cursor()
 
-        try:
-            cursor.execute("SELECT password FROM users WHERE user_id = %s", (user_id,))
-            row = cursor.fetchone()
+            try:
+                cursor.execute("SELECT password FROM users WHERE user_id = %s", (user_id,))
+                row = cursor.fetchone()
+            finally:
+                cursor.close()
 
-            if row and check_password_hash(row[0], password):
-                return jsonify({
-                    "message": "Login successful",
-                    "user_id": user_id
-                }), 200
+        if not row:
+            return jsonify({"message": "Invalid credentials"}), 401
 
+        try:
+            valid, new_hash = verify_password(row[0], password)
+        except HashingBusy:
+            return busy_response()
+        if not valid:
             return jsonify({"message": "Invalid credentials"}), 401
 
-        finally:
-            cursor.close()
-            conn.close()
+        if new_hash:
+            _replace_hash(user_id, row[0], new_hash)
+
+        return jsonify({
+            "message": "Login successful",
+            "user_id": user_id
+        }), 200
 
     except Exception as e:
         return jsonify({"message": "Server error", "error": str(e)}), 500
+
+@auth_bp.route("/hashing-stats", methods=["GET"])
+def hash_stats():
+    """Endpoint exposing password hashing pool counters."""
+    return jsonify(hashing_stats()), 200
+
+def _replace_hash(user_id, old_hash, new_hash):
+    """Store a rehashed password unless it changed since it was read.
+
+    Failing to upgrade only means trying again on the next login, so
+    errors are logged rather than failing the login.
+    """
+    try:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                cursor.execute(
+                    "UPDATE users SET password = %s WHERE user_id = %s AND password = %s",
+                    (new_hash, user_id, old_hash)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+    except Exception as e:
+        print(f"Could not rehash password for {user_id}: {e}")
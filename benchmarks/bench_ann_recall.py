@@ -0,0 +1,135 @@
+"""ANN recipe search: recall@10 and latency against the exact search.
+
+Builds synthetic TF-IDF corpora with topic structure (each recipe mixes
+terms of one "cuisine" with globally popular ones, Zipf-distributed, as
+in real ingredient lists), fits recipe_ann on each and compares, over
+the same queries:
+
+  exact    recipe_index.top_k_similar (the default path)
+  ann      recipe_ann.search for each --nprobe value
+
+recall@10 is the fraction of the exact top 10 that the ANN search also
+returns. Latency is per query (median and p99). The build column is the
+offline cost of fit_ann (SVD + k-means + list assignment).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ann_recall --sizes 10000,100000,1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+import recipe_ann
+from recipe_index import top_k_similar
+
+
+def zipf(n, exponent=1.1):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+class Topics:
+    """Per-topic term distributions over a shared vocabulary."""
+
+    def __init__(self, n_terms, n_topics, terms_per_topic, rng):
+        self.n_terms = n_terms
+        self.terms = [
+            rng.choice(n_terms, terms_per_topic, replace=False) for _ in range(n_topics)
+        ]
+        self.topic_weights = zipf(terms_per_topic)
+        self.global_weights = zipf(n_terms)
+
+    def draw(self, topic, count, rng, topical=0.7):
+        from_topic = rng.random(count) < topical
+        cols = rng.choice(self.n_terms, size=count, p=self.global_weights)
+        cols[from_topic] = self.terms[topic][
+            rng.choice(len(self.terms[topic]), size=from_topic.sum(), p=self.topic_weights)
+        ]
+        return cols
+
+
+def synthetic_corpus(n_recipes, topics, terms_per_recipe, rng):
+    recipe_topics = rng.integers(len(topics.terms), size=n_recipes)
+    cols = np.concatenate([topics.draw(t, terms_per_recipe, rng) for t in recipe_topics])
+    rows = np.repeat(np.arange(n_recipes), terms_per_recipe)
+    counts = sp.csr_matrix((np.ones(len(cols)), (rows, cols)), shape=(n_recipes, topics.n_terms))
+    counts.sum_duplicates()
+    # Smoothed IDF as TfidfVectorizer computes it
+    df = np.bincount(counts.indices, minlength=topics.n_terms)
+    idf = np.log((n_recipes + 1) / (df + 1)) + 1
+    matrix = normalize(counts @ sp.diags(idf)).tocsr()
+    matrix.sort_indices()
+    return matrix, idf
+
+
+def synthetic_query(topics, idf, rng):
+    # A pantry: a few items of one cuisine plus staples
+    topic = int(rng.integers(len(topics.terms)))
+    cols = np.unique(topics.draw(topic, int(rng.integers(3, 9)), rng))
+    return sp.csr_matrix(
+        (idf[cols], (np.zeros(len(cols), dtype=int), cols)), shape=(1, topics.n_terms)
+    )
+
+
+def timed(fn, queries):
+    results, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(fn(query))
+        timings.append(time.perf_counter() - start)
+    return results, np.median(timings) * 1e3, np.percentile(timings, 99) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,300000")
+    parser.add_argument("--terms", type=int, default=20000, help="vocabulary size")
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--terms-per-topic", type=int, default=300)
+    parser.add_argument("--terms-per-recipe", type=int, default=12)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", default="4,8,16,32")
+    parser.add_argument(
+        "--rerank", type=int, default=recipe_ann.RECIPE_ANN_RERANK,
+        help="candidates re-scored exactly (0: all in the probed lists)",
+    )
+    parser.add_argument("--dims", type=int, default=recipe_ann.RECIPE_ANN_DIMS)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    topics = Topics(args.terms, args.topics, args.terms_per_topic, rng)
+    print(
+        f"{'recipes':>8} {'lists':>6} {'build s':>8} {'path':>10} "
+        f"{'recall@10':>10} {'p50 ms':>8} {'p99 ms':>8}"
+    )
+    for size in (int(s) for s in args.sizes.split(",")):
+        matrix, idf = synthetic_corpus(size, topics, args.terms_per_recipe, rng)
+        postings = matrix.tocsc()
+        queries = [synthetic_query(topics, idf, rng) for _ in range(args.queries)]
+
+        start = time.perf_counter()
+        ann = recipe_ann.fit_ann(matrix, dims=args.dims, seed=args.seed)
+        build = time.perf_counter() - start
+        prefix = f"{size:>8} {ann.params['lists']:>6} {build:>8.1f}"
+
+        exact, p50, p99 = timed(lambda q: top_k_similar(postings, q, args.top_n), queries)
+        print(f"{prefix} {'exact':>10} {1.0:>10.3f} {p50:>8.2f} {p99:>8.2f}")
+        for nprobe in (int(n) for n in args.nprobe.split(",")):
+            found, p50, p99 = timed(
+                lambda q: recipe_ann.search(matrix, ann, q, args.top_n, nprobe, args.rerank)[0],
+                queries,
+            )
+            recall = np.mean([
+                len(set(a.tolist()) & set(e.tolist())) / len(e) for a, e in zip(found, exact)
+            ])
+            print(f"{prefix} {f'nprobe={nprobe}':>10} {recall:>10.3f} {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
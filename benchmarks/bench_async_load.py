@@ -0,0 +1,224 @@
+"""Requests/sec and latency of the sync (gunicorn) and async (hypercorn)
+stacks under many concurrent keep-alive clients.
+
+Starts each server in turn against the database in DATABASE_URL (a local,
+migrated Postgres), seeds --users throwaway users with --items pantry
+items each, then has --clients concurrent connections issue requests
+back to back for --duration seconds, alternating between
+
+    GET /pantry/get-items?user_id=...&limit=20
+    GET /others/get-name?user_id=...
+
+The clients are raw asyncio HTTP/1.1 keep-alive connections spread over
+--client-procs processes, so the load generator is not the bottleneck.
+
+- sync: gunicorn wsgi:app -k gthread with --workers x --threads, each
+  worker with a psycopg2 pool of DB_POOL_SIZE=--threads,
+- async: hypercorn asgi:app with --workers, each worker with an asyncpg
+  pool of DB_POOL_SIZE=--async-pool.
+
+Keep workers x pool size below Postgres max_connections. The seeded users
+are removed afterwards.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_async_load --clients 1000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+USER_PREFIX = "bench-async-load"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def call(url, body=None, method=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(
+        url, data=data, method=method, headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def start(stack, port, args):
+    if stack == "sync":
+        command = ["gunicorn", "wsgi:app", "-k", "gthread",
+                   "--workers", str(args.workers), "--threads", str(args.threads),
+                   "--worker-connections", str(args.clients)]
+        pool_size = args.threads
+    else:
+        command = ["hypercorn", "asgi:app", "--workers", str(args.workers),
+                   "--backlog", str(args.clients)]
+        pool_size = args.async_pool
+    env = dict(os.environ, DB_POOL_SIZE=str(pool_size), APP_WARMUP="lazy",
+               METRICS_ENABLED="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m"] + command + ["--bind", f"127.0.0.1:{port}"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while call(base + "/healthz") != 200:
+        if time.time() > deadline or server.poll() is not None:
+            server.terminate()
+            raise SystemExit(f"{stack} server did not start")
+        time.sleep(0.2)
+    return server
+
+
+def seed(base, users, items):
+    user_ids = [f"{USER_PREFIX}-{i}" for i in range(users)]
+    for user_id in user_ids:
+        call(f"{base}/others/delete-profile?user_id={user_id}", method="DELETE")
+        call(base + "/auth/signup", {"user_id": user_id, "user_name": "bench", "password": "pw"})
+        call(f"{base}/pantry/bulk-add?user_id={user_id}", {"items": [
+            {"id": f"{user_id}-{j}", "name": f"item {j}", "quantity": j,
+             "expiryDate": f"2030-01-{j % 28 + 1:02d}"}
+            for j in range(items)
+        ]})
+    return user_ids
+
+
+def cleanup(base, user_ids):
+    for user_id in user_ids:
+        call(f"{base}/others/delete-profile?user_id={user_id}", method="DELETE")
+
+
+async def _client(port, paths, stop_at, latencies, errors):
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    except OSError:
+        errors.append("connect")
+        return
+    try:
+        while time.perf_counter() < stop_at:
+            path = random.choice(paths)
+            started = time.perf_counter()
+            writer.write(
+                f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode("ascii")
+            )
+            head = await reader.readuntil(b"\r\n\r\n")
+            status = int(head.split(b" ", 2)[1])
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors.append(status)
+    except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+        errors.append(type(e).__name__)
+    finally:
+        writer.close()
+
+
+def _client_proc(port, paths, clients, start_at, duration, queue):
+    async def run():
+        # Connect everyone first, then measure from start_at
+        while time.time() < start_at:
+            await asyncio.sleep(0.01)
+        latencies, errors = [], []
+        stop_at = time.perf_counter() + duration
+        await asyncio.gather(*(
+            _client(port, paths, stop_at, latencies, errors) for _ in range(clients)
+        ))
+        queue.put((latencies, errors))
+
+    asyncio.run(run())
+
+
+def load(port, paths, args):
+    queue = multiprocessing.Queue()
+    start_at = time.time() + 1
+    per_proc = [args.clients // args.client_procs] * args.client_procs
+    per_proc[0] += args.clients - sum(per_proc)
+    procs = [
+        multiprocessing.Process(
+            target=_client_proc,
+            args=(port, paths, clients, start_at, args.duration, queue)
+        )
+        for clients in per_proc
+    ]
+    for proc in procs:
+        proc.start()
+    latencies, errors = [], []
+    for _ in procs:
+        proc_latencies, proc_errors = queue.get()
+        latencies += proc_latencies
+        errors += proc_errors
+    for proc in procs:
+        proc.join()
+    return latencies, errors
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=32, help="gthread threads per sync worker")
+    parser.add_argument("--async-pool", type=int, default=20, help="asyncpg pool per async worker")
+    parser.add_argument("--client-procs", type=int, default=2)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--stacks", default="sync,async")
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients, {args.duration:.0f}s per stack, {args.workers} workers")
+    print(f"{'stack':>6} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for stack in args.stacks.split(","):
+        port = free_port()
+        server = start(stack, port, args)
+        try:
+            base = f"http://127.0.0.1:{port}"
+            user_ids = seed(base, args.users, args.items)
+            paths = []
+            for user_id in user_ids:
+                paths.append(f"/pantry/get-items?user_id={user_id}&limit=20")
+                paths.append(f"/others/get-name?user_id={user_id}")
+            latencies, errors = load(port, paths, args)
+            cleanup(base, user_ids)
+        finally:
+            server.terminate()
+            server.wait()
+
+        latencies.sort()
+        print(f"{stack:>6} {len(latencies):>9} {len(latencies) / args.duration:>8.0f} "
+              f"{percentile(latencies, 0.5) * 1000:>8.1f} "
+              f"{percentile(latencies, 0.99) * 1000:>8.1f} {len(errors):>7}")
+        if errors:
+            kinds = {}
+            for error in errors:
+                kinds[error] = kinds.get(error, 0) + 1
+            print(f"{'':>6} errors: {kinds}")
+
+
+if __name__ == "__main__":
+    main()
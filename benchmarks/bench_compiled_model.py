@@ -0,0 +1,84 @@
+"""Parity check and microbenchmark for the compiled shelf-life model.
+
+Every product name the model knows (plus unknown names) is combined with
+every web category, predicted with both the sklearn Pipeline and the
+compiled flat-array model, and compared. The script stops with a non-zero
+exit status, before any timing, if a prediction differs by more than
+--tolerance days; --check runs only that parity check.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_compiled_model
+    python benchmarks/bench_compiled_model.py --check
+"""
+import argparse
+import os
+import sys
+import time
+
+# Also runnable as a script, not only with -m from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import prediction
+from compiled_model import compile_pipeline
+
+
+def per_call_us(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=prediction.MODEL_PATH)
+    parser.add_argument("--tolerance", type=float, default=1e-6)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--check", action="store_true", help="parity check only, no timings")
+    args = parser.parse_args()
+
+    pipeline = joblib.load(args.model)
+    start = time.perf_counter()
+    compiled = compile_pipeline(pipeline)
+    print(f"compiled {compiled.n_trees} trees, {len(compiled.feature)} nodes "
+          f"in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    names = sorted(prediction._name_lookup(pipeline).values()) + ["milk", "unknown item"]
+    rows = [
+        {"Name": name, "Category_ID": ids[0], "HighLevelCategory": category}
+        for name in names
+        for category, ids in prediction.APP_CATEGORY_MAPPING.items()
+    ]
+
+    expected = pipeline.predict(pd.DataFrame(rows))
+    batched = compiled.predict(rows)
+    single = np.array([compiled.predict_one(row) for row in rows])
+    worst = max(np.abs(expected - batched).max(), np.abs(expected - single).max())
+    print(f"parity: {len(rows)} rows, max abs difference {worst:.2e} days")
+    if not worst <= args.tolerance:
+        sys.exit(f"FAILED: compiled predictions differ from sklearn by {worst:.2e} days "
+                 f"(tolerance {args.tolerance:.0e})")
+    if args.check:
+        return
+
+    row = rows[len(rows) // 2]
+    sklearn_us = per_call_us(lambda: pipeline.predict(pd.DataFrame([row])), args.repeat // 10)
+    compiled_us = per_call_us(lambda: compiled.predict_one(row), args.repeat)
+    print(f"single row: sklearn {sklearn_us:,.0f} us, compiled {compiled_us:,.1f} us "
+          f"({sklearn_us / compiled_us:.0f}x)")
+
+    for size in (10, 100, 500):
+        batch = rows[:size]
+        sklearn_us = per_call_us(lambda: pipeline.predict(pd.DataFrame(batch)), 5)
+        compiled_us = per_call_us(lambda: compiled.predict(batch), 5)
+        print(f"batch of {size:>3}: sklearn {sklearn_us:,.0f} us, compiled {compiled_us:,.0f} us "
+              f"({sklearn_us / compiled_us:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
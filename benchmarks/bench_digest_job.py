@@ -0,0 +1,78 @@
+"""Digest scoring throughput: per-user searches versus chunked sparse products.
+
+Draws synthetic pantries (items named after recipe-index terms, with
+random expiry) and ranks recipes for every user two ways, without the
+database:
+
+  per-user  build_query_vector() + index.search() once per user, what
+            recommend_recipes() does
+  chunked   digest_job.query_matrix() + score_chunk() per --chunk-sizes
+            users, what each digest_job worker does
+
+Reports users per second and whether every user's top-N recipes (those
+sharing a term with the pantry) are identical. Scoring is CPU-bound, so
+the job's process pool multiplies the chunked rate by about the number
+of cores.
+
+Run from the repository root (recipes.json must be present):
+
+    python -m benchmarks.bench_digest_job --users 2000
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+import digest_job
+import recipes_recommender as rr
+from recipe_prediction import DEFAULT_DAYS_UNTIL_EXPIRY
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--chunk-sizes", default="50,200,500,2000")
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = rr.get_index()
+    terms = sorted(index.vocabulary)
+    pantries = [
+        (f"u{i}", [
+            (rng.choice(terms), None if rng.random() < 0.2 else rng.randint(-3, 40))
+            for _ in range(rng.randint(1, 20))
+        ])
+        for i in range(args.users)
+    ]
+    # Warm the normalizer's cache the same for both paths
+    digest_job.query_matrix(index, pantries)
+
+    start = time.perf_counter()
+    expected = []
+    for _, items in pantries:
+        ingredients = [name for name, _ in items]
+        expiry = {name: DEFAULT_DAYS_UNTIL_EXPIRY if days is None else days for name, days in items}
+        expected.append(index.search(rr.build_query_vector(ingredients, expiry, index.vectorizer), args.top_n))
+    per_user = time.perf_counter() - start
+
+    print(f"{'path':>16} {'seconds':>8} {'users/s':>9} {'speedup':>8} {'same top-N':>11}")
+    print(f"{'per-user':>16} {per_user:>8.2f} {args.users / per_user:>9.0f} {1.0:>7.1f}x {'-':>11}")
+    for size in (int(s) for s in args.chunk_sizes.split(",")):
+        start = time.perf_counter()
+        found = []
+        for chunk in digest_job.chunked(iter(pantries), size):
+            queries = digest_job.query_matrix(index, chunk)
+            found.extend(rows for rows, _ in digest_job.score_chunk(index, queries, args.top_n))
+        chunked = time.perf_counter() - start
+        same = all(np.array_equal(e[:len(f)], f) for e, f in zip(expected, found))
+        print(
+            f"{f'chunked {size}':>16} {chunked:>8.2f} {args.users / chunked:>9.0f} "
+            f"{per_user / chunked:>7.1f}x {str(same):>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Recipe index build: peak memory and time, in-memory vs streaming.
+
+Writes synthetic recipes.json corpora of growing size (a fixed vocabulary
+of ingredient words, Zipf-distributed, with titles and instructions of
+realistic length) and builds each one in a fresh interpreter, twice:
+
+  memory     recipe_index.fit_index + write_index (json.load of the corpus)
+  streaming  recipe_stream.write_streaming (what `recipe_index.py build` runs)
+
+Reports corpus size, build time and peak RSS (ru_maxrss) per build, and
+whether both artifacts are byte-for-byte identical; the script exits
+non-zero if any pair differs. Streaming peak RSS should stay flat as the
+corpus grows; in-memory peak RSS grows with it. A small --block-size
+makes the streaming build partition its postings over several levels.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_index_memory --sizes 10000,40000,160000
+"""
+import argparse
+import filecmp
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+CHILD = r"""
+import json, resource, sys, time
+mode, source, out, chunk, block = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4]), int(sys.argv[5])
+import recipe_index, recipe_stream
+recipe_stream.RECIPE_INDEX_CHUNK = chunk
+recipe_stream.RECIPE_INDEX_BLOCK = block
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+if mode == "memory":
+    recipe_index.write_index(recipe_index.fit_index(source), out, {})
+else:
+    recipe_stream.write_streaming(source, out, {})
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "baseline_mb": baseline / 1024,
+    "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+UNITS = ("1 cup", "2 tablespoons", "1/2 teaspoon", "3 ounces", "1 pound", "2 cans")
+
+
+def write_corpus(path, n_recipes, n_words, rng):
+    """Write n_recipes synthetic recipes, one at a time."""
+    words = [f"ingr{chr(97 + i % 26)}{i}" for i in range(n_words)]
+    popularity = 1.0 / np.arange(1, n_words + 1) ** 1.1
+    popularity /= popularity.sum()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{")
+        for i in range(n_recipes):
+            picks = rng.choice(n_words, size=(int(rng.integers(4, 14)), 2), p=popularity)
+            recipe = {
+                "title": " ".join(words[j] for j in picks[:3, 0]).title(),
+                "ingredients": [
+                    f"{UNITS[int(rng.integers(len(UNITS)))]} {words[a]} {words[b]}"
+                    for a, b in picks
+                ],
+                "instructions": " ".join(words[j] for j in picks.ravel()) * 8,
+                "picture_link": f"https://example.com/{i}.jpg",
+            }
+            f.write(("," if i else "") + json.dumps(f"r{i}") + ":" + json.dumps(recipe))
+        f.write("}")
+
+
+def build(mode, source, out, chunk, block):
+    env = dict(os.environ, PYTHONWARNINGS="ignore")
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, mode, source, out, str(chunk), str(block)],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(result.strip().splitlines()[-1])
+
+
+def same_artifact(a, b):
+    names = sorted(set(os.listdir(a)) - {"manifest.json"})
+    if names != sorted(set(os.listdir(b)) - {"manifest.json"}):
+        return False
+    return all(filecmp.cmp(os.path.join(a, n), os.path.join(b, n), shallow=False) for n in names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,40000,160000")
+    parser.add_argument("--words", type=int, default=3000, help="ingredient vocabulary size")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--block-size", type=int, default=500000, help="RECIPE_INDEX_BLOCK")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+    failed = False
+
+    print(
+        f"{'recipes':>8} {'corpus MB':>10} {'memory s':>9} {'memory MB':>10} "
+        f"{'stream s':>9} {'stream MB':>10} {'identical':>10}"
+    )
+    for size in (int(s) for s in args.sizes.split(",")):
+        work = tempfile.mkdtemp(prefix="bench-index-")
+        try:
+            source = os.path.join(work, "recipes.json")
+            write_corpus(source, size, args.words, rng)
+            memory = build("memory", source, os.path.join(work, "memory"), args.chunk_size, args.block_size)
+            stream = build("streaming", source, os.path.join(work, "streaming"), args.chunk_size, args.block_size)
+            identical = same_artifact(os.path.join(work, "memory"), os.path.join(work, "streaming"))
+            failed = failed or not identical
+            print(
+                f"{size:>8} {os.path.getsize(source) / 2**20:>10.1f} "
+                f"{memory['seconds']:>9.1f} {memory['peak_mb']:>10.1f} "
+                f"{stream['seconds']:>9.1f} {stream['peak_mb']:>10.1f} "
+                f"{str(identical):>10}"
+            )
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+    print(f"(interpreter with imports only: {memory['baseline_mb']:.1f} MB)")
+    if failed:
+        sys.exit("FAILED: the streaming build differs from the in-memory build")
+
+
+if __name__ == "__main__":
+    main()
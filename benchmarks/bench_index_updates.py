@@ -0,0 +1,118 @@
+"""Recipe search latency while the index is being updated.
+
+Copies the corpus at RECIPES_PATH into a scratch index directory and runs
+similarity searches back to back through recipe_updates.LiveRecipes (as
+recipes_recommender.get_index() does) in three phases:
+
+  steady    no updates
+  appends   --batch recipes added every --every seconds; each worker
+            rebuilds its delta segment in a background thread
+  merge     the log is merged into a new base in a niced child process,
+            then the worker swaps to it
+
+Reports per phase the number of searches, p50 / p99 / max latency and how
+many snapshots were swapped in, so a stall on a swap shows up as max.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_index_updates --seconds 5
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import recipe_updates
+from recipe_stream import iter_recipes
+
+WORDS = (
+    "chicken onion garlic tomato milk butter flour sugar egg rice beef salt "
+    "pepper oil basil lemon cheese potato carrot cream"
+).split()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run_phase(live, seconds, rng, during=None):
+    timings, versions = [], set()
+    stop = threading.Event()
+    worker = threading.Thread(target=during, args=(stop,), daemon=True) if during else None
+    if worker:
+        worker.start()
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end or (worker and worker.is_alive()):
+        query = " ".join(rng.sample(WORDS, rng.randint(2, 6)))
+        start = time.perf_counter()
+        index = live.current()
+        index.records(index.search(index.vectorizer.transform([query]), 10))
+        timings.append(time.perf_counter() - start)
+        versions.add(index.version)
+        if worker and time.perf_counter() >= end:
+            stop.set()
+    return timings, len(versions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--batch", type=int, default=20)
+    parser.add_argument("--every", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    work = tempfile.mkdtemp(prefix="bench-updates-")
+    try:
+        source = os.path.join(work, "recipes.json")
+        index_dir = os.path.join(work, "index")
+        shutil.copy(recipe_updates.RECIPES_PATH, source)
+        recipes = [rec for _, rec in iter_recipes(source)]
+        recipe_updates.RECIPE_INDEX_AUTO_MERGE = False
+        recipe_updates.RECIPE_INDEX_REFRESH_INTERVAL = 0.1
+
+        live = recipe_updates.LiveRecipes(source, index_dir)
+        counter = iter(range(10**9))
+
+        def appends(stop):
+            while not stop.wait(args.every):
+                recipe_updates.add_recipes(
+                    ((f"bench{next(counter)}", rng.choice(recipes)) for _ in range(args.batch)),
+                    source,
+                    index_dir,
+                )
+
+        def merge(stop):
+            before = live.current().version
+            env = dict(
+                os.environ, RECIPES_PATH=source, RECIPE_INDEX_DIR=index_dir, RECIPE_INDEX_MERGE_NICE="10"
+            )
+            subprocess.run(
+                [sys.executable, os.path.abspath(recipe_updates.__file__), "merge"],
+                env=env, check=True, stdout=subprocess.DEVNULL,
+            )
+            # Let the worker notice CURRENT and swap
+            while live.current().version == before:
+                time.sleep(0.01)
+
+        print(f"{'phase':>8} {'searches':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'swaps':>6}")
+        for name, during in (("steady", None), ("appends", appends), ("merge", merge)):
+            timings, versions = run_phase(live, args.seconds, rng, during)
+            print(
+                f"{name:>8} {len(timings):>9} {percentile(timings, 0.5) * 1000:>8.2f} "
+                f"{percentile(timings, 0.99) * 1000:>8.2f} {max(timings) * 1000:>8.2f} {versions - 1:>6}"
+            )
+        print(f"recipes served at the end: {len(live.current())}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Latency of other endpoints while /auth/login is being hammered.
+
+Serves the app from a threaded server (in-process, unless --url points at
+a running deployment), measures probe request latency against an idle
+server, then again while --storm threads log in as fast as they can.
+Compare the default bounded hashing pool with --inline, which hashes on
+the request threads like the app used to:
+
+    python -m benchmarks.bench_login_storm
+    python -m benchmarks.bench_login_storm --inline
+
+Needs DATABASE_URL pointing at a migrated database; a throwaway user is
+created and removed.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+USER_ID = "bench-login-storm"
+PASSWORD = "correct horse battery staple"
+
+
+def request(url, body=None, method=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(
+        url, data=data, method=method, headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def probe(base, path, seconds):
+    """Sequential probe requests for `seconds`; returns latencies in ms."""
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        request(base + path)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def storm(base, stop, statuses, backoff):
+    while not stop.is_set():
+        status = request(base + "/auth/login", {"user_id": USER_ID, "password": PASSWORD})
+        statuses.append(status)
+        if status == 503:
+            # Well-behaved clients back off when told the server is busy
+            stop.wait(backoff)
+
+
+def summary(latencies):
+    latencies = sorted(latencies)
+    p = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+    return (
+        f"n={len(latencies):<5} p50={statistics.median(latencies):7.1f}ms "
+        f"p95={p(0.95):7.1f}ms p99={p(0.99):7.1f}ms max={latencies[-1]:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="base URL of a running server")
+    parser.add_argument("--storm", type=int, default=32, help="concurrent login clients")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--probe", default=f"/pantry/get-items?user_id={USER_ID}&limit=20")
+    parser.add_argument("--inline", action="store_true", help="hash on request threads")
+    parser.add_argument("--backoff", type=float, default=0.05, help="seconds to wait after a 503")
+    args = parser.parse_args()
+
+    server = None
+    base = args.url
+    if base is None:
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        import passwords
+        from app import app
+
+        if args.inline:
+            passwords.PASSWORD_HASH_WORKERS = 0
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass
+
+        server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}"
+
+    request(base + "/others/delete-profile?user_id=" + USER_ID, method="DELETE")
+    request(base + "/auth/signup", {"user_id": USER_ID, "user_name": "bench", "password": PASSWORD})
+    try:
+        print(f"idle:  {summary(probe(base, args.probe, args.seconds / 2))}")
+
+        stop = threading.Event()
+        statuses = []
+        threads = [
+            threading.Thread(target=storm, args=(base, stop, statuses, args.backoff))
+            for _ in range(args.storm)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+        start = time.perf_counter()
+        latencies = probe(base, args.probe, args.seconds)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        print(f"storm: {summary(latencies)}")
+        ok = statuses.count(200)
+        rejected = statuses.count(503)
+        print(
+            f"logins: {ok / elapsed:.1f}/s ok, {rejected / elapsed:.1f}/s rejected (503), "
+            f"{len(statuses) - ok - rejected} other"
+        )
+    finally:
+        request(base + "/others/delete-profile?user_id=" + USER_ID, method="DELETE")
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Product-name normalization: latency, and what it does to cache keys.
+
+Builds noisy variants of the shelf-life model's training names the way
+they arrive from users (brand and label words, quantities, plurals,
+one-letter typos, odd casing) and reports:
+
+- normalizer build time and vocabulary size,
+- canonicalize() latency per name, uncached and memoized (p50 / p99),
+- how many variants map back to their clean name's canonical form,
+- distinct prediction cache keys (prediction.model_name) for all
+  variants, with and without normalization; fewer keys = more hits.
+
+Needs the model, FoodKeeper data and the recipe index (RECIPES_PATH or a
+built index); no database access is made.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_normalize --names 200
+"""
+import argparse
+import random
+import time
+
+import normalize
+import prediction
+
+BRANDS = ("kroger", "great value", "trader joe's", "365", "kirkland")
+SIZES = ("1gal", "12ct", "2 lb", "16 oz", "500g", "family size")
+LABELS = ("organic", "fresh", "natural", "2%", "premium")
+
+
+def typo(word, rng):
+    if len(word) < 7:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1:]
+
+
+def variants(name, rng):
+    words = name.split()
+    return [
+        name.upper(),
+        f"{rng.choice(BRANDS)} {name}",
+        f"{rng.choice(LABELS)} {name} {rng.choice(SIZES)}",
+        " ".join(typo(word, rng) for word in words),
+        f"{rng.choice(BRANDS).title()} {rng.choice(LABELS)} {name.title()} {rng.choice(SIZES)}",
+    ]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--names", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    prediction.get_model()
+    start = time.perf_counter()
+    normalizer = normalize.get_normalizer()
+    print(f"build: {(time.perf_counter() - start) * 1000:.1f} ms, {len(normalizer)} words")
+
+    names = sorted(prediction.model_names())
+    names = rng.sample(names, min(args.names, len(names)))
+    pairs = [(name, variant) for name in names for variant in variants(name, rng)]
+
+    cold, warm = [], []
+    normalize.normalize_cache.clear()
+    for _, variant in pairs:
+        start = time.perf_counter()
+        normalize.canonicalize(variant)
+        cold.append(time.perf_counter() - start)
+    for _, variant in pairs:
+        start = time.perf_counter()
+        normalize.canonicalize(variant)
+        warm.append(time.perf_counter() - start)
+    for label, timings in (("uncached", cold), ("memoized", warm)):
+        print(f"{label:>9}: p50 {percentile(timings, 0.5) * 1e6:7.1f} us   "
+              f"p99 {percentile(timings, 0.99) * 1e6:7.1f} us")
+
+    same = sum(
+        normalize.canonicalize(variant).text == normalize.canonicalize(name).text
+        for name, variant in pairs
+    )
+    print(f"variants mapped to their clean name: {same}/{len(pairs)}")
+
+    with_keys = {prediction.model_name(variant) for _, variant in pairs}
+    normalize.NORMALIZE_ENABLED = False
+    without_keys = {prediction.model_name(variant) for _, variant in pairs}
+    normalize.NORMALIZE_ENABLED = True
+    print(f"prediction cache keys for {len(pairs)} variants of {len(names)} names: "
+          f"{len(without_keys)} without normalization, {len(with_keys)} with")
+
+
+if __name__ == "__main__":
+    main()
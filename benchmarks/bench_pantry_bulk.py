@@ -0,0 +1,124 @@
+"""Pantry writes: one request per item versus one bulk request.
+
+Adds N items through /pantry/add-item one at a time (N connections
+checked out and N commits), then the same N items through a single
+/pantry/bulk-add call (one transaction, multi-row INSERTs), and the same
+for updates and deletes. Requests go through Flask's test client, so the
+numbers are server-side cost without network latency.
+
+Needs DATABASE_URL pointing at a database initialized by the app. Items
+are written for a throwaway user that is removed afterwards.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pantry_bulk --items 1000
+"""
+import argparse
+import time
+import uuid
+
+from app import app
+from db import db_connection
+
+USER_ID = "bench-pantry-bulk"
+
+
+def make_items(count):
+    return [
+        {
+            "id": f"bench-{uuid.uuid4().hex}",
+            "name": f"item {i}",
+            "quantity": i % 5 + 1,
+            "unit": "pcs",
+            "category": "dairy" if i % 2 else "vegetables",
+            "expiryDate": "2030-01-01",
+            "addedDate": "2024-01-01",
+            "notes": "",
+        }
+        for i in range(count)
+    ]
+
+
+def reset_user():
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM pantry_items WHERE user_id=%s", (USER_ID,))
+        cursor.execute(
+            "INSERT INTO users (user_id, user_name, password) VALUES (%s, %s, %s) "
+            "ON CONFLICT (user_id) DO NOTHING",
+            (USER_ID, "bench", "-"),
+        )
+        conn.commit()
+        cursor.close()
+
+
+def drop_user():
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM pantry_items WHERE user_id=%s", (USER_ID,))
+        cursor.execute("DELETE FROM users WHERE user_id=%s", (USER_ID,))
+        conn.commit()
+        cursor.close()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    query = f"?user_id={USER_ID}"
+
+    def check(response, status=(200, 201)):
+        assert response.status_code in status, response.get_json()
+
+    def single_add():
+        for item in items:
+            check(client.post("/pantry/add-item" + query, json={"item": item}))
+
+    def single_update():
+        for item in items:
+            check(client.put("/pantry/update-item" + query, json={"item": item}))
+
+    def single_delete():
+        for item in items:
+            check(client.delete(f"/pantry/delete-item{query}&id={item['id']}"))
+
+    def bulk(method, path, body, status):
+        def run():
+            response = method(path + query, json=body)
+            check(response)
+            counts = response.get_json()["counts"]
+            assert counts == {status: len(items)}, counts
+        return run
+
+    reset_user()
+    try:
+        items = make_items(args.items)
+        ids = [item["id"] for item in items]
+        single = [timed(single_add), timed(single_update), timed(single_delete)]
+
+        items = make_items(args.items)
+        ids = [item["id"] for item in items]
+        batched = [
+            timed(bulk(client.post, "/pantry/bulk-add", {"items": items}, "inserted")),
+            timed(bulk(client.put, "/pantry/bulk-update", {"items": items}, "updated")),
+            timed(bulk(client.delete, "/pantry/bulk-delete", {"ids": ids}, "deleted")),
+        ]
+    finally:
+        drop_user()
+
+    print(f"{args.items} items")
+    print(f"{'operation':>10} {'single (s)':>11} {'bulk (s)':>9} {'speedup':>8}")
+    for name, one, many in zip(("add", "update", "delete"), single, batched):
+        print(f"{name:>10} {one:>11.3f} {many:>9.3f} {one / many:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
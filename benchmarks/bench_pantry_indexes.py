@@ -0,0 +1,154 @@
+"""Query plans and latencies of the pantry queries with and without indexes.
+
+Fills a scratch schema with synthetic pantry_items (10M rows by default),
+runs the app's per-user queries with EXPLAIN ANALYZE on the bare tables
+(migration 1, primary keys only), then applies the index migration and
+runs them again. The scratch schema is dropped afterwards unless --keep
+is given.
+
+Needs DATABASE_URL (or the DB_* settings) pointing at a database where
+the user may create schemas. Loading 10M rows takes a few minutes.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pantry_indexes --rows 10000000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from db import get_db_connection
+from migrations import MIGRATIONS
+
+SCHEMA = "bench_pantry_indexes"
+CATEGORIES = ["dairy", "meat", "fruits", "vegetables", "grains", "spices", "general"]
+
+QUERIES = {
+    # recipe_prediction.get_user_pantry
+    "pantry for recipes": (
+        "SELECT item_name, expiry_date FROM pantry_items WHERE user_id = %(user)s"
+    ),
+    # pantry.get_items, first page
+    "get-items page": (
+        "SELECT id, item_name, quantity, unit, category, expiry_date, added_date, notes "
+        "FROM pantry_items WHERE user_id = %(user)s ORDER BY id LIMIT 51"
+    ),
+    # pantry.get_items?category=...
+    "get-items category": (
+        "SELECT id, item_name, quantity, unit, category, expiry_date, added_date, notes "
+        "FROM pantry_items WHERE user_id = %(user)s AND category = %(category)s "
+        "ORDER BY id LIMIT 51"
+    ),
+    # pantry.get_items?expires_before=...
+    "expiring this week": (
+        "SELECT id, item_name, expiry_date FROM pantry_items "
+        "WHERE user_id = %(user)s AND expiry_date <= CURRENT_DATE + 7 "
+        "ORDER BY expiry_date"
+    ),
+}
+
+
+def migration(version):
+    return next(m for m in MIGRATIONS if m.version == version)
+
+
+def load(cursor, rows, users):
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+    cursor.execute(f"SET search_path TO {SCHEMA}")
+    for statement in migration(1).statements:
+        cursor.execute(statement)
+    cursor.execute(
+        "INSERT INTO users (user_id, user_name) "
+        "SELECT 'user' || g, 'User ' || g FROM generate_series(0, %s) g",
+        (users - 1,)
+    )
+    cursor.execute(
+        """
+        INSERT INTO pantry_items
+        (id, user_id, item_name, quantity, unit, category, expiry_date, added_date)
+        SELECT md5(g::text), 'user' || (g %% %(users)s), 'item ' || (g %% 997),
+               g %% 5 + 1, 'pcs', (%(categories)s::text[])[g %% 7 + 1],
+               CURRENT_DATE + (g::bigint * 7919 %% 60)::int - 10, CURRENT_DATE - (g %% 30)
+        FROM generate_series(1, %(rows)s) g
+        """,
+        {"users": users, "rows": rows, "categories": CATEGORIES}
+    )
+    cursor.execute("ANALYZE users")
+    cursor.execute("ANALYZE pantry_items")
+
+
+def measure(cursor, sql, samples):
+    """(plan summary, median ms, p95 ms) for a query over random users."""
+    timings = []
+    plan = None
+    for params in samples:
+        cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+        result = cursor.fetchone()[0][0]
+        timings.append(result["Execution Time"])
+        if plan is None:
+            plan = describe(result["Plan"])
+    timings.sort()
+    return plan, statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def describe(node):
+    """Compact one-line plan: node types (and index names) outermost first."""
+    label = node["Node Type"]
+    if "Index Name" in node:
+        label += f" ({node['Index Name']})"
+    children = [describe(child) for child in node.get("Plans", [])]
+    return label + (" <- " + ", ".join(children) if children else "")
+
+
+def report(title, cursor, samples):
+    print(f"\n== {title}")
+    print(f"{'query':<20} {'median ms':>10} {'p95 ms':>8}  plan")
+    for name, sql in QUERIES.items():
+        plan, median, p95 = measure(cursor, sql, samples)
+        print(f"{name:<20} {median:>10.2f} {p95:>8.2f}  {plan}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    samples = [
+        {"user": f"user{rng.randrange(args.users)}", "category": rng.choice(CATEGORIES)}
+        for _ in range(args.samples)
+    ]
+
+    conn = get_db_connection()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        start = time.perf_counter()
+        load(cursor, args.rows, args.users)
+        print(f"Loaded {args.rows} rows for {args.users} users "
+              f"in {time.perf_counter() - start:.0f}s")
+
+        report("primary keys only (migration 1)", cursor, samples)
+
+        start = time.perf_counter()
+        for statement in migration(2).statements:
+            cursor.execute(statement)
+        cursor.execute("ANALYZE pantry_items")
+        print(f"\nBuilt indexes in {time.perf_counter() - start:.0f}s")
+
+        report("with indexes (migration 2)", cursor, samples)
+    finally:
+        if not args.keep:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Shelf-life prediction throughput versus batch size.
+
+Compares calling prediction.predict_expiry once per item (what a client
+scanning a receipt through /prediction/predict does today) with one
+predict_expiry_batch call per batch, which runs a single DataFrame through
+the model pipeline. The prediction cache and the FoodKeeper lookup are
+disabled unless --with-cache / --with-foodkeeper are given, so the
+numbers reflect model throughput.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_predict_batch
+"""
+import argparse
+import random
+import time
+
+import prediction
+
+SAMPLE_ITEMS = [
+    ("milk", "dairy"), ("Butter", "dairy"), ("chicken breast", "meat"),
+    ("Bacon", "meat"), ("Apples", "fruits"), ("Broccoli", "vegetables"),
+    ("bread", "baked"), ("rice", "grains"), ("Salmon", "seafood"),
+    ("Barbecue sauce", "sauces"), ("paprika", "spices"), ("Baby food", "general"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1,10,50,100,500")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--with-cache", action="store_true")
+    parser.add_argument("--with-foodkeeper", action="store_true")
+    args = parser.parse_args()
+
+    prediction.FOODKEEPER_ENABLED = args.with_foodkeeper
+    if not args.with_cache:
+        prediction.prediction_cache.maxsize = 0
+
+    if prediction.get_model() is None:
+        raise SystemExit("Shelf-life model could not be loaded")
+
+    rng = random.Random(args.seed)
+    print(f"{'batch':>6} {'single items/s':>15} {'batched items/s':>16} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        items = [(*rng.choice(SAMPLE_ITEMS), "2024-01-01") for _ in range(size)]
+
+        single = batched = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            expected = [prediction.predict_expiry(*item) for item in items]
+            single = min(single, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            results = prediction.predict_expiry_batch(items)
+            batched = min(batched, time.perf_counter() - start)
+
+        assert results == expected, "batched predictions differ from single calls"
+        print(
+            f"{size:>6} {size / single:>15.0f} {size / batched:>16.0f} "
+            f"{single / batched:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Latency of query-vector construction versus pantry size.
+
+Compares the previous per-ingredient loop (one transform() per item and a
+Python-level sum of sparse vectors) against recipes_recommender's batched
+build_query_vector(), and checks that both produce identical rankings
+from one snapshot of the recipe index.
+
+Run from the repository root (recipes.json must be present):
+
+    python -m benchmarks.bench_query_vector
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+import recipes_recommender as rr
+
+
+def legacy_query_vector(pantry_ingredients, expiry_info, vectorizer):
+    weighted_vectors = []
+    for ing in pantry_ingredients:
+        days_left = expiry_info.get(ing, 30)
+        bonus = (30 - days_left) / 30.0 if days_left < 30 else 0.0
+        weight = 1.0 + bonus
+        vec = vectorizer.transform([ing])
+        weighted_vectors.append(weight * vec)
+    if weighted_vectors:
+        return sum(weighted_vectors) / len(weighted_vectors)
+    return vectorizer.transform([""])
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1,10,50,100,200,500")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = rr.get_index()
+    vectorizer = index.vectorizer
+    terms = sorted(vectorizer.vocabulary_)
+
+    print(f"{'pantry':>7} {'loop ms':>10} {'batched ms':>11} {'speedup':>8} {'same top-10':>12}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        pantry = [" ".join(rng.sample(terms, rng.randint(1, 2))) for _ in range(size)]
+        expiry = {ing: rng.randint(-5, 45) for ing in pantry}
+
+        legacy = best_of(lambda: legacy_query_vector(pantry, expiry, vectorizer), args.repeat)
+        batched = best_of(lambda: rr.build_query_vector(pantry, expiry, vectorizer), args.repeat)
+        same = np.array_equal(
+            index.search(legacy_query_vector(pantry, expiry, vectorizer), 10),
+            index.search(rr.build_query_vector(pantry, expiry, vectorizer), 10),
+        )
+        print(
+            f"{size:>7} {legacy * 1e3:>10.2f} {batched * 1e3:>11.2f} "
+            f"{legacy / batched:>7.1f}x {str(same):>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Worker startup: import time, time to first response, and RSS.
+
+Starts a fresh interpreter per run and imports app the way a gunicorn
+worker does, once per APP_WARMUP mode:
+
+- eager:      model and indexes load during import (the old behaviour)
+- background: import returns at once; a thread warms up, /readyz follows
+- lazy:       nothing loads until a request needs it
+
+Reports the median over --runs of: import time, time until GET / is
+answered, time until warm-up is done (readiness), and RSS after import
+and after warm-up. Needs the same environment as the app (RECIPES_PATH or
+a built recipe index); no database access is made.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = r"""
+import json, time
+start = time.perf_counter()
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+import app
+imported = time.perf_counter() - start
+rss_import = rss_mb()
+client = app.app.test_client()
+assert client.get("/").status_code == 200
+first_response = time.perf_counter() - start
+
+import warmup
+while not warmup.is_ready():
+    time.sleep(0.005)
+ready = time.perf_counter() - start
+print(json.dumps({
+    "import": imported, "first_response": first_response, "ready": ready,
+    "rss_import": rss_import, "rss_ready": rss_mb(),
+}))
+"""
+
+
+def run(mode):
+    env = dict(os.environ, APP_WARMUP=mode, PYTHONWARNINGS="ignore")
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default="eager,background,lazy")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"{'mode':>10} {'import s':>9} {'first / s':>10} {'ready s':>8} "
+        f"{'RSS import MB':>14} {'RSS ready MB':>13}"
+    )
+    for mode in args.modes.split(","):
+        runs = [run(mode) for _ in range(args.runs)]
+        median = {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+        print(
+            f"{mode:>10} {median['import']:>9.3f} {median['first_response']:>10.3f} "
+            f"{median['ready']:>8.3f} {median['rss_import']:>14.1f} {median['rss_ready']:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Top-k recipe retrieval latency versus corpus size.
+
+Builds synthetic TF-IDF corpora (Zipf-distributed terms, L2-normalized
+rows) and compares three ways of taking the top 10 recipes for a query:
+
+  full     cosine_similarity over every recipe + full argsort (the old path)
+  dense    cosine_similarity over every recipe + argpartition
+  pruned   recipe_index.top_k_similar: score only recipes sharing a term
+           with the query (via the CSC postings), then argpartition
+
+Run from the repository root:
+
+    python -m benchmarks.bench_topk_scaling --sizes 10000,100000,1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+from recipe_index import top_k_similar
+
+
+def term_popularity(n_terms):
+    # Zipf-like term popularity, as in real ingredient lists
+    popularity = 1.0 / np.arange(1, n_terms + 1) ** 1.1
+    return popularity / popularity.sum()
+
+
+def synthetic_corpus(n_recipes, n_terms, terms_per_recipe, rng):
+    popularity = term_popularity(n_terms)
+    cols = rng.choice(n_terms, size=n_recipes * terms_per_recipe, p=popularity)
+    rows = np.repeat(np.arange(n_recipes), terms_per_recipe)
+    data = rng.random(len(cols)) + 0.1
+    matrix = sp.csr_matrix((data, (rows, cols)), shape=(n_recipes, n_terms))
+    matrix.sum_duplicates()
+    return normalize(matrix)
+
+
+def synthetic_query(n_terms, query_terms, rng):
+    # Pantry items skew towards common ingredients too
+    cols = rng.choice(n_terms, size=query_terms, replace=False, p=term_popularity(n_terms))
+    return sp.csr_matrix(
+        (rng.random(query_terms) + 0.5, (np.zeros(query_terms, dtype=int), cols)),
+        shape=(1, n_terms),
+    )
+
+
+def full_sort(matrix, query, top_n):
+    similarities = cosine_similarity(query, matrix).flatten()
+    return np.argsort(similarities)[::-1][:top_n]
+
+
+def dense_partition(matrix, query, top_n):
+    similarities = cosine_similarity(query, matrix).flatten()
+    winners = np.argpartition(similarities, len(similarities) - top_n)[-top_n:]
+    return winners[np.argsort(similarities[winners])[::-1]]
+
+
+def median_ms(fn, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--terms", type=int, default=20000, help="vocabulary size")
+    parser.add_argument("--terms-per-recipe", type=int, default=10)
+    parser.add_argument("--query-terms", type=int, default=15)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(
+        f"{'recipes':>9} {'full ms':>9} {'dense ms':>9} {'pruned ms':>10} "
+        f"{'scored %':>9} {'same scores':>12}"
+    )
+    for size in (int(s) for s in args.sizes.split(",")):
+        matrix = synthetic_corpus(size, args.terms, args.terms_per_recipe, rng)
+        postings = matrix.tocsc()
+        queries = [synthetic_query(args.terms, args.query_terms, rng) for _ in range(args.queries)]
+
+        full = median_ms(lambda q: full_sort(matrix, q, args.top_n), queries)
+        dense = median_ms(lambda q: dense_partition(matrix, q, args.top_n), queries)
+        pruned = median_ms(lambda q: top_k_similar(postings, q, args.top_n), queries)
+
+        scored = np.mean([
+            len(np.unique(postings[:, q.indices].indices)) / size for q in queries
+        ])
+        # Row order may differ on exact ties, so compare the similarity values
+        same = all(
+            np.allclose(
+                np.sort(cosine_similarity(q, matrix[full_sort(matrix, q, args.top_n)]).ravel()),
+                np.sort(cosine_similarity(q, matrix[top_k_similar(postings, q, args.top_n)]).ravel()),
+            )
+            for q in queries
+        )
+        print(
+            f"{size:>9} {full:>9.2f} {dense:>9.2f} {pruned:>10.2f} "
+            f"{scored * 100:>8.1f}% {str(same):>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Per-worker memory of gunicorn with and without preload mode.
+
+Starts gunicorn (using gunicorn.conf.py) with --workers workers, once with
+GUNICORN_PRELOAD=0 and once with GUNICORN_PRELOAD=1. Waits for /readyz,
+drives some traffic through the model and recipe endpoints so every
+worker has touched its resources, then reads /proc/<pid>/smaps_rollup of
+the master and each worker:
+
+- USS (Private_Clean + Private_Dirty): memory only this process uses,
+  i.e. what each extra worker costs,
+- PSS: shared pages split across the processes sharing them,
+- RSS: everything mapped, shared or not.
+
+Linux only. Needs the app environment (DATABASE_URL of a migrated
+database, RECIPES_PATH or a built index); a throwaway user is created and
+removed.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_worker_memory --workers 4
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+USER_ID = "bench-worker-memory"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def call(url, body=None, method=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(
+        url, data=data, method=method, headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def memory(pid):
+    """USS, PSS and RSS of a process in MB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    uss = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return uss, fields.get("Pss", 0), fields.get("Rss", 0)
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def measure(preload, workers, requests):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, GUNICORN_PRELOAD="1" if preload else "0", APP_WARMUP="eager")
+    if preload:
+        env.pop("APP_WARMUP")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "wsgi:app", "--bind", f"127.0.0.1:{port}",
+         "--workers", str(workers)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.time() + 120
+        while call(base + "/readyz") != 200:
+            if time.time() > deadline or server.poll() is not None:
+                raise SystemExit("gunicorn did not become ready")
+            time.sleep(0.2)
+        while len(children(server.pid)) < workers:
+            time.sleep(0.2)
+
+        call(base + "/others/delete-profile?user_id=" + USER_ID, method="DELETE")
+        call(base + "/auth/signup", {"user_id": USER_ID, "user_name": "bench", "password": "pw"})
+        pantry = ["chicken", "rice", "onion", "garlic", "tomato", "milk", "butter", "egg"]
+        call(base + f"/pantry/bulk-add?user_id={USER_ID}", {"items": [
+            {"id": f"{USER_ID}-{i}", "name": name} for i, name in enumerate(pantry)
+        ]})
+        for i in range(requests):
+            # Alternating modes and growing batches miss the result caches
+            call(base + f"/recipe/get-recipes?user_id={USER_ID}&mode=similarity")
+            call(base + f"/recipe/get-recipes?user_id={USER_ID}&mode=pantry")
+            call(base + "/prediction/predict-batch", {"items": [
+                {"name": f"item {i} {j}", "category": "dairy", "buy_date": "2024-01-01"}
+                for j in range(i % 20 + 1)
+            ]})
+        call(base + "/others/delete-profile?user_id=" + USER_ID, method="DELETE")
+
+        master = memory(server.pid)
+        worker_stats = [memory(pid) for pid in children(server.pid)]
+    finally:
+        server.terminate()
+        server.wait()
+    return master, worker_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    for preload in (False, True):
+        master, workers = measure(preload, args.workers, args.requests)
+        print(f"\n== preload {'on' if preload else 'off'}, {args.workers} workers")
+        print(f"{'process':>10} {'USS MB':>8} {'PSS MB':>8} {'RSS MB':>8}")
+        print(f"{'master':>10} {master[0]:>8.1f} {master[1]:>8.1f} {master[2]:>8.1f}")
+        for i, (uss, pss, rss) in enumerate(workers):
+            print(f"{'worker ' + str(i):>10} {uss:>8.1f} {pss:>8.1f} {rss:>8.1f}")
+        total_pss = master[1] + sum(w[1] for w in workers)
+        mean_uss = sum(w[0] for w in workers) / len(workers)
+        print(f"{'total PSS':>10} {total_pss:>8.1f}   mean worker USS {mean_uss:.1f}")
+
+
+if __name__ == "__main__":
+    main()
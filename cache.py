@@ -0,0 +1,174 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_MISSING = object()
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache with an optional time-to-live.
+
+    Entries older than ttl seconds are treated as misses and dropped.
+    Hit/miss/eviction counters are kept so the cache can be sized from
+    real traffic.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default on a miss."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._data[key]
+                self._expirations += 1
+            self._misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting the least recently used entries."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """Drop key from the cache if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry. Counters are kept."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of cache counters."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+
+try:
+    import redis
+except ImportError:  # optional dependency, only needed for RedisCache
+    redis = None
+
+
+class RedisCache:
+    """TTLCache-compatible cache kept in Redis (or a compatible server).
+
+    Lets every worker process share one cache. Keys must be strings and
+    values JSON-serializable (tuples come back as lists). Memory is bounded
+    by the server: configure maxmemory with an allkeys-lru policy, which
+    makes it evict least recently used keys just like TTLCache. Server
+    errors are logged and treated as misses so the cache never fails a
+    request. Hit/miss counters are per process.
+    """
+
+    def __init__(self, url: str, ttl: Optional[float] = None, prefix: str = ""):
+        if redis is None:
+            raise RuntimeError("RedisCache needs the redis package (pip install redis)")
+        self.maxsize = None
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value for key, or default on a miss."""
+        try:
+            raw = self._client.get(self.prefix + key)
+        except Exception as e:
+            print(f"Redis cache get failed: {e}")
+            self._count("_errors")
+            raw = None
+        if raw is None:
+            self._count("_misses")
+            return default
+        self._count("_hits")
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any) -> None:
+        """Store value under key, expiring it after ttl seconds."""
+        try:
+            ttl_ms = int(self.ttl * 1000) if self.ttl is not None else None
+            self._client.set(self.prefix + key, json.dumps(value), px=ttl_ms)
+        except Exception as e:
+            print(f"Redis cache set failed: {e}")
+            self._count("_errors")
+
+    def delete(self, key: str) -> None:
+        """Drop key from the cache if present."""
+        try:
+            self._client.delete(self.prefix + key)
+        except Exception as e:
+            print(f"Redis cache delete failed: {e}")
+            self._count("_errors")
+
+    def clear(self) -> None:
+        """Drop every key under this cache's prefix. Counters are kept."""
+        try:
+            keys = list(self._client.scan_iter(match=self.prefix + "*"))
+            if keys:
+                self._client.delete(*keys)
+        except Exception as e:
+            print(f"Redis cache clear failed: {e}")
+            self._count("_errors")
+
+    def __len__(self) -> int:
+        try:
+            return sum(1 for _ in self._client.scan_iter(match=self.prefix + "*"))
+        except Exception:
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of this process's cache counters."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "backend": "redis",
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "errors": self._errors,
+            }
@@ -0,0 +1,200 @@
+"""Pandas-free inference for the shelf-life model.
+
+The model in improved_shelf_life_model.pkl is a Pipeline of a
+ColumnTransformer (OneHotEncoder / StandardScaler per input column) and a
+RandomForestRegressor. Going through DataFrame construction and
+Pipeline.predict costs milliseconds per call, far more than walking the
+trees. compile_pipeline() flattens the fitted pipeline into plain arrays:
+
+- one lookup table per one-hot encoded column (value -> feature index),
+- mean/scale per standardized column,
+- every tree's nodes concatenated into flat feature/threshold/children/value
+  arrays, with leaves pointing at themselves so all (row, tree) pairs of a
+  batch can be walked in lock-step.
+
+Predictions match sklearn's (which evaluates trees on float32 features).
+"""
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+_TREE_LEAF = -1
+
+
+class CompiledShelfLifeModel:
+    """Flat-array copy of a fitted preprocessing + random forest pipeline."""
+
+    def __init__(
+        self,
+        n_features: int,
+        one_hot: List[tuple],
+        scaled: List[tuple],
+        roots: np.ndarray,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        max_depth: int,
+    ):
+        self.n_features = n_features
+        # (column name, {value: feature index})
+        self.one_hot = one_hot
+        # (column name, feature index, mean, scale)
+        self.scaled = scaled
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.max_depth = max_depth  # informational
+        # Interleaved (left, right) children, indexed by 2 * node + go_right
+        self.children = np.stack([left, right], axis=1).ravel()
+
+        # Python lists are faster than NumPy scalars for single-row walks
+        self._roots = roots.tolist()
+        self._feature = feature.tolist()
+        self._threshold = threshold.tolist()
+        self._left = left.tolist()
+        self._right = right.tolist()
+        self._value = value.tolist()
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def features(self, row: Dict[str, Any]) -> List[float]:
+        """Dense float32-rounded feature vector for one input row."""
+        x = [0.0] * self.n_features
+        for column, lookup in self.one_hot:
+            index = lookup.get(row[column])
+            if index is not None:
+                x[index] = 1.0
+        for column, index, mean, scale in self.scaled:
+            x[index] = float(np.float32((float(row[column]) - mean) / scale))
+        return x
+
+    def feature_matrix(self, rows: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """Dense float32 feature matrix for many input rows."""
+        X = np.zeros((len(rows), self.n_features), dtype=np.float32)
+        row_index = np.arange(len(rows))
+        for column, lookup in self.one_hot:
+            index = np.array([lookup.get(row[column], -1) for row in rows])
+            known = index >= 0
+            X[row_index[known], index[known]] = 1.0
+        for column, index, mean, scale in self.scaled:
+            values = np.array([float(row[column]) for row in rows])
+            X[:, index] = (values - mean) / scale
+        return X
+
+    def predict_one(self, row: Dict[str, Any]) -> float:
+        """Prediction for a single row, walking the trees in pure Python."""
+        x = self.features(row)
+        feature, threshold = self._feature, self._threshold
+        left, right = self._left, self._right
+        total = 0.0
+        for node in self._roots:
+            nxt = left[node]
+            while nxt != node:
+                node = nxt if x[feature[node]] <= threshold[node] else right[node]
+                nxt = left[node]
+            total += self._value[node]
+        return total / len(self._roots)
+
+    def predict(self, rows: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """Predictions for many rows, walking every (row, tree) pair at once."""
+        if len(rows) == 1:
+            return np.array([self.predict_one(rows[0])])
+
+        X = self.feature_matrix(rows).ravel()
+        # One lane per (row, tree); lanes drop out once they reach a leaf
+        lane_offsets = np.repeat(np.arange(len(rows)) * self.n_features, self.n_trees)
+        nodes = np.tile(self.roots, len(rows))
+        active = np.arange(len(nodes))
+        while active.size:
+            current = nodes.take(active)
+            values = X.take(lane_offsets.take(active) + self.feature.take(current))
+            go_right = values > self.threshold.take(current)
+            following = self.children.take(2 * current + go_right)
+            nodes[active] = following
+            active = active[following != current]
+        return self.value.take(nodes).reshape(len(rows), self.n_trees).mean(axis=1)
+
+
+def compile_pipeline(pipeline: Any) -> CompiledShelfLifeModel:
+    """Compile a fitted Pipeline(ColumnTransformer, RandomForestRegressor).
+
+    Raises:
+        ValueError: if the pipeline uses a step this compiler does not support
+    """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    if len(pipeline.steps) != 2:
+        raise ValueError("Expected a (preprocessor, regressor) pipeline")
+    preproc, forest = pipeline.steps[0][1], pipeline.steps[1][1]
+    if not isinstance(preproc, ColumnTransformer):
+        raise ValueError(f"Unsupported preprocessor: {type(preproc).__name__}")
+    if not isinstance(forest, RandomForestRegressor) or forest.n_outputs_ != 1:
+        raise ValueError(f"Unsupported regressor: {type(forest).__name__}")
+
+    one_hot = []
+    scaled = []
+    for name, transformer, columns in preproc.transformers_:
+        if isinstance(transformer, str) and transformer == "drop" or not len(columns):
+            continue
+        if len(columns) != 1:
+            raise ValueError(f"Transformer {name} must take exactly one column")
+        column = columns[0]
+        start = preproc.output_indices_[name].start
+
+        if isinstance(transformer, OneHotEncoder):
+            if (
+                transformer.handle_unknown != "ignore"
+                or transformer.drop_idx_ is not None
+                or getattr(transformer, "_infrequent_enabled", False)
+            ):
+                raise ValueError(f"Unsupported OneHotEncoder options in {name}")
+            categories = transformer.categories_[0]
+            one_hot.append(
+                (column, {value: start + i for i, value in enumerate(categories.tolist())})
+            )
+        elif isinstance(transformer, StandardScaler):
+            mean = float(transformer.mean_[0]) if transformer.with_mean else 0.0
+            scale = float(transformer.scale_[0]) if transformer.with_std else 1.0
+            scaled.append((column, start, mean, scale))
+        else:
+            raise ValueError(f"Unsupported transformer: {type(transformer).__name__}")
+
+    roots, feature, threshold, left, right, value = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        ids = np.arange(tree.node_count)
+        leaf = tree.children_left == _TREE_LEAF
+        roots.append(offset)
+        # Leaves loop back to themselves (comparing feature 0 against +inf),
+        # which is how walks detect that they are done
+        feature.append(np.where(leaf, 0, tree.feature))
+        threshold.append(np.where(leaf, np.inf, tree.threshold))
+        left.append(np.where(leaf, ids, tree.children_left) + offset)
+        right.append(np.where(leaf, ids, tree.children_right) + offset)
+        value.append(tree.value[:, 0, 0])
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    return CompiledShelfLifeModel(
+        n_features=max(indices.stop for indices in preproc.output_indices_.values()),
+        one_hot=one_hot,
+        scaled=scaled,
+        roots=np.array(roots, dtype=np.intp),
+        feature=np.concatenate(feature).astype(np.intp),
+        threshold=np.concatenate(threshold).astype(np.float64),
+        left=np.concatenate(left).astype(np.intp),
+        right=np.concatenate(right).astype(np.intp),
+        value=np.concatenate(value).astype(np.float64),
+        max_depth=max_depth,
+    )
@@ -1,67 +1,272 @@
 import psycopg2
 import os
+import threading
+import time
+from contextlib import contextmanager
+from psycopg2 import extensions
 from dotenv import load_dotenv
+from metrics import METRICS_ENABLED, span
 
 # Load environment variables
 load_dotenv()
 
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_HEALTHCHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTHCHECK_INTERVAL', '30'))
+
+class TimedCursor(extensions.cursor):
+    """Cursor recording each execute() as a "db_query" span (see metrics.py)."""
+
+    def execute(self, query, vars=None):
+        with span("db_query"):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        with span("db_query"):
+            return super().executemany(query, vars_list)
+
+# Plain cursors when metrics are off, so queries pay nothing extra
+CURSOR_FACTORY = TimedCursor if METRICS_ENABLED else None
+
 def get_db_connection():
-    """Get a connection to the database."""
+    """Open a new, dedicated connection to the database.
+
+    Request handlers should borrow a pooled connection through
+    db_connection() instead.
+    """
     try:
         # Try to get the DATABASE_URL first (for production)
         DATABASE_URL = os.getenv('DATABASE_URL')
-        
-        if DATABASE_URL:
-            # Use the URL directly if available (production)
-            return psycopg2.connect(DATABASE_URL)
-        else:
-            # Fall back to individual credentials (development)
-            return psycopg2.connect(
-                dbname=os.getenv('DB_NAME'),
-                user=os.getenv('DB_USER'),
-                password=os.getenv('DB_PASSWORD'),
-                host=os.getenv('DB_HOST'),
-                port=os.getenv('DB_PORT')
-            )
+
+        with span("db_connect"):
+            if DATABASE_URL:
+                # Use the URL directly if available (production)
+                return psycopg2.connect(DATABASE_URL, cursor_factory=CURSOR_FACTORY)
+            else:
+                # Fall back to individual credentials (development)
+                return psycopg2.connect(
+                    dbname=os.getenv('DB_NAME'),
+                    user=os.getenv('DB_USER'),
+                    password=os.getenv('DB_PASSWORD'),
+                    host=os.getenv('DB_HOST'),
+                    port=os.getenv('DB_PORT'),
+                    cursor_factory=CURSOR_FACTORY
+                )
     except Exception as e:
         print(f"Error connecting to the database: {e}")
         raise
 
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of PostgreSQL connections.
+
+    Connections are opened lazily up to max_size. When the pool is
+    exhausted, callers wait (up to timeout seconds) for a connection to
+    be returned. Connections idle for longer than healthcheck_interval
+    are pinged before being handed out, and broken ones are replaced.
+    """
+
+    def __init__(self, connect, max_size, timeout, healthcheck_interval):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+
+        self._cond = threading.Condition()
+        self._idle = []  # (conn, returned_at), used LIFO
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def getconn(self, timeout=None):
+        """Check out a healthy connection, waiting if the pool is exhausted."""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    conn, returned_at = None, None
+                    self._size += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection available after {timeout:.1f}s"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            waited = time.monotonic() - start
+            self._checkouts += 1
+            self._in_use += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+
+        try:
+            if conn is not None and not self._is_healthy(conn, returned_at):
+                self._close_quietly(conn)
+                with self._cond:
+                    self._discarded += 1
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            # The slot we reserved is no longer backed by a connection
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        return conn
+
+    def putconn(self, conn):
+        """Return a connection to the pool, resetting any open transaction."""
+        keep = not conn.closed
+        if keep and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                keep = False
+
+        with self._cond:
+            self._in_use -= 1
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+                self._discarded += 1
+            self._cond.notify()
+
+        if not keep:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Borrow a connection for the duration of a with-block."""
+        with span("db_checkout"):
+            conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        """Close every idle connection. Checked-out ones close on return."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        """Snapshot of pool usage counters."""
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "wait_time_total": self._wait_time_total,
+                "wait_time_max": self._wait_time_max,
+                "wait_time_avg": (
+                    self._wait_time_total / self._checkouts if self._checkouts else 0.0
+                ),
+            }
+
+    def _is_healthy(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.healthcheck_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Get the connection pool for the current process.
+
+    Forked workers (e.g. gunicorn) must not share sockets with their
+    parent, so a new pool is created whenever the pid changes.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool(
+                    get_db_connection,
+                    max_size=DB_POOL_SIZE,
+                    timeout=DB_POOL_TIMEOUT,
+                    healthcheck_interval=DB_POOL_HEALTHCHECK_INTERVAL,
+                )
+                _pool_pid = pid
+    return _pool
+
+def db_connection(timeout=None):
+    """Borrow a pooled database connection.
+
+    Usage:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            ...
+
+    The connection is returned to the pool when the block exits; any
+    transaction left open is rolled back.
+    """
+    return get_pool().connection(timeout)
+
+def pool_stats():
+    """Usage statistics for this process's connection pool."""
+    return get_pool().stats()
+
 def init_db():
-    """Initialize the database with required tables."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Create users table if it doesn't exist
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id VARCHAR(255) PRIMARY KEY,
-                user_name VARCHAR(255),
-                password VARCHAR(255)
-            )
-        """)
-        
-        # Create pantry_items table if it doesn't exist
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS pantry_items (
-                id VARCHAR(255) PRIMARY KEY,
-                user_id VARCHAR(255) REFERENCES users(user_id),
-                item_name VARCHAR(255),
-                quantity FLOAT,
-                unit VARCHAR(50),
-                category VARCHAR(50),
-                expiry_date DATE,
-                added_date DATE,
-                notes TEXT
-            )
-        """)
-        
-        conn.commit()
-    except Exception as e:
-        print(f"Error initializing database: {e}")
-        conn.rollback()
-        raise
-    finally:
-        cursor.close()
-        conn.close()
+    """Bring the schema up to date (see migrations.py).
+
+    Kept for scripts that call it directly; the app itself no longer runs
+    DDL at import time. Deploys run `python migrations.py upgrade`.
+    """
+    from migrations import upgrade
+    upgrade()
@@ -0,0 +1,298 @@
+"""Nightly "use it before it expires" recipe suggestions for every user.
+
+Computes, for each user with pantry items, the same ranking
+recommend_recipes() returns for their pantry (TF-IDF query vector
+weighted towards soon-expiring items, cosine similarity) and stores the
+top DIGEST_TOP_N recipes in recipe_digests, for the digest notifications
+to read:
+
+    python digest_job.py [--workers N] [--chunk-size USERS] [--top-n N]
+
+Instead of one get_user_pantry() query and one search per user, the job
+streams all pantry_items ordered by user_id through a server-side cursor
+and cuts the stream into chunks of DIGEST_CHUNK_SIZE users. Each chunk
+goes to a process pool, where a worker:
+
+- vectorizes all the chunk's item names (normalized as in
+  recommend_recipes()) in one transform() call,
+- turns them into a (users x vocabulary) query matrix with one sparse
+  product against the per-user weights,
+- scores the chunk with one sparse product against the recipe vectors
+  (per index segment, see recipe_updates.LiveIndex),
+- bulk-writes the top-N rows of every user in the chunk on its own
+  connection.
+
+Workers are forked after the parent has loaded the recipe index, model
+and normalizer, so they share the memory-mapped index. The score matrix
+of a chunk holds up to users x recipes entries; chunks are scored in
+slices of at most DIGEST_MAX_CELLS entries to bound that.
+
+Users whose pantry yields no recipe sharing a term get no rows. When the
+run completes, rows it did not rewrite (users without pantry items now)
+are deleted.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from itertools import groupby
+from multiprocessing import get_all_start_methods, get_context
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from psycopg2.extras import execute_values
+
+from db import get_db_connection
+
+# Users per chunk sent to a worker
+DIGEST_CHUNK_SIZE = int(os.getenv("DIGEST_CHUNK_SIZE", "500"))
+DIGEST_WORKERS = int(os.getenv("DIGEST_WORKERS", str(os.cpu_count() or 2)))
+DIGEST_TOP_N = int(os.getenv("DIGEST_TOP_N", "10"))
+# Largest (users x recipes) score matrix scored at once
+DIGEST_MAX_CELLS = int(os.getenv("DIGEST_MAX_CELLS", str(2**25)))
+# Pantry rows fetched per round trip
+DIGEST_FETCH_SIZE = int(os.getenv("DIGEST_FETCH_SIZE", "10000"))
+
+# (user_id, [(item_name, days_until_expiry or None), ...])
+UserPantry = Tuple[str, List[Tuple[str, Optional[int]]]]
+
+_conn = None
+
+
+def stream_pantries(conn) -> Iterator[UserPantry]:
+    """Every user's pantry items, one user at a time, in user_id order."""
+    cursor = conn.cursor(name="recipe_digest_pantries")
+    cursor.itersize = DIGEST_FETCH_SIZE
+    try:
+        # Same days-left arithmetic as recipe_prediction.get_user_pantry
+        cursor.execute(
+            """
+            SELECT user_id, item_name, expiry_date - CURRENT_DATE
+            FROM pantry_items
+            WHERE user_id IS NOT NULL AND item_name IS NOT NULL
+            ORDER BY user_id, id
+            """
+        )
+        for user_id, rows in groupby(cursor, key=lambda row: row[0]):
+            yield user_id, [(name, days) for _, name, days in rows]
+    finally:
+        cursor.close()
+
+
+def chunked(pantries: Iterator[UserPantry], size: int) -> Iterator[List[UserPantry]]:
+    chunk: List[UserPantry] = []
+    for pantry in pantries:
+        chunk.append(pantry)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def query_matrix(index, chunk: Sequence[UserPantry]):
+    """One build_query_vector() row per user of the chunk, as a CSR matrix."""
+    from recipe_prediction import DEFAULT_DAYS_UNTIL_EXPIRY
+    from recipes_recommender import ingredient_weights, query_texts
+
+    names: List[str] = []
+    weights = []
+    indptr = [0]
+    for _, items in chunk:
+        ingredients = [name for name, _ in items]
+        # Later rows win for repeated names, as in get_user_pantry's dict
+        expiry_info = {
+            name: DEFAULT_DAYS_UNTIL_EXPIRY if days is None else days for name, days in items
+        }
+        weights.append(ingredient_weights(ingredients, expiry_info) / len(ingredients))
+        names.extend(ingredients)
+        indptr.append(len(names))
+    item_vectors = index.vectorizer.transform(query_texts(index.vectorizer, names))
+    per_user = sp.csr_matrix(
+        (np.concatenate(weights), np.arange(len(names)), np.array(indptr)),
+        shape=(len(chunk), len(names)),
+    )
+    return (per_user @ item_vectors).tocsr()
+
+
+def score_chunk(index, queries, top_n: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """(rows, similarities) of the top_n recipes for each query row.
+
+    Rows and ties follow LiveIndex.search: rows of the delta segment come
+    after the base, masked base rows are skipped, and equal scores go to
+    the higher row. Only recipes sharing a term with the query are
+    returned, so a row may hold fewer than top_n.
+    """
+    from recipe_index import top_k
+
+    # Cosine similarity: scale each query row to unit length
+    norms = np.sqrt(np.asarray(queries.multiply(queries).sum(axis=1)).ravel())
+    queries = sp.diags(1.0 / np.where(norms > 0, norms, 1.0)) @ queries
+
+    base = getattr(index, "base", index)
+    segments = [(base.postings.T.tocsr(), 0)]
+    delta = getattr(index, "delta", None)
+    if delta is not None:
+        segments.append((delta.postings.T.tocsr(), len(base)))
+    masked = getattr(index, "masked", np.zeros(0, dtype=np.int64))
+    n_recipes = sum(vectors.shape[1] for vectors, _ in segments)
+    step = max(1, DIGEST_MAX_CELLS // max(n_recipes, 1))
+
+    results = []
+    for start in range(0, queries.shape[0], step):
+        scored = [
+            ((queries[start:start + step] @ vectors).tocsr(), offset) for vectors, offset in segments
+        ]
+        for i in range(min(step, queries.shape[0] - start)):
+            rows, scores = [], []
+            for matrix, offset in scored:
+                lo, hi = matrix.indptr[i], matrix.indptr[i + 1]
+                rows.append(matrix.indices[lo:hi].astype(np.int64) + offset)
+                scores.append(matrix.data[lo:hi])
+            rows, scores = np.concatenate(rows), np.concatenate(scores)
+            keep = scores > 0
+            if len(masked):
+                keep &= ~np.isin(rows, masked)
+            results.append(top_k(rows[keep], scores[keep], top_n))
+    return results
+
+
+def digest_rows(index, chunk: Sequence[UserPantry], top_n: int, computed_at: datetime) -> List[tuple]:
+    """recipe_digests rows for the users of a chunk."""
+    rows = []
+    scored = score_chunk(index, query_matrix(index, chunk), top_n)
+    for (user_id, _), (recipe_rows, scores) in zip(chunk, scored):
+        records = index.records(recipe_rows.tolist())
+        rows.extend(
+            (user_id, rank, rec["id"], rec["title"], float(score), computed_at)
+            for rank, (rec, score) in enumerate(zip(records, scores), start=1)
+        )
+    return rows
+
+
+def write_digests(conn, user_ids: Sequence[str], rows: Sequence[tuple]) -> None:
+    """Replace the digests of user_ids with rows, in one transaction."""
+    with conn.cursor() as cursor:
+        cursor.execute("DELETE FROM recipe_digests WHERE user_id = ANY(%s)", (list(user_ids),))
+        if rows:
+            execute_values(
+                cursor,
+                """
+                INSERT INTO recipe_digests (user_id, rank, recipe_id, title, score, computed_at)
+                VALUES %s
+                """,
+                rows,
+                page_size=1000,
+            )
+    conn.commit()
+
+
+def _load_resources() -> None:
+    import warmup
+    warmup.start("eager")
+
+
+def _init_worker() -> None:
+    """Per worker: its own connection (never one inherited from the parent)."""
+    global _conn
+    _load_resources()
+    _conn = get_db_connection()
+
+
+def process_chunk(chunk: List[UserPantry], top_n: int, computed_at: datetime) -> Tuple[int, int]:
+    """Score and store one chunk; (users, digest rows written)."""
+    from recipes_recommender import get_index
+
+    rows = digest_rows(get_index(), chunk, top_n, computed_at)
+    try:
+        write_digests(_conn, [user_id for user_id, _ in chunk], rows)
+    except Exception:
+        _conn.rollback()
+        raise
+    return len(chunk), len(rows)
+
+
+def _executor(workers: int) -> ProcessPoolExecutor:
+    # Fork so workers share the index pages the parent mapped and touched
+    method = "fork" if "fork" in get_all_start_methods() else None
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=get_context(method), initializer=_init_worker
+    )
+
+
+def run(workers: int = DIGEST_WORKERS, chunk_size: int = DIGEST_CHUNK_SIZE, top_n: int = DIGEST_TOP_N) -> Dict[str, Any]:
+    """Recompute every user's digest. workers=0 scores in this process."""
+    global _conn
+    start = time.perf_counter()
+    computed_at = datetime.now(timezone.utc)
+    _load_resources()
+    users = written = 0
+
+    conn = get_db_connection()
+    try:
+        chunks = chunked(stream_pantries(conn), chunk_size)
+        if workers <= 0:
+            _conn = get_db_connection()
+            try:
+                for chunk in chunks:
+                    done, rows = process_chunk(chunk, top_n, computed_at)
+                    users, written = users + done, written + rows
+            finally:
+                _conn.close()
+                _conn = None
+        else:
+            with _executor(workers) as executor:
+                pending = set()
+                for chunk in chunks:
+                    # Bound the chunks held in memory while workers catch up
+                    if len(pending) >= 2 * workers:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            done, rows = future.result()
+                            users, written = users + done, written + rows
+                    pending.add(executor.submit(process_chunk, chunk, top_n, computed_at))
+                for future in pending:
+                    done, rows = future.result()
+                    users, written = users + done, written + rows
+        conn.rollback()
+
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM recipe_digests WHERE computed_at < %s", (computed_at,))
+            stale = cursor.rowcount
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        "users": users,
+        "rows": written,
+        "stale_deleted": stale,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python digest_job.py", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("--workers", type=int, default=DIGEST_WORKERS,
+                        help="worker processes (0: score in this process)")
+    parser.add_argument("--chunk-size", type=int, default=DIGEST_CHUNK_SIZE, help="users per chunk")
+    parser.add_argument("--top-n", type=int, default=DIGEST_TOP_N)
+    args = parser.parse_args(argv)
+    if args.chunk_size <= 0 or args.top_n <= 0:
+        parser.error("--chunk-size and --top-n must be positive")
+
+    result = run(args.workers, args.chunk_size, args.top_n)
+    print(
+        f"Wrote {result['rows']} digest rows for {result['users']} users in "
+        f"{result['seconds']}s ({result['stale_deleted']} stale rows deleted)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,251 @@
+"""Server-side expiry dates for pantry items written without one.
+
+Pantry writes (single and bulk) pass their rows through fill_expiry(),
+which records where each item's expiry date came from in
+pantry_items.expiry_source:
+
+- "user": the client sent the date (updates re-sending a stored date
+  keep its source, see kept_source_sql()),
+- "foodkeeper" / "model": predicted by prediction.predict_expiry_batch()
+  (FoodKeeper lookup first, then the shelf-life model), counting from the
+  item's addedDate or today,
+- "pending": left empty for the background backfill,
+- NULL: no date and no prediction (unknown name, failed prediction, or
+  prediction turned off).
+
+PANTRY_PREDICT_EXPIRY picks the mode:
+
+- "inline" (default): predict the whole batch before the write, in one
+  model call; the response already carries the dates.
+- "background": store the rows as "pending" and return at once; a daemon
+  thread in each worker predicts them in batches after the write and
+  updates the rows. The pending rows are the queue, so rows left behind
+  by a restarted worker are picked up by the next sweep, or with
+
+      python expiry_fill.py backfill
+
+- "off": store whatever the client sent.
+"""
+import os
+import sys
+import threading
+from datetime import date
+from typing import Any, List, Optional, Sequence, Tuple
+
+from db import db_connection
+from psycopg2.extras import execute_values
+
+PANTRY_PREDICT_EXPIRY = os.getenv("PANTRY_PREDICT_EXPIRY", "inline").lower()
+# Rows predicted per backfill statement, and seconds between idle sweeps
+EXPIRY_BACKFILL_BATCH = int(os.getenv("EXPIRY_BACKFILL_BATCH", "500"))
+EXPIRY_BACKFILL_INTERVAL = float(os.getenv("EXPIRY_BACKFILL_INTERVAL", "60"))
+
+SOURCE_USER = "user"
+SOURCE_PENDING = "pending"
+
+# Category used when an item has none the model knows
+DEFAULT_CATEGORY = "general"
+
+_worker: Optional[threading.Thread] = None
+_worker_pid: Optional[int] = None
+_worker_lock = threading.Lock()
+_wakeup = threading.Event()
+
+
+def _prediction_input(name: Any, category: Any, added_date: Any) -> Optional[Tuple[str, str, str]]:
+    """(name, category, buy_date) for predict_expiry_batch, or None if unpredictable."""
+    from prediction import APP_CATEGORY_MAPPING
+
+    if not isinstance(name, str) or not name.strip():
+        return None
+    if not isinstance(category, str) or category.lower() not in APP_CATEGORY_MAPPING:
+        category = DEFAULT_CATEGORY
+    if isinstance(added_date, date):
+        buy_date = added_date.isoformat()
+    elif isinstance(added_date, str) and added_date:
+        buy_date = added_date
+    else:
+        buy_date = date.today().isoformat()
+    return name, category, buy_date
+
+
+def predict(items: Sequence[Tuple[Any, Any, Any]]) -> List[Tuple[Optional[date], Optional[str]]]:
+    """Predict (expiry_date, source) for (name, category, added_date) items.
+
+    Runs every predictable item through one predict_expiry_batch() call;
+    items that cannot be predicted get (None, None).
+    """
+    from prediction import predict_expiry_batch
+
+    results: List[Tuple[Optional[date], Optional[str]]] = [(None, None)] * len(items)
+    batch, positions = [], []
+    for i, item in enumerate(items):
+        fields = _prediction_input(*item)
+        if fields is not None:
+            batch.append(fields)
+            positions.append(i)
+    if not batch:
+        return results
+
+    try:
+        predicted = predict_expiry_batch(batch)
+    except Exception as e:
+        print(f"Expiry prediction failed: {e}")
+        return results
+    for i, result in zip(positions, predicted):
+        if "error" not in result:
+            results[i] = (
+                date.fromisoformat(result["predicted_expiry_date"]), result["source"]
+            )
+    return results
+
+
+def fill_expiry(rows: Sequence[tuple]) -> List[tuple]:
+    """Fill in missing expiry dates of pantry rows and append their source.
+
+    Args:
+        rows: (id, user_id, name, quantity, expiry_date, category, unit,
+            added_date, notes) tuples, as built by pantry._validate_items
+
+    Returns:
+        list: the rows with expiry_date filled where predicted and
+            expiry_source appended as a tenth column
+    """
+    filled = []
+    missing = []
+    for row in rows:
+        if row[4]:
+            filled.append(row + (SOURCE_USER,))
+        else:
+            filled.append(row[:4] + (None,) + row[5:] + (None,))
+            missing.append(len(filled) - 1)
+
+    if not missing or PANTRY_PREDICT_EXPIRY == "off":
+        return filled
+    if PANTRY_PREDICT_EXPIRY == "background":
+        for i in missing:
+            filled[i] = filled[i][:9] + (SOURCE_PENDING,)
+        return filled
+
+    predicted = predict([(filled[i][2], filled[i][5], filled[i][7]) for i in missing])
+    for i, (expiry_date, source) in zip(missing, predicted):
+        row = filled[i]
+        filled[i] = row[:4] + (expiry_date,) + row[5:9] + (source,)
+    return filled
+
+
+def kept_source_sql(stored: str, date: str, source: str) -> str:
+    """SQL expression for the expiry_source an UPDATE writes.
+
+    Clients edit items read-modify-write, so an item with a predicted date
+    comes back with that same date, which fill_expiry() takes for a
+    user-entered one. When the written date equals the stored one, the
+    stored source is kept.
+
+    Args:
+        stored: the table (or alias) being updated
+        date, source: the new row's expiry_date and expiry_source
+    """
+    return (
+        f"CASE WHEN {source} = '{SOURCE_USER}' AND {stored}.expiry_date = {date} "
+        f"THEN {stored}.expiry_source ELSE {source} END"
+    )
+
+
+def schedule() -> None:
+    """Wake this process's backfill thread (after writing pending rows)."""
+    global _worker, _worker_pid
+    if PANTRY_PREDICT_EXPIRY != "background":
+        return
+    # gunicorn forks workers, so one thread per pid
+    if _worker is None or _worker_pid != os.getpid():
+        with _worker_lock:
+            if _worker is None or _worker_pid != os.getpid():
+                _worker = threading.Thread(
+                    target=_run, name="expiry-backfill", daemon=True
+                )
+                _worker_pid = os.getpid()
+                _worker.start()
+    _wakeup.set()
+
+
+def _run() -> None:
+    while True:
+        _wakeup.wait(EXPIRY_BACKFILL_INTERVAL)
+        _wakeup.clear()
+        try:
+            while backfill(EXPIRY_BACKFILL_BATCH) == EXPIRY_BACKFILL_BATCH:
+                pass
+        except Exception as e:
+            print(f"Expiry backfill failed: {e}")
+
+
+def backfill(limit: int = EXPIRY_BACKFILL_BATCH) -> int:
+    """Predict and store expiry dates for up to limit pending rows.
+
+    Rows are claimed with FOR UPDATE SKIP LOCKED, so several workers can
+    sweep at once without predicting the same rows.
+
+    Returns:
+        int: number of rows processed
+    """
+    from recommendation_cache import invalidate_recommendations
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """
+                SELECT id, user_id, item_name, category, added_date
+                FROM pantry_items
+                WHERE expiry_source = %s
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+                """,
+                (SOURCE_PENDING, limit)
+            )
+            pending = cursor.fetchall()
+            if not pending:
+                conn.commit()
+                return 0
+
+            predicted = predict([(row[2], row[3], row[4]) for row in pending])
+            execute_values(
+                cursor,
+                """
+                UPDATE pantry_items AS p
+                SET expiry_date = v.expiry_date, expiry_source = v.expiry_source
+                FROM (VALUES %s) AS v (id, expiry_date, expiry_source)
+                WHERE p.id = v.id
+                """,
+                [
+                    (row[0], expiry_date, source)
+                    for row, (expiry_date, source) in zip(pending, predicted)
+                ],
+                template="(%s, %s::date, %s)",
+                page_size=limit
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    for user_id in {row[1] for row in pending}:
+        invalidate_recommendations(user_id)
+    return len(pending)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        print("usage: python expiry_fill.py backfill")
+        sys.exit(2)
+    total = 0
+    while True:
+        count = backfill()
+        total += count
+        if count < EXPIRY_BACKFILL_BATCH:
+            break
+    print(f"Filled {total} pending expiry dates")
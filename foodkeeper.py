@@ -0,0 +1,274 @@
+"""Shelf-life lookup backed by the USDA FoodKeeper data (FoodKeeper.json).
+
+The Product sheet is reduced to a compact index:
+
+- keys: normalized product names ("beef", "beef ground") and keywords
+  mapped to the product rows they identify,
+- durations: a (products x storages x 2) float array of min/max shelf life
+  in days, NaN where FoodKeeper gives no numeric duration.
+
+Parsing the 1.4 MB JSON dump takes a while, so the index is pickled to a
+binary cache next to it and rebuilt only when the JSON changes.
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FOODKEEPER_PATH = os.getenv("FOODKEEPER_PATH", "FoodKeeper.json")
+FOODKEEPER_CACHE_PATH = os.getenv("FOODKEEPER_CACHE_PATH", "FoodKeeper.idx")
+
+# Bump whenever the cached index layout changes
+CACHE_VERSION = 1
+
+STORAGES = (
+    "DOP_Refrigerate",
+    "Refrigerate",
+    "Refrigerate_After_Opening",
+    "Refrigerate_After_Thawing",
+    "DOP_Pantry",
+    "Pantry",
+    "Pantry_After_Opening",
+    "DOP_Freeze",
+    "Freeze",
+)
+
+# Storage preference per web category; perishables are assumed refrigerated.
+# Freezer durations are indexed but not used: items are not assumed frozen.
+_REFRIGERATED_FIRST = (0, 1, 2, 3, 4, 5, 6)
+_PANTRY_FIRST = (4, 5, 6, 0, 1, 2, 3)
+STORAGE_ORDER = {
+    "dairy": _REFRIGERATED_FIRST,
+    "meat": _REFRIGERATED_FIRST,
+    "seafood": _REFRIGERATED_FIRST,
+    "fruits": _REFRIGERATED_FIRST,
+    "vegetables": _REFRIGERATED_FIRST,
+}
+
+METRIC_DAYS = {
+    "hours": 1 / 24,
+    "days": 1,
+    "weeks": 7,
+    "months": 30,
+    "year": 365,
+    "years": 365,
+}
+
+# Match kinds, strongest first
+NAME, NAME_SUBTITLE, KEYWORD = 0, 1, 2
+
+
+def normalize(text: str) -> str:
+    """Lowercase and collapse whitespace."""
+    return " ".join(str(text).lower().split())
+
+
+class FoodKeeperIndex:
+    """Name/keyword -> product lookup plus per-storage durations in days."""
+
+    def __init__(
+        self,
+        keys: Dict[str, List[Tuple[int, int]]],
+        product_ids: np.ndarray,
+        category_ids: np.ndarray,
+        names: List[str],
+        durations: np.ndarray,
+    ):
+        # key -> [(match kind, product row), ...]
+        self.keys = keys
+        self.product_ids = product_ids
+        self.category_ids = category_ids
+        self.names = names
+        self.durations = durations
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    def candidates(
+        self, product_name: str, category_ids: Optional[Sequence[int]] = None
+    ) -> List[int]:
+        """Product rows matching a name, best match first.
+
+        Exact name matches win over name + subtitle matches. A keyword is
+        only trusted when it points at a single product, since keywords
+        like "chicken" are shared by dozens of entries.
+        """
+        matches = self.keys.get(normalize(product_name), [])
+        if category_ids is not None:
+            allowed = set(category_ids)
+            matches = [m for m in matches if self.category_ids[m[1]] in allowed]
+
+        best = min((kind for kind, _ in matches), default=None)
+        rows = [row for kind, row in matches if kind == best]
+        if best == KEYWORD and len(rows) > 1:
+            return []
+        return rows
+
+    def shelf_life_days(
+        self,
+        product_name: str,
+        category_ids: Optional[Sequence[int]] = None,
+        storage_order: Sequence[int] = _REFRIGERATED_FIRST,
+    ) -> Optional[Tuple[float, float, str]]:
+        """(min_days, max_days, storage) for the best matching product, if any.
+
+        Storages are tried in order, so a refrigerated duration of any
+        matching product beats a pantry duration of the first one.
+        """
+        rows = self.candidates(product_name, category_ids)
+        for storage in storage_order:
+            for row in rows:
+                low, high = self.durations[row, storage]
+                if not np.isnan(low):
+                    return float(low), float(high), STORAGES[storage]
+        return None
+
+
+def _days(value, metric) -> float:
+    factor = METRIC_DAYS.get(normalize(metric)) if metric else None
+    if factor is None or value is None:
+        return np.nan
+    try:
+        return float(value) * factor
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _min_max_days(product: dict, storage: str) -> List[float]:
+    """[min, max] days for one storage column group; a lone bound is used for both."""
+    low, high = product.get(f"{storage}_Min"), product.get(f"{storage}_Max")
+    low = high if low is None else low
+    high = low if high is None else high
+    metric = product.get(f"{storage}_Metric")
+    return [_days(low, metric), _days(high, metric)]
+
+
+def parse(source_path: str = FOODKEEPER_PATH) -> FoodKeeperIndex:
+    """Build the index from the FoodKeeper JSON dump."""
+    with open(source_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    sheet = next(s for s in data["sheets"] if s["name"] == "Product")
+
+    keys: Dict[str, List[Tuple[int, int]]] = {}
+    product_ids, category_ids, names, durations = [], [], [], []
+
+    def add(key, kind, row):
+        key = normalize(key)
+        if key and (kind, row) not in keys.get(key, []):
+            keys.setdefault(key, []).append((kind, row))
+
+    for cells in sheet["data"]:
+        # Each row is a list of single-entry {column: value} dicts
+        product = {k: v for cell in cells for k, v in cell.items()}
+        name = product.get("Name")
+        if product.get("ID") is None or not name:
+            continue
+
+        row = len(product_ids)
+        product_ids.append(int(product["ID"]))
+        category_ids.append(int(product.get("Category_ID") or 0))
+        names.append(name.strip())
+
+        add(name, NAME, row)
+        if product.get("Name_subtitle"):
+            add(f"{name} {product['Name_subtitle']}", NAME_SUBTITLE, row)
+        for keyword in (product.get("Keywords") or "").split(","):
+            add(keyword, KEYWORD, row)
+
+        durations.append([_min_max_days(product, storage) for storage in STORAGES])
+
+    return FoodKeeperIndex(
+        keys,
+        np.array(product_ids, dtype=np.int32),
+        np.array(category_ids, dtype=np.int16),
+        names,
+        np.array(durations, dtype=np.float32).reshape(-1, len(STORAGES), 2),
+    )
+
+
+def _digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load(
+    source_path: str = FOODKEEPER_PATH, cache_path: str = FOODKEEPER_CACHE_PATH
+) -> FoodKeeperIndex:
+    """Load the index from the binary cache, rebuilding it if stale."""
+    digest = _digest(source_path)
+    try:
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+        if cached["version"] == CACHE_VERSION and cached["source_sha256"] == digest:
+            return FoodKeeperIndex(**cached["index"])
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Ignoring unreadable FoodKeeper cache: {e}")
+
+    index = parse(source_path)
+    payload = {
+        "version": CACHE_VERSION,
+        "source_sha256": digest,
+        "index": {
+            "keys": index.keys,
+            "product_ids": index.product_ids,
+            "category_ids": index.category_ids,
+            "names": index.names,
+            "durations": index.durations,
+        },
+    }
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path) or ".")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print(f"Could not write FoodKeeper cache: {e}")
+    return index
+
+
+_index: Optional[FoodKeeperIndex] = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def get_index() -> Optional[FoodKeeperIndex]:
+    """The process-wide index, loaded on first use (None if unavailable)."""
+    global _index, _index_loaded
+    if not _index_loaded:
+        with _index_lock:
+            if not _index_loaded:
+                try:
+                    _index = load()
+                except Exception as e:
+                    print(f"FoodKeeper data not available: {e}")
+                    _index = None
+                _index_loaded = True
+    return _index
+
+
+def shelf_life_days(
+    product_name: str, web_category: str, category_ids: Optional[Sequence[int]] = None
+) -> Optional[float]:
+    """Conservative (minimum) FoodKeeper shelf life in days, if known.
+
+    Args:
+        product_name: free-text product name
+        web_category: category from the web interface, picks the storage
+        category_ids: FoodKeeper category IDs the product may belong to
+    """
+    index = get_index()
+    if index is None:
+        return None
+    found = index.shelf_life_days(
+        product_name,
+        category_ids,
+        STORAGE_ORDER.get(web_category.lower(), _PANTRY_FIRST),
+    )
+    return found[0] if found else None
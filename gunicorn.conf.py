@@ -0,0 +1,48 @@
+"""Gunicorn settings, picked up automatically from the working directory.
+
+GUNICORN_PRELOAD=1 turns on preload mode: the master imports the app and
+loads the shelf-life model, recipe index and FoodKeeper data once
+(APP_WARMUP=eager), then forks the workers, which share those pages
+copy-on-write instead of each loading a private copy.
+
+Two things keep the shared pages from being copied back into every
+worker:
+
+- the large recipe index arrays are memory-mapped .npy files, so they
+  are file-backed and never written to;
+- gc.freeze() moves everything loaded in the master into a permanent
+  generation before forking, so the workers' garbage collector never
+  writes to those objects' headers while scanning.
+
+Without preload (the default) every worker loads its own copy, and a
+changed model file is still picked up per worker by prediction.get_model().
+Measure the difference with benchmarks/bench_worker_memory.py.
+
+GUNICORN_THREADS > 1 runs that many request threads per worker (gthread
+workers). With the default of 1 each sync worker handles one request at
+a time, so passwords.py hashes inline instead of on its pool; see its
+docstring for how the hashing limit follows the thread count.
+"""
+import gc
+import os
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+
+# Read by passwords.py when the app is imported
+os.environ["GUNICORN_THREADS"] = str(threads)
+if threads == 1:
+    # At most one hash in flight per process: a pool would add nothing
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+
+if preload_app and os.getenv("APP_WARMUP", "background") == "background":
+    # A warm-up thread would not survive the fork; load before forking instead
+    os.environ["APP_WARMUP"] = "eager"
+
+
+def when_ready(server):
+    """Runs in the master once the app is loaded, before workers are forked."""
+    if preload_app:
+        gc.collect()
+        gc.freeze()
+        server.log.info("Preloaded app; froze %d objects for the workers", gc.get_freeze_count())
@@ -0,0 +1,150 @@
+"""Inverted index from ingredient token to recipe ingredient lines.
+
+Backs the "cook with what I have" matcher: every ingredient line of every
+recipe is reduced to a set of normalized tokens ("2 cups chopped onions"
+-> {"onion"}), and each token maps to the sorted ids of the lines that
+contain it. A pantry item covers a line when all of its tokens appear in
+that line, so matching only touches the posting lists of the pantry's
+tokens and never the whole corpus.
+"""
+import re
+
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+# Quantities, units and preparation words that say nothing about the ingredient
+NOISE_WORDS = frozenset(
+    """
+    cup cups tablespoon tablespoons tbsp tbs teaspoon teaspoons tsp pound pounds
+    lb lbs ounce ounces oz gram grams kg ml liter liters litre litres quart
+    quarts pint pints gallon gallons pinch dash can cans package packages pkg
+    jar jars bottle bottles stick sticks slice slices piece pieces bunch
+    chopped diced minced sliced grated shredded crushed peeled cubed halved
+    drained rinsed softened melted beaten divided packed sifted trimmed
+    fresh freshly large small medium finely coarsely thinly roughly optional
+    taste needed
+    """.split()
+)
+
+_TOKEN_RE = re.compile(r"[a-z]+")
+
+
+def normalize_token(token):
+    """Crude singularization so "tomatoes" and "tomato" share a posting list."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith("oes"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Normalized ingredient tokens of a free-text ingredient or pantry item."""
+    tokens = []
+    for token in _TOKEN_RE.findall((text or "").lower()):
+        if len(token) < 2 or token in ENGLISH_STOP_WORDS or token in NOISE_WORDS:
+            continue
+        token = normalize_token(token)
+        if token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+class IngredientIndex:
+    """Token -> ingredient-line postings plus line -> recipe mapping.
+
+    terms:               token of each posting list, sorted
+    indptr, lines:       CSR-style posting lists of line ids (int32, sorted)
+    line_recipe:         recipe row of each line (int32)
+    recipe_line_count:   number of indexed ingredient lines per recipe (int32)
+    """
+
+    def __init__(self, terms, indptr, lines, line_recipe, recipe_line_count):
+        self.terms = terms
+        self.token_ids = {term: i for i, term in enumerate(terms)}
+        self.indptr = indptr
+        self.lines = lines
+        self.line_recipe = line_recipe
+        self.recipe_line_count = recipe_line_count
+
+    @classmethod
+    def build(cls, ingredient_lists):
+        """Index an iterable of per-recipe ingredient line lists."""
+        postings = {}
+        line_recipe = []
+        recipe_line_count = []
+        for row, ingredients in enumerate(ingredient_lists):
+            count = 0
+            for line in ingredients:
+                tokens = tokenize(line)
+                if not tokens:
+                    continue
+                line_id = len(line_recipe)
+                line_recipe.append(row)
+                count += 1
+                for token in tokens:
+                    postings.setdefault(token, []).append(line_id)
+            recipe_line_count.append(count)
+
+        terms = sorted(postings)
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(postings[term]) for term in terms], out=indptr[1:])
+        lines = np.fromiter(
+            (line_id for term in terms for line_id in postings[term]),
+            dtype=np.int32,
+            count=int(indptr[-1]),
+        )
+        return cls(
+            terms,
+            indptr,
+            lines,
+            np.asarray(line_recipe, dtype=np.int32),
+            np.asarray(recipe_line_count, dtype=np.int32),
+        )
+
+    def covered_lines(self, item):
+        """Sorted ids of the ingredient lines a pantry item covers."""
+        token_ids = [self.token_ids.get(token) for token in tokenize(item)]
+        if not token_ids or None in token_ids:
+            return self.lines[:0]
+        postings = sorted(
+            (self.lines[self.indptr[i]:self.indptr[i + 1]] for i in token_ids), key=len
+        )
+        covered = postings[0]
+        for posting in postings[1:]:
+            covered = np.intersect1d(covered, posting, assume_unique=True)
+        return covered
+
+    def match(self, pantry_items, top_n):
+        """Recipes ranked by how much of them the pantry covers.
+
+        Returns (row, matched, missing, coverage) tuples ordered by fewest
+        missing ingredient lines, then highest coverage, then most matched
+        lines, then row.
+        """
+        covered = [self.covered_lines(item) for item in pantry_items]
+        covered = [lines for lines in covered if len(lines)]
+        if not covered or top_n <= 0:
+            return []
+
+        lines = np.unique(np.concatenate(covered))
+        rows, matched = np.unique(self.line_recipe[lines], return_counts=True)
+        total = self.recipe_line_count[rows]
+        missing = total - matched
+        coverage = matched / total
+
+        if len(rows) > top_n:
+            # Pre-select on the primary key, keeping every row tied at the cut
+            cut = np.partition(missing, top_n - 1)[top_n - 1]
+            keep = np.flatnonzero(missing <= cut)
+            rows, matched, missing, coverage = (
+                rows[keep], matched[keep], missing[keep], coverage[keep]
+            )
+
+        order = np.lexsort((rows, -matched, -coverage, missing))[:top_n]
+        return [
+            (int(rows[i]), int(matched[i]), int(missing[i]), float(coverage[i]))
+            for i in order
+        ]
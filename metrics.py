@@ -0,0 +1,207 @@
+"""Request latency and span timings as Prometheus histograms.
+
+- init_app() adds request middleware recording
+  fridgepilot_http_request_duration_seconds per endpoint, serves the
+  histograms at /metrics, and times JSON serialization. /metrics also
+  reports this process's DB connection pool counters (db.pool_stats())
+  as gauges, so pool saturation shows up next to request latency.
+- span(name) / timed(name) time a block or function into
+  fridgepilot_span_duration_seconds{span=name}. The DB layer, the
+  shelf-life model and the recommender use them ("db_connect",
+  "db_query", "model_predict", "recommend_recipes", ...).
+- With SERVER_TIMING_ENABLED, every response also carries a
+  Server-Timing header summing that request's spans, which browser dev
+  tools display per request.
+
+Histograms live in each process; behind gunicorn every worker reports
+its own. METRICS_ENABLED=0 turns all of it off: span() then returns a
+shared no-op context manager and timed() leaves functions untouched.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+SERVER_TIMING_ENABLED = (
+    METRICS_ENABLED
+    and os.getenv("SERVER_TIMING_ENABLED", "0").lower() in ("1", "true", "yes")
+)
+
+# Upper bounds in seconds, as in the Prometheus client libraries plus sub-ms buckets
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram with a fixed set of label names."""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...],
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        """Lines of the Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            base = ",".join(
+                f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)
+            )
+            prefix = base + "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+request_duration = Histogram(
+    "fridgepilot_http_request_duration_seconds",
+    "Time spent handling HTTP requests.",
+    ("method", "endpoint", "status"),
+)
+span_duration = Histogram(
+    "fridgepilot_span_duration_seconds",
+    "Time spent in instrumented operations.",
+    ("span",),
+)
+
+# Span timings of the request being handled on this thread: name -> [seconds, calls]
+_request_spans: ContextVar[Optional[Dict[str, list]]] = ContextVar("request_spans", default=None)
+_NULL_SPAN = nullcontext()
+
+
+@contextmanager
+def _span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        span_duration.observe(elapsed, name)
+        spans = _request_spans.get()
+        if spans is not None:
+            entry = spans.get(name)
+            if entry is None:
+                spans[name] = [elapsed, 1]
+            else:
+                entry[0] += elapsed
+                entry[1] += 1
+
+
+def span(name: str):
+    """Context manager timing a block as span `name`."""
+    if not METRICS_ENABLED:
+        return _NULL_SPAN
+    return _span(name)
+
+
+def timed(name: str):
+    """Decorator timing every call of a function as span `name`."""
+    def decorator(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render() -> str:
+    """All histograms in the Prometheus text exposition format."""
+    return "\n".join(request_duration.render() + span_duration.render()) + "\n"
+
+
+def render_pool() -> str:
+    """This process's DB connection pool counters (db.pool_stats()) as gauges."""
+    from db import pool_stats
+
+    lines = []
+    for key, value in pool_stats().items():
+        name = f"fridgepilot_db_pool_{key}"
+        lines.append(f"# HELP {name} Connection pool {key.replace('_', ' ')}.")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def server_timing(spans: Dict[str, list], total: float) -> str:
+    """Server-Timing header value for one request's spans."""
+    parts = [
+        f'{name};dur={seconds * 1000:.2f};desc="{calls}x"'
+        for name, (seconds, calls) in spans.items()
+    ]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def init_app(app) -> None:
+    """Register the request middleware, JSON timing and /metrics on a Flask app."""
+    if not METRICS_ENABLED:
+        return
+    from flask import Response, g, request
+    from flask.json.provider import DefaultJSONProvider
+
+    class TimedJSONProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            with _span("json_serialize"):
+                return super().dumps(obj, **kwargs)
+
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+        _request_spans.set({})
+
+    @app.after_request
+    def _record(response):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        request_duration.observe(elapsed, request.method, endpoint, str(response.status_code))
+        if SERVER_TIMING_ENABLED:
+            response.headers["Server-Timing"] = server_timing(_request_spans.get() or {}, elapsed)
+        return response
+
+    @app.teardown_request
+    def _clear_spans(exc):
+        _request_spans.set(None)
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        return Response(render() + render_pool(), mimetype="text/plain; version=0.0.4")
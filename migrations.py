@@ -0,0 +1,270 @@
+"""Versioned schema migrations.
+
+Each migration runs once, in its own transaction, and is recorded in the
+schema_version table. Concurrent runs (several instances deploying at
+once) are serialized with a PostgreSQL advisory lock, so a migration is
+never applied twice.
+
+The schema is migrated as a deploy step, not when the app starts:
+
+    python migrations.py upgrade      # apply pending migrations
+    python migrations.py status       # show applied / pending versions
+
+To change the schema, append a migration to MIGRATIONS with the next
+version number. Never edit a migration that has already shipped.
+"""
+import sys
+from typing import List, NamedTuple, Optional, Tuple
+
+from db import get_db_connection
+
+# Arbitrary key for pg_advisory_lock; identifies "schema migration in progress"
+MIGRATION_LOCK_ID = 4_813_725_001
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    statements: Tuple[str, ...]
+
+
+MIGRATIONS: Tuple[Migration, ...] = (
+    Migration(1, "users and pantry_items tables", (
+        # IF NOT EXISTS so databases created by the old init_db() adopt it
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id VARCHAR(255) PRIMARY KEY,
+            user_name VARCHAR(255),
+            password VARCHAR(255)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS pantry_items (
+            id VARCHAR(255) PRIMARY KEY,
+            user_id VARCHAR(255) REFERENCES users(user_id),
+            item_name VARCHAR(255),
+            quantity FLOAT,
+            unit VARCHAR(50),
+            category VARCHAR(50),
+            expiry_date DATE,
+            added_date DATE,
+            notes TEXT
+        )
+        """,
+    )),
+    Migration(2, "pantry_items indexes for per-user queries", (
+        # get-items pages (keyset on id), pantry lookups, bulk and single writes
+        "CREATE INDEX IF NOT EXISTS pantry_items_user_id_idx "
+        "ON pantry_items (user_id, id)",
+        # expiry windows and soonest-expiring-first scans
+        "CREATE INDEX IF NOT EXISTS pantry_items_user_expiry_idx "
+        "ON pantry_items (user_id, expiry_date)",
+        # category filter, still ordered by id for keyset pagination
+        "CREATE INDEX IF NOT EXISTS pantry_items_user_category_idx "
+        "ON pantry_items (user_id, category, id)",
+    )),
+    Migration(3, "per-user expiry timeline maintained by triggers", (
+        # Item counts per (user, expiry date); items without an expiry date
+        # are counted under 'infinity'
+        """
+        CREATE TABLE pantry_expiry_timeline (
+            user_id VARCHAR(255) NOT NULL,
+            expiry_date DATE NOT NULL,
+            item_count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, expiry_date)
+        )
+        """,
+        # Statement-level, so a bulk write adjusts each (user, date) once
+        """
+        CREATE FUNCTION pantry_expiry_timeline_apply() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE pantry_expiry_timeline t
+                SET item_count = t.item_count - o.n
+                FROM (
+                    SELECT user_id, COALESCE(expiry_date, 'infinity') AS expiry_date,
+                           count(*) AS n
+                    FROM old_rows WHERE user_id IS NOT NULL
+                    GROUP BY 1, 2
+                ) o
+                WHERE t.user_id = o.user_id AND t.expiry_date = o.expiry_date;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO pantry_expiry_timeline AS t (user_id, expiry_date, item_count)
+                SELECT user_id, COALESCE(expiry_date, 'infinity'), count(*)
+                FROM new_rows WHERE user_id IS NOT NULL
+                GROUP BY 1, 2
+                ON CONFLICT (user_id, expiry_date)
+                DO UPDATE SET item_count = t.item_count + EXCLUDED.item_count;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM pantry_expiry_timeline t
+                USING (SELECT DISTINCT user_id FROM old_rows) o
+                WHERE t.user_id = o.user_id AND t.item_count <= 0;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE TRIGGER pantry_expiry_timeline_insert
+        AFTER INSERT ON pantry_items
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION pantry_expiry_timeline_apply()
+        """,
+        """
+        CREATE TRIGGER pantry_expiry_timeline_update
+        AFTER UPDATE ON pantry_items
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION pantry_expiry_timeline_apply()
+        """,
+        """
+        CREATE TRIGGER pantry_expiry_timeline_delete
+        AFTER DELETE ON pantry_items
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION pantry_expiry_timeline_apply()
+        """,
+        # Creating the triggers locked out writers, so this snapshot is exact
+        """
+        INSERT INTO pantry_expiry_timeline (user_id, expiry_date, item_count)
+        SELECT user_id, COALESCE(expiry_date, 'infinity'), count(*)
+        FROM pantry_items WHERE user_id IS NOT NULL
+        GROUP BY 1, 2
+        """,
+    )),
+    Migration(4, "pantry_items.expiry_source: user-entered or predicted expiry", (
+        # 'user', 'foodkeeper', 'model', 'pending' (queued for the
+        # background backfill) or NULL (no date and no prediction)
+        "ALTER TABLE pantry_items ADD COLUMN IF NOT EXISTS expiry_source VARCHAR(20)",
+        # Every date stored so far came from the client
+        """
+        UPDATE pantry_items SET expiry_source = 'user'
+        WHERE expiry_date IS NOT NULL AND expiry_source IS NULL
+        """,
+        # The backfill worker's queue
+        """
+        CREATE INDEX IF NOT EXISTS pantry_items_pending_expiry_idx
+        ON pantry_items (id) WHERE expiry_source = 'pending'
+        """,
+    )),
+    Migration(5, "recipe_digests: nightly per-user recipe suggestions", (
+        # Written by digest_job.py; title is copied so the notification
+        # sender does not need the recipe index
+        """
+        CREATE TABLE IF NOT EXISTS recipe_digests (
+            user_id VARCHAR(255) NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+            rank SMALLINT NOT NULL,
+            recipe_id VARCHAR(255) NOT NULL,
+            title TEXT,
+            score REAL NOT NULL,
+            computed_at TIMESTAMPTZ NOT NULL,
+            PRIMARY KEY (user_id, rank)
+        )
+        """,
+        # Rows of users the last run no longer saw
+        "CREATE INDEX IF NOT EXISTS recipe_digests_computed_at_idx "
+        "ON recipe_digests (computed_at)",
+    )),
+)
+
+
+def _ensure_version_table(cursor) -> None:
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+
+def applied_versions(cursor) -> List[int]:
+    """Versions recorded in schema_version, ascending."""
+    cursor.execute("SELECT version FROM schema_version ORDER BY version")
+    return [row[0] for row in cursor.fetchall()]
+
+
+def upgrade(target: Optional[int] = None, conn=None) -> List[int]:
+    """Apply pending migrations up to target (default: latest).
+
+    Returns:
+        list: versions applied by this call
+    """
+    own_connection = conn is None
+    if own_connection:
+        conn = get_db_connection()
+    cursor = conn.cursor()
+    applied = []
+    try:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        try:
+            _ensure_version_table(cursor)
+            conn.commit()
+            done = set(applied_versions(cursor))
+            for migration in MIGRATIONS:
+                if migration.version in done:
+                    continue
+                if target is not None and migration.version > target:
+                    break
+                try:
+                    for statement in migration.statements:
+                        cursor.execute(statement)
+                    cursor.execute(
+                        "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                        (migration.version, migration.description)
+                    )
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    print(f"Migration {migration.version} failed: {e}")
+                    raise
+                print(f"Applied migration {migration.version}: {migration.description}")
+                applied.append(migration.version)
+        finally:
+            conn.rollback()
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            conn.commit()
+    finally:
+        cursor.close()
+        if own_connection:
+            conn.close()
+    return applied
+
+
+def status(conn=None) -> List[Tuple[int, str, bool]]:
+    """(version, description, applied) for every known migration."""
+    own_connection = conn is None
+    if own_connection:
+        conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        _ensure_version_table(cursor)
+        conn.commit()
+        done = set(applied_versions(cursor))
+        return [(m.version, m.description, m.version in done) for m in MIGRATIONS]
+    finally:
+        cursor.close()
+        if own_connection:
+            conn.close()
+
+
+def main(argv: List[str]) -> int:
+    if not argv or argv[0] not in ("upgrade", "status"):
+        print("usage: python migrations.py upgrade [--target VERSION] | status")
+        return 2
+    if argv[0] == "status":
+        for version, description, done in status():
+            print(f"{version:>4} {'applied' if done else 'pending':<8} {description}")
+        return 0
+
+    target = None
+    if len(argv) == 3 and argv[1] == "--target":
+        target = int(argv[2])
+    applied = upgrade(target)
+    if not applied:
+        print("Schema is up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
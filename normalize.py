@@ -0,0 +1,266 @@
+"""Free-text product names -> canonical pantry items.
+
+Names arrive as typed on a receipt or label ("Organic 2% Milk 1gal",
+"chiken breasts"). The shelf-life model's one-hot encoder ignores any
+name it was not trained on, FoodKeeper only matches exact names, and
+the recipe vectorizer picks up every unit and brand token, so noise in
+a name costs both prediction quality and cache hits.
+
+canonicalize() maps a name to a Match:
+
+1. tokenize: lowercase letters-only tokens, dropping stop words,
+   quantities/units/preparation words (ingredient_index.NOISE_WORDS) and
+   label words (PRODUCT_NOISE_WORDS); "2%" and "1gal" disappear,
+2. correct: each token is kept if known, else replaced by its singular
+   if that is known, else by the most similar known word by trigram
+   (Dice) similarity, or dropped when nothing reaches
+   NORMALIZE_MIN_SIMILARITY,
+3. phrases: per catalog, the longest catalog entry whose words are all
+   among the tokens ("ground beef 80/20" -> "beef ground"); Match.exact
+   tells which entries account for every token ("almond milk" only
+   partly matches "milk").
+
+The known words are the recipe index vocabulary and ingredient terms,
+FoodKeeper names and keywords and the model's training names; the
+catalogs are FoodKeeper ("foodkeeper") and the model's names ("model").
+The recipe words join once the recipe index has been loaded (warm-up or
+a recipe request); normalizing never loads it, so predictions work
+without it.
+A name with no known token is returned as is (normalized).
+
+Results are memoized in normalize_cache; the index is rebuilt, and the
+cache cleared, when one of its sources is reloaded.
+"""
+import os
+import re
+import threading
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from cache import TTLCache
+
+NORMALIZE_ENABLED = os.getenv("NORMALIZE_ENABLED", "1") == "1"
+# Least trigram similarity for replacing an unknown word with a known one
+NORMALIZE_MIN_SIMILARITY = float(os.getenv("NORMALIZE_MIN_SIMILARITY", "0.6"))
+# Shorter unknown words are dropped rather than guessed: one letter apart,
+# they are as likely another word ("greek" / "green") as a typo
+NORMALIZE_MIN_FUZZY_LENGTH = 6
+
+normalize_cache = TTLCache(
+    maxsize=int(os.getenv("NORMALIZE_CACHE_SIZE", "8192")),
+    ttl=float(os.getenv("NORMALIZE_CACHE_TTL", "86400")),
+)
+
+# Words on product labels that say nothing about what the product is
+PRODUCT_NOISE_WORDS = frozenset(
+    """
+    organic natural premium pure brand value family size pack ct count gal
+    fl percent select choice grade style original classic homestyle
+    """.split()
+)
+
+_TOKEN_RE = re.compile(r"[a-z]+")
+
+
+class Match(NamedTuple):
+    # Corrected tokens joined by spaces, or the normalized input if none was known
+    text: str
+    tokens: Tuple[str, ...]
+    # catalog name -> best entry of that catalog covered by the tokens
+    phrases: Dict[str, str]
+    # catalogs whose entry accounts for every token, not just some
+    exact: FrozenSet[str] = frozenset()
+
+
+def _trigrams(word: str) -> FrozenSet[str]:
+    padded = f"${word}$"
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class Normalizer:
+    """Word vocabulary with a trigram index, plus phrase catalogs."""
+
+    def __init__(
+        self,
+        words: Iterable[str],
+        catalogs: Dict[str, Iterable[str]],
+        stop_words: FrozenSet[str],
+    ):
+        from ingredient_index import NOISE_WORDS, normalize_token
+
+        self._singular = normalize_token
+        self.ignored = frozenset(stop_words) | NOISE_WORDS | PRODUCT_NOISE_WORDS
+
+        # Phrases are matched on singular word sets, so "apples" finds "apple"
+        self.catalogs: Dict[str, List[Tuple[str, FrozenSet[str]]]] = {}
+        self._catalog_postings: Dict[str, Dict[str, List[int]]] = {}
+        vocabulary = set()
+        for name, phrases in catalogs.items():
+            entries = []
+            postings: Dict[str, List[int]] = {}
+            for phrase in phrases:
+                tokens = self.tokenize(phrase)
+                if not tokens:
+                    continue
+                vocabulary.update(tokens)
+                key = frozenset(normalize_token(token) for token in tokens)
+                for token in key:
+                    postings.setdefault(token, []).append(len(entries))
+                entries.append((phrase, key))
+            self.catalogs[name] = entries
+            self._catalog_postings[name] = postings
+
+        vocabulary.update(
+            word for word in words if word.isalpha() and word not in self.ignored
+        )
+        self.words = sorted(vocabulary)
+        self._known = frozenset(self.words)
+        self._word_grams = [_trigrams(word) for word in self.words]
+        self._gram_postings: Dict[str, List[int]] = {}
+        for i, grams in enumerate(self._word_grams):
+            for gram in grams:
+                self._gram_postings.setdefault(gram, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def tokenize(self, text: str) -> List[str]:
+        """Lowercase word tokens of text without stop, noise and label words."""
+        return [
+            token for token in _TOKEN_RE.findall(str(text).lower())
+            if len(token) >= 2 and token not in self.ignored
+        ]
+
+    def correct(self, token: str) -> Optional[str]:
+        """The known word a token stands for, or None if there is none."""
+        if token in self._known:
+            return token
+        singular = self._singular(token)
+        if singular in self._known:
+            return singular
+        if len(token) < NORMALIZE_MIN_FUZZY_LENGTH:
+            return None
+
+        grams = _trigrams(token)
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for i in self._gram_postings.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+
+        # Highest similarity, then the closest length, then alphabetical order
+        best, best_key = None, None
+        for i, count in shared.items():
+            score = 2 * count / (len(grams) + len(self._word_grams[i]))
+            key = (score, -abs(len(self.words[i]) - len(token)), -i)
+            if score >= NORMALIZE_MIN_SIMILARITY and (best_key is None or key > best_key):
+                best, best_key = i, key
+        return self.words[best] if best is not None else None
+
+    def phrase(self, catalog: str, tokens: Sequence[str]) -> Optional[Tuple[str, bool]]:
+        """Longest entry of a catalog whose words all appear in tokens.
+
+        Returns:
+            tuple: (entry, whether it accounts for every token), or None
+        """
+        key = {self._singular(token) for token in tokens}
+        entries = self.catalogs.get(catalog, [])
+        postings = self._catalog_postings.get(catalog, {})
+        best = None
+        for token in key:
+            for i in postings.get(token, ()):
+                words = entries[i][1]
+                if words <= key and (
+                    best is None
+                    or len(words) > len(entries[best][1])
+                    or (len(words) == len(entries[best][1]) and i < best)
+                ):
+                    best = i
+        if best is None:
+            return None
+        return entries[best][0], entries[best][1] == key
+
+    def match(self, text: str) -> Match:
+        tokens: List[str] = []
+        for token in self.tokenize(text):
+            corrected = self.correct(token)
+            if corrected is not None and corrected not in tokens:
+                tokens.append(corrected)
+        if not tokens:
+            return Match(" ".join(str(text).lower().split()), (), {})
+
+        phrases = {}
+        exact = set()
+        for catalog in self.catalogs:
+            found = self.phrase(catalog, tokens)
+            if found is not None:
+                phrases[catalog] = found[0]
+                if found[1]:
+                    exact.add(catalog)
+        return Match(" ".join(tokens), tuple(tokens), phrases, frozenset(exact))
+
+
+_normalizer: Optional[Normalizer] = None
+_sources: Tuple[Any, ...] = ()
+_warned_no_recipes = False
+_normalizer_lock = threading.Lock()
+
+
+def _current_sources() -> Tuple[Any, ...]:
+    import foodkeeper
+    import prediction
+    import recipes_recommender
+
+    # Only once loaded (by warm-up or a recipe request): loading it here
+    # would make every prediction wait for, or fail on, the recipe index.
+    # The base index's vocabulary only changes when updates are merged.
+    snapshot = recipes_recommender.loaded_index()
+    recipes = snapshot.base if snapshot is not None else None
+    return foodkeeper.get_index(), prediction.model_names(), recipes
+
+
+def get_normalizer() -> Optional[Normalizer]:
+    """The process-wide normalizer, rebuilt when a source was reloaded."""
+    global _normalizer, _sources, _warned_no_recipes
+    if not NORMALIZE_ENABLED:
+        return None
+    sources = _current_sources()
+    if _normalizer is None or any(a is not b for a, b in zip(sources, _sources)):
+        with _normalizer_lock:
+            if _normalizer is None or any(a is not b for a, b in zip(sources, _sources)):
+                from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+                foodkeeper_index, model_names, recipes = sources
+                words: List[str] = []
+                if recipes is not None:
+                    words.extend(recipes.vocabulary)
+                    words.extend(recipes.ingredients.terms)
+                elif not _warned_no_recipes:
+                    _warned_no_recipes = True
+                    print("Normalizing without the recipe vocabulary until the recipe index is loaded")
+                _normalizer = Normalizer(
+                    words,
+                    {
+                        "foodkeeper": list(foodkeeper_index.keys) if foodkeeper_index else [],
+                        "model": list(model_names),
+                    },
+                    ENGLISH_STOP_WORDS,
+                )
+                _sources = sources
+                normalize_cache.clear()
+    return _normalizer
+
+
+def canonicalize(text: str) -> Match:
+    """Canonical form of a free-text product name (memoized)."""
+    normalizer = get_normalizer()
+    if normalizer is None:
+        return Match(" ".join(str(text).lower().split()), (), {})
+    match = normalize_cache.get(text)
+    if match is None:
+        match = normalizer.match(text)
+        normalize_cache.set(text, match)
+    return match
+
+
+def canonical_names(names: Sequence[str]) -> List[str]:
+    """canonicalize(name).text for each name, e.g. to vectorize a pantry."""
+    return [canonicalize(name).text for name in names]
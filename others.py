@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash
-from db import get_db_connection
+from db import db_connection
+from passwords import HashingBusy, busy_response, hash_password
+from recommendation_cache import invalidate_recommendations
 from typing import Dict, Any, Tuple
 
 # Initialize blueprint
@@ -18,28 +19,27 @@ def getname() -> Tuple[Dict[str, Any], int]:
         if not user_id:
             return jsonify({"message": "Missing user_id"}), 400
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
 
-        try:
-            cursor.execute(
-                "SELECT user_name FROM users WHERE user_id = %s", 
-                (user_id,)
-            )
-            row = cursor.fetchone()
+            try:
+                cursor.execute(
+                    "SELECT user_name FROM users WHERE user_id = %s", 
+                    (user_id,)
+                )
+                row = cursor.fetchone()
             
-            if row is None:
-                return jsonify({"message": "User not found"}), 404
+                if row is None:
+                    return jsonify({"message": "User not found"}), 404
                 
-            return jsonify({
-                "message": "User name retrieved successfully", 
-                "name": row[0]
-            }), 200
-        except Exception as e:
-            return jsonify({"message": "Error fetching user", "error": str(e)}), 500
-        finally:
-            cursor.close()
-            conn.close()
+                return jsonify({
+                    "message": "User name retrieved successfully", 
+                    "name": row[0]
+                }), 200
+            except Exception as e:
+                return jsonify({"message": "Error fetching user", "error": str(e)}), 500
+            finally:
+                cursor.close()
     except Exception as e:
         return jsonify({"message": "Server error", "error": str(e)}), 500
 
@@ -67,30 +67,32 @@ def update_profile() -> Tuple[Dict[str, Any], int]:
             params.append(data["name"].strip())
         if "password" in data and data["password"].strip():
             updates.append("password = %s")
-            params.append(generate_password_hash(data["password"].strip()))
+            try:
+                params.append(hash_password(data["password"].strip()))
+            except HashingBusy:
+                return busy_response()
         
         if not updates:
             return jsonify({"message": "No valid fields to update"}), 400
 
         params.append(user_id)
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
 
-        try:
-            query = f"UPDATE users SET {', '.join(updates)} WHERE user_id = %s"
-            cursor.execute(query, tuple(params))
-            conn.commit()
+            try:
+                query = f"UPDATE users SET {', '.join(updates)} WHERE user_id = %s"
+                cursor.execute(query, tuple(params))
+                conn.commit()
             
-            if cursor.rowcount == 0:
-                return jsonify({"message": "User not found"}), 404
+                if cursor.rowcount == 0:
+                    return jsonify({"message": "User not found"}), 404
                 
-            return jsonify({"message": "Profile updated successfully"}), 200
-        except Exception as e:
-            conn.rollback()
-            return jsonify({"message": "Failed to update profile", "error": str(e)}), 500
-        finally:
-            cursor.close()
-            conn.close()
+                return jsonify({"message": "Profile updated successfully"}), 200
+            except Exception as e:
+                conn.rollback()
+                return jsonify({"message": "Failed to update profile", "error": str(e)}), 500
+            finally:
+                cursor.close()
     except Exception as e:
         return jsonify({"message": "Server error", "error": str(e)}), 500
 
@@ -106,39 +108,39 @@ def delete_profile() -> Tuple[Dict[str, Any], int]:
         if not user_id:
             return jsonify({"message": "Missing user_id"}), 400
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
 
-        try:
-            # Start transaction
-            cursor.execute("BEGIN")
+            try:
+                # Start transaction
+                cursor.execute("BEGIN")
             
-            # Delete pantry items first (foreign key constraint)
-            cursor.execute(
-                "DELETE FROM pantry_items WHERE user_id = %s", 
-                (user_id,)
-            )
+                # Delete pantry items first (foreign key constraint)
+                cursor.execute(
+                    "DELETE FROM pantry_items WHERE user_id = %s", 
+                    (user_id,)
+                )
             
-            # Delete user record
-            cursor.execute(
-                "DELETE FROM users WHERE user_id = %s", 
-                (user_id,)
-            )
+                # Delete user record
+                cursor.execute(
+                    "DELETE FROM users WHERE user_id = %s", 
+                    (user_id,)
+                )
             
-            if cursor.rowcount == 0:
-                cursor.execute("ROLLBACK")
-                return jsonify({"message": "User not found"}), 404
+                if cursor.rowcount == 0:
+                    cursor.execute("ROLLBACK")
+                    return jsonify({"message": "User not found"}), 404
             
-            # Commit transaction
-            cursor.execute("COMMIT")
-            return jsonify({
-                "message": "Profile and associated data deleted successfully"
-            }), 200
-        except Exception as e:
-            cursor.execute("ROLLBACK")
-            return jsonify({"message": "Failed to delete profile", "error": str(e)}), 500
-        finally:
-            cursor.close()
-            conn.close()
+                # Commit transaction
+                cursor.execute("COMMIT")
+                invalidate_recommendations(user_id)
+                return jsonify({
+                    "message": "Profile and associated data deleted successfully"
+                }), 200
+            except Exception as e:
+                cursor.execute("ROLLBACK")
+                return jsonify({"message": "Failed to delete profile", "error": str(e)}), 500
+            finally:
+                cursor.close()
     except Exception as e:
         return jsonify({"message": "Server error", "error": str(e)}), 500
\ No newline at end of file
@@ -1,10 +1,45 @@
-from flask import Blueprint, request, jsonify
-from db import get_db_connection
-from typing import Dict, List, Any
+from flask import Blueprint, Response, json, request, jsonify, stream_with_context
+from datetime import date, datetime
+from db import db_connection
+from recommendation_cache import invalidate_recommendations
+from expiry_fill import (
+    SOURCE_PENDING,
+    SOURCE_USER,
+    fill_expiry,
+    kept_source_sql,
+    schedule as schedule_expiry_backfill,
+)
+from psycopg2.extras import execute_values
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+import base64
+import os
+import uuid
 
 # Initialize blueprint
 pantry_bp = Blueprint("pantry", __name__)
 
+ITEM_COLUMNS = (
+    "id, item_name, quantity, unit, category, expiry_date, added_date, notes, expiry_source"
+)
+
+# Insert column order of write rows (see _validate_items and expiry_fill)
+WRITE_COLUMNS = (
+    "id, user_id, item_name, quantity, expiry_date, category, unit, added_date, notes, "
+    "expiry_source"
+)
+
+# Largest page /get-items serves, and rows fetched per round trip when streaming
+PANTRY_PAGE_MAX = int(os.getenv("PANTRY_PAGE_MAX", "1000"))
+PANTRY_STREAM_FETCH_SIZE = int(os.getenv("PANTRY_STREAM_FETCH_SIZE", "500"))
+
+# Most items one bulk request may carry, and rows per multi-row VALUES statement
+PANTRY_BULK_MAX = int(os.getenv("PANTRY_BULK_MAX", "5000"))
+PANTRY_BULK_PAGE_SIZE = int(os.getenv("PANTRY_BULK_PAGE_SIZE", "1000"))
+
+# Default and largest look-ahead, in days, for /expiring
+PANTRY_EXPIRING_DAYS = int(os.getenv("PANTRY_EXPIRING_DAYS", "7"))
+PANTRY_EXPIRING_MAX_DAYS = 365
+
 @pantry_bp.route("/add-item", methods=["POST"])
 def add_item() -> tuple[Dict[str, Any], int]:
     """Add a new item to user's pantry.
@@ -20,31 +55,28 @@ def add_item() -> tuple[Dict[str, Any], int]:
             return jsonify({"message": "Missing user_id or item data"}), 400
         
         item = data["item"]
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        # A missing expiryDate is predicted (or queued) by expiry_fill
+        row = fill_expiry([_item_row(item, user_id)])[0]
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        try:
-            cursor.execute(
-                """
-                INSERT INTO pantry_items 
-                (id, user_id, item_name, quantity, expiry_date, category, unit, added_date, notes) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    item.get("id"), user_id, item.get("name"), 
-                    item.get("quantity"), item.get("expiryDate"),
-                    item.get("category"), item.get("unit"), 
-                    item.get("addedDate"), item.get("notes")
+            try:
+                cursor.execute(
+                    f"""
+                    INSERT INTO pantry_items ({WRITE_COLUMNS})
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    row
                 )
-            )
-            conn.commit()
-            return jsonify({"message": "Item added successfully"}), 201
-        except Exception as e:
-            conn.rollback()
-            return jsonify({"message": "Error adding item", "error": str(e)}), 500
-        finally:
-            cursor.close()
-            conn.close()
+                conn.commit()
+                invalidate_recommendations(user_id)
+                schedule_expiry_backfill()
+                return jsonify(_write_response("Item added successfully", row)), 201
+            except Exception as e:
+                conn.rollback()
+                return jsonify({"message": "Error adding item", "error": str(e)}), 500
+            finally:
+                cursor.close()
     except Exception as e:
         return jsonify({"message": "Server error", "error": str(e)}), 500
 
@@ -63,31 +95,38 @@ def update_item() -> tuple[Dict[str, Any], int]:
             return jsonify({"message": "Missing user_id or item data"}), 400
 
         item = data["item"]
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        row = fill_expiry([_item_row(item, user_id)])[0]
+        item_id, _, name, quantity, expiry_date, category, unit, added_date, notes, source = row
+        with db_connection() as conn:
+            cursor = conn.cursor()
 
-        try:
-            cursor.execute(
-                """
-                UPDATE pantry_items 
-                SET item_name=%s, quantity=%s, expiry_date=%s, category=%s, 
-                    unit=%s, added_date=%s, notes=%s 
-                WHERE id=%s AND user_id=%s
-                """,
-                (
-                    item.get("name"), item.get("quantity"), item.get("expiryDate"), 
-                    item.get("category"), item.get("unit"), item.get("addedDate"), 
-                    item.get("notes"), item.get("id"), user_id
+            try:
+                cursor.execute(
+                    f"""
+                    UPDATE pantry_items 
+                    SET item_name=%s, quantity=%s, expiry_date=%s, category=%s, 
+                        unit=%s, added_date=%s, notes=%s,
+                        expiry_source={kept_source_sql("pantry_items", "%s::date", "%s")}
+                    WHERE id=%s AND user_id=%s
+                    RETURNING expiry_date, expiry_source
+                    """,
+                    (
+                        name, quantity, expiry_date, category, unit, added_date,
+                        notes, source, expiry_date, source, item_id, user_id
+                    )
                 )
-            )
-            conn.commit()
-            return jsonify({"message": "Item updated successfully"}), 200
-        except Exception as e:
-            conn.rollback()
-            return jsonify({"message": "Error updating item", "error": str(e)}), 500
-        finally:
-            cursor.close()
-            conn.close()
+                stored = cursor.fetchone()
+                if stored:
+                    row = row[:4] + (stored[0],) + row[5:9] + (stored[1],)
+                conn.commit()
+                invalidate_recommendations(user_id)
+                schedule_expiry_backfill()
+                return jsonify(_write_response("Item updated successfully", row)), 200
+            except Exception as e:
+                conn.rollback()
+                return jsonify({"message": "Error updating item", "error": str(e)}), 500
+            finally:
+                cursor.close()
     except Exception as e:
         return jsonify({"message": "Server error", "error": str(e)}), 500
 
@@ -104,29 +143,225 @@ def delete_item() -> tuple[Dict[str, Any], int]:
         if not user_id or not item_id:
             return jsonify({"message": "Missing user_id or item id"}), 400
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        try:
-            cursor.execute(
-                "DELETE FROM pantry_items WHERE id=%s AND user_id=%s", 
-                (item_id, user_id)
-            )
-            conn.commit()
-            return jsonify({"message": "Item deleted successfully"}), 200
-        except Exception as e:
-            conn.rollback()
-            return jsonify({"message": "Error deleting item", "error": str(e)}), 500
-        finally:
-            cursor.close()
-            conn.close()
+            try:
+                cursor.execute(
+                    "DELETE FROM pantry_items WHERE id=%s AND user_id=%s", 
+                    (item_id, user_id)
+                )
+                conn.commit()
+                invalidate_recommendations(user_id)
+                return jsonify({"message": "Item deleted successfully"}), 200
+            except Exception as e:
+                conn.rollback()
+                return jsonify({"message": "Error deleting item", "error": str(e)}), 500
+            finally:
+                cursor.close()
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+@pantry_bp.route("/bulk-add", methods=["POST"])
+def bulk_add() -> tuple[Dict[str, Any], int]:
+    """Add many items to a user's pantry in one transaction.
+
+    Body: {"items": [item, ...], "upsert": false}. With upsert, items whose
+    id already exists for this user are overwritten; otherwise they are
+    skipped. Each item gets a result in request order with a status of
+    "inserted", "updated", "skipped" or "invalid".
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    try:
+        data = request.get_json(silent=True)
+        user_id = request.args.get("user_id")
+        items, error = _bulk_items(data, "items")
+        if not user_id or error:
+            return jsonify({"message": error or "Missing user_id"}), 400
+        upsert = bool(data.get("upsert"))
+
+        results, rows = _validate_items(items, user_id)
+        rows = _with_expiry(rows)
+        if upsert:
+            conflict = f"""
+                ON CONFLICT (id) DO UPDATE SET
+                    item_name = EXCLUDED.item_name, quantity = EXCLUDED.quantity,
+                    expiry_date = EXCLUDED.expiry_date, category = EXCLUDED.category,
+                    unit = EXCLUDED.unit, added_date = EXCLUDED.added_date,
+                    notes = EXCLUDED.notes, expiry_source = {kept_source_sql(
+                        "pantry_items", "EXCLUDED.expiry_date", "EXCLUDED.expiry_source"
+                    )}
+                WHERE pantry_items.user_id = EXCLUDED.user_id
+            """
+        else:
+            conflict = "ON CONFLICT (id) DO NOTHING"
+
+        with db_connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                written = {}
+                if rows:
+                    # xmax is 0 only for freshly inserted row versions
+                    returned = execute_values(
+                        cursor,
+                        f"""
+                        INSERT INTO pantry_items ({WRITE_COLUMNS})
+                        VALUES %s
+                        {conflict}
+                        RETURNING id, (xmax = 0)
+                        """,
+                        [row for _, row in rows],
+                        page_size=PANTRY_BULK_PAGE_SIZE,
+                        fetch=True
+                    )
+                    written = dict(returned)
+                conn.commit()
+                invalidate_recommendations(user_id)
+                schedule_expiry_backfill()
+            except Exception as e:
+                conn.rollback()
+                return jsonify({"message": "Error adding items", "error": str(e)}), 500
+            finally:
+                cursor.close()
+
+        reason = "id belongs to another user" if upsert else "id already exists"
+        for index, row in rows:
+            item_id = row[0]
+            if item_id not in written:
+                results[index] = {"id": item_id, "status": "skipped", "error": reason}
+            else:
+                results[index] = {
+                    "id": item_id, "status": "inserted" if written[item_id] else "updated"
+                }
+        return jsonify(_bulk_response("Items processed", results)), 200
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+@pantry_bp.route("/bulk-update", methods=["PUT"])
+def bulk_update() -> tuple[Dict[str, Any], int]:
+    """Update many pantry items with a single UPDATE ... FROM (VALUES ...).
+
+    Body: {"items": [item, ...]}. Each item gets a result in request order
+    with a status of "updated", "not_found" or "invalid".
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    try:
+        data = request.get_json(silent=True)
+        user_id = request.args.get("user_id")
+        items, error = _bulk_items(data, "items")
+        if not user_id or error:
+            return jsonify({"message": error or "Missing user_id"}), 400
+
+        results, rows = _validate_items(items, user_id)
+        rows = _with_expiry(rows)
+
+        with db_connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                updated = set()
+                if rows:
+                    # VALUES rows are untyped text; cast to the column types
+                    returned = execute_values(
+                        cursor,
+                        f"""
+                        UPDATE pantry_items AS p
+                        SET item_name = v.item_name, quantity = v.quantity,
+                            expiry_date = v.expiry_date, category = v.category,
+                            unit = v.unit, added_date = v.added_date, notes = v.notes,
+                            expiry_source = {kept_source_sql("p", "v.expiry_date", "v.expiry_source")}
+                        FROM (VALUES %s) AS v
+                            (id, user_id, item_name, quantity, expiry_date,
+                             category, unit, added_date, notes, expiry_source)
+                        WHERE p.id = v.id AND p.user_id = v.user_id
+                        RETURNING p.id
+                        """,
+                        [row for _, row in rows],
+                        template="(%s, %s, %s, %s::float, %s::date, %s, %s, %s::date, %s, %s)",
+                        page_size=PANTRY_BULK_PAGE_SIZE,
+                        fetch=True
+                    )
+                    updated = {row[0] for row in returned}
+                conn.commit()
+                invalidate_recommendations(user_id)
+                schedule_expiry_backfill()
+            except Exception as e:
+                conn.rollback()
+                return jsonify({"message": "Error updating items", "error": str(e)}), 500
+            finally:
+                cursor.close()
+
+        for index, row in rows:
+            item_id = row[0]
+            if item_id in updated:
+                results[index] = {"id": item_id, "status": "updated"}
+            else:
+                results[index] = {"id": item_id, "status": "not_found", "error": "Item not found"}
+        return jsonify(_bulk_response("Items processed", results)), 200
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+@pantry_bp.route("/bulk-delete", methods=["DELETE"])
+def bulk_delete() -> tuple[Dict[str, Any], int]:
+    """Delete many pantry items in one statement.
+
+    Body: {"ids": [id, ...]}. Each id gets a result in request order with a
+    status of "deleted" or "not_found".
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    try:
+        data = request.get_json(silent=True)
+        user_id = request.args.get("user_id")
+        ids, error = _bulk_items(data, "ids")
+        if not user_id or error:
+            return jsonify({"message": error or "Missing user_id"}), 400
+        ids = [str(item_id) for item_id in ids]
+
+        with db_connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                cursor.execute(
+                    "DELETE FROM pantry_items WHERE user_id=%s AND id = ANY(%s) RETURNING id",
+                    (user_id, ids)
+                )
+                deleted = {row[0] for row in cursor.fetchall()}
+                conn.commit()
+                invalidate_recommendations(user_id)
+            except Exception as e:
+                conn.rollback()
+                return jsonify({"message": "Error deleting items", "error": str(e)}), 500
+            finally:
+                cursor.close()
+
+        results = [
+            {"id": item_id, "status": "deleted"} if item_id in deleted
+            else {"id": item_id, "status": "not_found", "error": "Item not found"}
+            for item_id in ids
+        ]
+        return jsonify(_bulk_response("Items processed", results)), 200
     except Exception as e:
         return jsonify({"message": "Server error", "error": str(e)}), 500
 
 @pantry_bp.route("/get-items", methods=["GET"])
 def get_items() -> tuple[Dict[str, Any], int]:
-    """Get all pantry items for a user.
-    
+    """Get pantry items for a user.
+
+    Query parameters (all optional besides user_id):
+        limit: page size; enables keyset pagination and a next_cursor
+        cursor: next_cursor from the previous page
+        category: only items in this category
+        expires_after, expires_before: YYYY-MM-DD expiry window (inclusive)
+        format: "ndjson" streams one item per line through a server-side
+            cursor instead of building a single JSON document
+
     Returns:
         tuple: (response_json, status_code)
     """
@@ -135,40 +370,306 @@ def get_items() -> tuple[Dict[str, Any], int]:
         if not user_id:
             return jsonify({"message": "Missing user_id"}), 400
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute(
-                """
-                SELECT id, item_name, quantity, unit, category, 
-                       expiry_date, added_date, notes 
-                FROM pantry_items 
-                WHERE user_id=%s
-                """,
-                (user_id,)
+            query, params, limit = _items_query(user_id, request.args)
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+
+        if request.args.get("format") == "ndjson":
+            return Response(
+                stream_with_context(_stream_items(query, params)),
+                mimetype="application/x-ndjson"
             )
-            rows = cursor.fetchall()
-            
-            items = [{
-                "id": row[0],
-                "name": row[1],
-                "quantity": row[2],
-                "unit": row[3],
-                "category": row[4],
-                "expiryDate": row[5],
-                "addedDate": row[6],
-                "notes": row[7]
-            } for row in rows]
 
+        with db_connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+
+                next_cursor = None
+                if limit is not None and len(rows) > limit:
+                    # We fetched one extra row to know whether a next page exists
+                    rows = rows[:limit]
+                    next_cursor = _encode_cursor(rows[-1][0])
+
+                response = {
+                    "message": "Items retrieved successfully",
+                    "data": [_row_to_item(row) for row in rows]
+                }
+                if limit is not None:
+                    response["next_cursor"] = next_cursor
+                return jsonify(response), 200
+            except Exception as e:
+                return jsonify({"message": "Error fetching items", "error": str(e)}), 500
+            finally:
+                cursor.close()
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+@pantry_bp.route("/expiring", methods=["GET"])
+def get_expiring() -> tuple[Dict[str, Any], int]:
+    """Expiry overview for a user's pantry.
+
+    Bucket counts come from pantry_expiry_timeline, a per-user count of
+    items by expiry date that triggers keep current on every write, so
+    they never scan the pantry. The items expiring within `days` (expired
+    ones included) are read through the (user_id, expiry_date) index.
+
+    Query parameters:
+        days: look-ahead window for the item list (default 7)
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    try:
+        user_id = request.args.get("user_id")
+        if not user_id:
+            return jsonify({"message": "Missing user_id"}), 400
+        try:
+            days = int(request.args.get("days", PANTRY_EXPIRING_DAYS))
+        except ValueError:
+            return jsonify({"message": "days must be an integer"}), 400
+        if not 0 <= days <= PANTRY_EXPIRING_MAX_DAYS:
             return jsonify({
-                "message": "Items retrieved successfully", 
-                "data": items
-            }), 200
+                "message": f"days must be between 0 and {PANTRY_EXPIRING_MAX_DAYS}"
+            }), 400
+
+        with db_connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                cursor.execute(
+                    """
+                    SELECT
+                        COALESCE(SUM(item_count) FILTER (
+                            WHERE expiry_date < CURRENT_DATE), 0),
+                        COALESCE(SUM(item_count) FILTER (
+                            WHERE expiry_date = CURRENT_DATE), 0),
+                        COALESCE(SUM(item_count) FILTER (
+                            WHERE expiry_date BETWEEN CURRENT_DATE + 1 AND CURRENT_DATE + 3), 0),
+                        COALESCE(SUM(item_count) FILTER (
+                            WHERE expiry_date BETWEEN CURRENT_DATE + 4 AND CURRENT_DATE + 7), 0),
+                        COALESCE(SUM(item_count) FILTER (
+                            WHERE expiry_date > CURRENT_DATE + 7 AND expiry_date < 'infinity'), 0),
+                        COALESCE(SUM(item_count) FILTER (
+                            WHERE expiry_date = 'infinity'), 0)
+                    FROM pantry_expiry_timeline
+                    WHERE user_id = %s
+                    """,
+                    (user_id,)
+                )
+                counts = cursor.fetchone()
+                buckets = dict(zip(
+                    ("expired", "today", "within3Days", "within7Days", "later", "noExpiry"),
+                    (int(count) for count in counts)
+                ))
+
+                cursor.execute(
+                    f"""
+                    SELECT {ITEM_COLUMNS}, expiry_date - CURRENT_DATE
+                    FROM pantry_items
+                    WHERE user_id = %s AND expiry_date <= CURRENT_DATE + %s
+                    ORDER BY expiry_date, id
+                    LIMIT %s
+                    """,
+                    (user_id, days, PANTRY_PAGE_MAX)
+                )
+                items = []
+                for row in cursor.fetchall():
+                    item = _row_to_item(row)
+                    item["daysLeft"] = row[-1]
+                    items.append(item)
+
+                return jsonify({
+                    "message": "Expiring items retrieved successfully",
+                    "buckets": buckets,
+                    "days": days,
+                    "data": items
+                }), 200
+            except Exception as e:
+                return jsonify({"message": "Error fetching expiring items", "error": str(e)}), 500
+            finally:
+                cursor.close()
+    except Exception as e:
+        return jsonify({"message": "Server error", "error": str(e)}), 500
+
+def _row_to_item(row: tuple) -> Dict[str, Any]:
+    """Shape a pantry_items row (in ITEM_COLUMNS order) for the API."""
+    return {
+        "id": row[0],
+        "name": row[1],
+        "quantity": row[2],
+        "unit": row[3],
+        "category": row[4],
+        "expiryDate": row[5],
+        "addedDate": row[6],
+        "notes": row[7],
+        "expirySource": row[8]
+    }
+
+def _item_row(item: Dict[str, Any], user_id: str) -> tuple:
+    """A single add/update item as a write row, values as the client sent them."""
+    return (
+        item.get("id"), user_id, item.get("name"), item.get("quantity"),
+        item.get("expiryDate") or None, item.get("category"), item.get("unit"),
+        item.get("addedDate"), item.get("notes")
+    )
+
+def _write_response(message: str, row: tuple) -> Dict[str, Any]:
+    """Single-item write response; reports the expiry date when it was predicted."""
+    response: Dict[str, Any] = {"message": message, "expirySource": row[9]}
+    if row[9] not in (None, SOURCE_USER, SOURCE_PENDING):
+        response["expiryDate"] = row[4].isoformat()
+    return response
+
+def _encode_cursor(item_id: str) -> str:
+    return base64.urlsafe_b64encode(item_id.encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor, altchars=b"-_", validate=True).decode("utf-8")
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _parse_date(value: str, name: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError(f"{name} must be in YYYY-MM-DD format")
+
+def _items_query(user_id: str, args: Any) -> Tuple[str, tuple, Optional[int]]:
+    """Build the item query for get_items from its query parameters.
+
+    Items are ordered by id so pages can continue from the last id seen
+    (keyset pagination) instead of using OFFSET.
+
+    Returns:
+        tuple: (sql, params, limit); limit is None when not paginating
+
+    Raises:
+        ValueError: if a parameter is invalid
+    """
+    conditions = ["user_id = %s"]
+    params: List[Any] = [user_id]
+
+    if args.get("cursor"):
+        conditions.append("id > %s")
+        params.append(_decode_cursor(args["cursor"]))
+    if args.get("category"):
+        conditions.append("category = %s")
+        params.append(args["category"])
+    if args.get("expires_after"):
+        conditions.append("expiry_date >= %s")
+        params.append(_parse_date(args["expires_after"], "expires_after"))
+    if args.get("expires_before"):
+        conditions.append("expiry_date <= %s")
+        params.append(_parse_date(args["expires_before"], "expires_before"))
+
+    query = f"""
+        SELECT {ITEM_COLUMNS}
+        FROM pantry_items
+        WHERE {" AND ".join(conditions)}
+        ORDER BY id
+    """
+
+    limit = None
+    if args.get("limit"):
+        try:
+            limit = int(args["limit"])
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if not 1 <= limit <= PANTRY_PAGE_MAX:
+            raise ValueError(f"limit must be between 1 and {PANTRY_PAGE_MAX}")
+        query += " LIMIT %s"
+        params.append(limit + 1)
+
+    return query, tuple(params), limit
+
+def _bulk_items(data: Any, key: str) -> Tuple[List[Any], Optional[str]]:
+    """The array under key in a bulk request body, or an error message."""
+    if not isinstance(data, dict) or not isinstance(data.get(key), list) or not data[key]:
+        return [], f"Missing {key} array"
+    if len(data[key]) > PANTRY_BULK_MAX:
+        return [], f"At most {PANTRY_BULK_MAX} {key} per request"
+    return data[key], None
+
+def _validate_items(
+    items: List[Any], user_id: str
+) -> Tuple[List[Optional[Dict[str, Any]]], List[Tuple[int, tuple]]]:
+    """Check bulk items and turn the valid ones into insert rows.
+
+    Invalid items are reported individually instead of failing the whole
+    batch. An id repeated within the request is only written once, since a
+    single statement cannot touch the same row twice.
+
+    Returns:
+        tuple: (results with None for each valid item, [(index, row), ...])
+    """
+    results: List[Optional[Dict[str, Any]]] = []
+    rows: List[Tuple[int, tuple]] = []
+    seen = set()
+    for index, item in enumerate(items):
+        item_id = item.get("id") if isinstance(item, dict) else None
+        try:
+            if not isinstance(item, dict) or item_id in (None, ""):
+                raise ValueError("Missing item id")
+            item_id = str(item_id)
+            if item_id in seen:
+                raise ValueError("Duplicate id in request")
+            quantity = item.get("quantity")
+            if quantity is not None:
+                try:
+                    quantity = float(quantity)
+                except (TypeError, ValueError):
+                    raise ValueError("quantity must be a number")
+            expiry_date = item.get("expiryDate")
+            if expiry_date:
+                expiry_date = _parse_date(str(expiry_date), "expiryDate")
+            added_date = item.get("addedDate")
+            if added_date:
+                added_date = _parse_date(str(added_date), "addedDate")
+        except ValueError as e:
+            results.append({"id": item_id, "status": "invalid", "error": str(e)})
+            continue
+
+        seen.add(item_id)
+        results.append(None)
+        rows.append((index, (
+            item_id, user_id, item.get("name"), quantity, expiry_date or None,
+            item.get("category"), item.get("unit"), added_date or None,
+            item.get("notes")
+        )))
+    return results, rows
+
+def _with_expiry(rows: List[Tuple[int, tuple]]) -> List[Tuple[int, tuple]]:
+    """Fill missing expiry dates of validated rows in one prediction batch."""
+    filled = fill_expiry([row for _, row in rows])
+    return [(index, row) for (index, _), row in zip(rows, filled)]
+
+def _bulk_response(message: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return {"message": message, "counts": counts, "results": results}
+
+def _stream_items(query: str, params: tuple) -> Iterator[str]:
+    """Yield items as NDJSON lines from a server-side (named) cursor.
+
+    Rows arrive PANTRY_STREAM_FETCH_SIZE at a time, so the worker never
+    holds the whole result set. The pooled connection stays checked out
+    until the stream ends or the client disconnects.
+    """
+    with db_connection() as conn:
+        cursor = conn.cursor(name=f"pantry_items_{uuid.uuid4().hex}")
+        cursor.itersize = PANTRY_STREAM_FETCH_SIZE
+        try:
+            cursor.execute(query, params)
+            for row in cursor:
+                yield json.dumps(_row_to_item(row)) + "\n"
         except Exception as e:
-            return jsonify({"message": "Error fetching items", "error": str(e)}), 500
+            # Headers are already sent; report the failure in-band
+            yield json.dumps({"message": "Error fetching items", "error": str(e)}) + "\n"
         finally:
             cursor.close()
-            conn.close()
-    except Exception as e:
-        return jsonify({"message": "Server error", "error": str(e)}), 500
@@ -0,0 +1,220 @@
+"""Password hashing on a dedicated, bounded worker pool.
+
+scrypt/pbkdf2 are deliberately slow (tens to hundreds of milliseconds).
+Run on request threads, a burst of logins keeps every worker thread busy
+hashing and starves all other endpoints. Here hashing runs on at most
+PASSWORD_HASH_WORKERS threads (hashlib releases the GIL while it works),
+and at most PASSWORD_HASH_QUEUE calls may be waiting or running at once.
+Calls beyond that are rejected immediately with HashingBusy, which the
+auth endpoints turn into 503 + Retry-After, instead of queueing without
+bound. A call waiting longer than PASSWORD_HASH_TIMEOUT seconds gets
+HashingBusy too; its hash keeps its slot until it actually finishes.
+
+The limit can only reject calls where a process handles several requests
+at once:
+
+- asgi.py: one event loop awaits any number of hashes, so at most
+  PASSWORD_HASH_QUEUE (default 4 x PASSWORD_HASH_WORKERS) run or wait.
+- gunicorn with GUNICORN_THREADS > 1 (gthread workers): the request
+  thread still waits for its hash, so the default limit is half of the
+  worker's threads, leaving the other half for the remaining endpoints.
+- gunicorn with the default sync workers (one thread each): only one
+  hash per process can ever be in flight, so nothing is rejected and a
+  pool would only add a thread hop. gunicorn.conf.py therefore defaults
+  PASSWORD_HASH_WORKERS to 0 there, and hashes run inline.
+
+PASSWORD_HASH_METHOD takes any werkzeug method string, e.g. "scrypt",
+"scrypt:16384:8:1" or "pbkdf2:sha256:600000". Hashes made with other
+parameters still verify, and verify_password() returns a replacement
+hash for them so login can upgrade them transparently.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Dict, Optional, Tuple
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+PASSWORD_SALT_LENGTH = int(os.getenv("PASSWORD_SALT_LENGTH", "16"))
+# 0 hashes inline on the request thread (no pool, no admission control)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+# Request threads per gunicorn worker (set by gunicorn.conf.py); 0 elsewhere
+GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", "0"))
+PASSWORD_HASH_QUEUE = int(os.getenv(
+    "PASSWORD_HASH_QUEUE",
+    str(max(GUNICORN_THREADS // 2, 1) if GUNICORN_THREADS else max(PASSWORD_HASH_WORKERS, 1) * 4),
+))
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+# Seconds clients are told to wait after a rejection
+PASSWORD_HASH_RETRY_AFTER = 1
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool is at capacity or a hash timed out."""
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(PASSWORD_HASH_QUEUE, 1))
+_stats_lock = threading.Lock()
+_stats = {"completed": 0, "rejected": 0, "timed_out": 0, "in_flight": 0, "rehashed": 0}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """This process's pool; gunicorn forks workers, so one per pid."""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _count(key: str, delta: int = 1) -> None:
+    with _stats_lock:
+        _stats[key] += delta
+
+
+def _submit(fn, *args):
+    """Take a slot and submit fn to the pool; the slot is freed when fn finishes."""
+    if not _slots.acquire(blocking=False):
+        _count("rejected")
+        raise HashingBusy("Password hashing is at capacity")
+    _count("in_flight")
+    try:
+        future = _get_executor().submit(fn, *args)
+    except Exception:
+        _release(None)
+        raise
+    # Not on the caller's timeout: a hash still running keeps its slot
+    future.add_done_callback(_release)
+    return future
+
+
+def _release(future) -> None:
+    _count("in_flight", -1)
+    _count("completed")
+    _slots.release()
+
+
+def _run(fn, *args):
+    """Run fn on the hashing pool, rejecting the call if the pool is full."""
+    if PASSWORD_HASH_WORKERS <= 0:
+        return fn(*args)
+    future = _submit(fn, *args)
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+    except FutureTimeout:
+        _count("timed_out")
+        raise HashingBusy("Password hashing timed out") from None
+
+
+def _hash(password: str) -> str:
+    return generate_password_hash(
+        password, method=PASSWORD_HASH_METHOD, salt_length=PASSWORD_SALT_LENGTH
+    )
+
+
+_full_method: Optional[str] = None
+
+
+def _current_method() -> str:
+    """PASSWORD_HASH_METHOD with werkzeug's defaults filled in ("scrypt" -> "scrypt:32768:8:1")."""
+    global _full_method
+    if _full_method is None:
+        _full_method = generate_password_hash(
+            "", method=PASSWORD_HASH_METHOD, salt_length=1
+        ).partition("$")[0]
+    return _full_method
+
+
+def needs_rehash(stored_hash: str) -> bool:
+    """Whether a stored hash was made with other parameters than the current ones."""
+    method, _, rest = stored_hash.partition("$")
+    salt = rest.partition("$")[0]
+    return method != _current_method() or len(salt) != PASSWORD_SALT_LENGTH
+
+
+def _verify(stored_hash: str, password: str) -> Tuple[bool, Optional[str]]:
+    if not check_password_hash(stored_hash, password):
+        return False, None
+    if needs_rehash(stored_hash):
+        return True, _hash(password)
+    return True, None
+
+
+def hash_password(password: str) -> str:
+    """Hash a password with the configured method.
+
+    Raises:
+        HashingBusy: if the hashing pool is at capacity or the hash timed out
+    """
+    return _run(_hash, password)
+
+
+def verify_password(stored_hash: str, password: str) -> Tuple[bool, Optional[str]]:
+    """Check a password against its stored hash.
+
+    Returns:
+        tuple: (valid, new_hash); new_hash is set when the password is valid
+            but the stored hash uses outdated parameters and should be replaced
+
+    Raises:
+        HashingBusy: if the hashing pool is at capacity or the hash timed out
+    """
+    valid, new_hash = _run(_verify, stored_hash, password)
+    if new_hash:
+        _count("rehashed")
+    return valid, new_hash
+
+
+async def _run_async(fn, *args):
+    """Like _run(), but awaits the pool instead of blocking the event loop."""
+    if PASSWORD_HASH_WORKERS <= 0:
+        return await asyncio.to_thread(fn, *args)
+    future = _submit(fn, *args)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), PASSWORD_HASH_TIMEOUT)
+    except asyncio.TimeoutError:
+        _count("timed_out")
+        raise HashingBusy("Password hashing timed out") from None
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password() for async views."""
+    return await _run_async(_hash, password)
+
+
+async def verify_password_async(stored_hash: str, password: str) -> Tuple[bool, Optional[str]]:
+    """verify_password() for async views."""
+    valid, new_hash = await _run_async(_verify, stored_hash, password)
+    if new_hash:
+        _count("rehashed")
+    return valid, new_hash
+
+
+def busy_response() -> Tuple[Dict[str, str], int, Dict[str, str]]:
+    """503 + Retry-After for a HashingBusy; a view return value in Flask and Quart."""
+    return (
+        {"message": "Server busy, please retry"},
+        503,
+        {"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+    )
+
+
+def stats() -> Dict[str, Any]:
+    """Snapshot of the hashing pool counters."""
+    with _stats_lock:
+        return {
+            "method": PASSWORD_HASH_METHOD,
+            "workers": PASSWORD_HASH_WORKERS,
+            "queue_limit": PASSWORD_HASH_QUEUE,
+            **_stats,
+        }
@@ -1,8 +1,14 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, Union
-import pandas as pd
-import joblib
+from typing import Dict, Any, List, Optional, Tuple, Union
+import os
+import threading
+import time
+from cache import TTLCache
+import foodkeeper
+from compiled_model import CompiledShelfLifeModel, compile_pipeline
+from metrics import span
+from normalize import canonicalize
 
 # Category mapping for the ML model
 APP_CATEGORY_MAPPING = {
@@ -18,15 +24,120 @@ APP_CATEGORY_MAPPING = {
     "general": [1, 4, 5, 23, 24]
 }
 
+# Largest batch accepted by /predict-batch
+PREDICTION_BATCH_LIMIT = int(os.getenv("PREDICTION_BATCH_LIMIT", "500"))
+
+# Model file, and how often (seconds) to check it for changes
+MODEL_PATH = os.getenv("SHELF_LIFE_MODEL_PATH", "improved_shelf_life_model.pkl")
+MODEL_RELOAD_CHECK_INTERVAL = float(os.getenv("MODEL_RELOAD_CHECK_INTERVAL", "5"))
+
+# Consult the USDA FoodKeeper data before the model
+FOODKEEPER_ENABLED = os.getenv("FOODKEEPER_ENABLED", "1") == "1"
+
+# Predict with the pandas-free compiled copy of the model when possible.
+# Past a few hundred rows sklearn's Cython tree walk wins again.
+SHELF_LIFE_COMPILED = os.getenv("SHELF_LIFE_COMPILED", "1") == "1"
+COMPILED_MAX_BATCH = int(os.getenv("COMPILED_MAX_BATCH", "256"))
+
+# Predicted shelf-life days per (model name, category); the model is
+# deterministic, so entries only go stale when the model file changes
+prediction_cache = TTLCache(
+    maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("PREDICTION_CACHE_TTL", "3600")),
+)
+
 # Initialize blueprint
 prediction_bp = Blueprint('prediction_bp', __name__)
 
-# Load ML model
-try:
-    model = joblib.load("improved_shelf_life_model.pkl")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model = None
+model = None
+compiled_model: Optional[CompiledShelfLifeModel] = None
+_model_names: Dict[str, str] = {}
+_model_mtime: Optional[int] = None
+_model_checked_at = float("-inf")
+_model_lock = threading.Lock()
+
+def _name_lookup(pipeline: Any) -> Dict[str, str]:
+    """Map normalized product names to the spelling the model was trained on."""
+    try:
+        encoder = pipeline.named_steps["preproc"].named_transformers_["name_enc"]
+        names = encoder.categories_[0]
+    except Exception:
+        return {}
+    return {normalize_name(str(name)): str(name) for name in names}
+
+def get_model() -> Any:
+    """Get the shelf-life model, reloading it if the model file changed.
+
+    The file is stat'ed at most every MODEL_RELOAD_CHECK_INTERVAL seconds.
+    A reload also clears the prediction cache.
+    """
+    global model, compiled_model, _model_names, _model_mtime, _model_checked_at
+    if time.monotonic() - _model_checked_at < MODEL_RELOAD_CHECK_INTERVAL:
+        return model
+
+    with _model_lock:
+        if time.monotonic() - _model_checked_at < MODEL_RELOAD_CHECK_INTERVAL:
+            return model
+        try:
+            mtime = os.stat(MODEL_PATH).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        if mtime != _model_mtime or (model is None and mtime is not None):
+            # Load ML model (joblib/sklearn are only imported once needed)
+            try:
+                import joblib
+                model = joblib.load(MODEL_PATH)
+            except Exception as e:
+                print(f"Error loading model: {e}")
+                model = None
+            _model_names = _name_lookup(model) if model is not None else {}
+            compiled_model = _compile(model) if model is not None else None
+            _model_mtime = mtime
+            prediction_cache.clear()
+
+        _model_checked_at = time.monotonic()
+        return model
+
+def _compile(pipeline: Any) -> Optional[CompiledShelfLifeModel]:
+    """Compile the pipeline for fast inference, or None to use it as is."""
+    if not SHELF_LIFE_COMPILED:
+        return None
+    try:
+        return compile_pipeline(pipeline)
+    except Exception as e:
+        print(f"Falling back to the sklearn pipeline: {e}")
+        return None
+
+def model_names() -> Dict[str, str]:
+    """Normalized product name -> training spelling, for the loaded model.
+
+    A reload replaces the dict rather than mutating it, so callers can
+    tell a new model apart by identity.
+    """
+    return _model_names
+
+def normalize_name(product_name: str) -> str:
+    """Lowercase a product name and collapse its whitespace."""
+    return " ".join(product_name.lower().split())
+
+def model_name(product_name: str) -> str:
+    """Name to feed the model (and cache key) for a product.
+
+    Names the model knows are matched case-insensitively to their training
+    spelling. Other names go through normalize.canonicalize(): the longest
+    training name covered by the cleaned-up words is used ("Organic 2% Milk
+    1gal" -> "milk"), else the cleaned-up name, which the one-hot encoder
+    ignores but which lets "Milk 1gal" and "milk" share a cache entry.
+    """
+    if not _model_names:
+        return product_name
+    normalized = normalize_name(product_name)
+    if normalized in _model_names:
+        return _model_names[normalized]
+    match = canonicalize(product_name)
+    phrase = match.phrases.get("model")
+    return _model_names[phrase] if phrase else match.text
 
 def get_category_id(web_category: str) -> Optional[int]:
     """Get the model category ID from web category.
@@ -41,6 +152,134 @@ def get_category_id(web_category: str) -> Optional[int]:
     ids = APP_CATEGORY_MAPPING.get(web_category)
     return ids[0] if ids else None
 
+def _foodkeeper_days(product_name: str, web_category: str) -> Optional[float]:
+    """Shelf life from the FoodKeeper index, restricted to the web category."""
+    if not FOODKEEPER_ENABLED:
+        return None
+    return foodkeeper.shelf_life_days(
+        product_name,
+        web_category,
+        APP_CATEGORY_MAPPING.get(web_category.lower())
+    )
+
+def _prepare_row(
+    product_name: str,
+    web_category: str,
+    buy_date_str: str
+) -> Dict[str, Any]:
+    """Validate one prediction request and build its model input row.
+
+    Returns:
+        dict: {"row": ..., "buy_date": ...} or an error message
+    """
+    # Get and validate category
+    category_id = get_category_id(web_category)
+    if category_id is None:
+        return {"error": f"Unknown category: {web_category}"}
+
+    # Parse and validate buy date
+    try:
+        buy_date = datetime.strptime(buy_date_str, "%Y-%m-%d")
+    except ValueError:
+        return {"error": "buy_date must be in YYYY-MM-DD format"}
+
+    return {
+        "row": {
+            'Name': model_name(product_name),
+            'Category_ID': category_id,
+            'HighLevelCategory': web_category.lower()
+        },
+        "buy_date": buy_date
+    }
+
+def predict_expiry_batch(
+    items: List[Tuple[str, str, str]]
+) -> List[Dict[str, Union[str, datetime]]]:
+    """Predict expiry dates for many products with a single model call.
+
+    Products found in the FoodKeeper index use its shelf life. The rest
+    are looked up in prediction_cache; only the misses go through the
+    model, and the buy date offset is applied after.
+
+    Args:
+        items (list): (product_name, web_category, buy_date_str) tuples
+
+    Returns:
+        list: One prediction result or error message per item, in order
+    """
+    # Loads the model on first use; model_name() needs its vocabulary
+    get_model()
+    results: List[Dict[str, Any]] = [
+        _prepare_row(*item) for item in items
+    ]
+    valid = [i for i, result in enumerate(results) if "error" not in result]
+    if not valid:
+        return results
+
+    pred_days: Dict[int, Tuple[float, str]] = {}
+    misses: Dict[Tuple[str, str], List[int]] = {}
+    for i in valid:
+        # FoodKeeper entries take precedence over the model: the name as
+        # given, else the entry its canonical form is exactly equal to
+        # ("Organic 2% Milk 1gal" is "milk"; "almond milk" is not)
+        days = _foodkeeper_days(items[i][0], items[i][1])
+        if days is None:
+            match = canonicalize(items[i][0])
+            if "foodkeeper" in match.exact:
+                days = _foodkeeper_days(match.phrases["foodkeeper"], items[i][1])
+        if days is not None:
+            pred_days[i] = (days, "foodkeeper")
+            continue
+
+        row = results[i]["row"]
+        key = (row['Name'], row['HighLevelCategory'])
+        days = prediction_cache.get(key)
+        if days is None:
+            misses.setdefault(key, []).append(i)
+        else:
+            pred_days[i] = (days, "model")
+
+    if misses:
+        # Validate model is loaded
+        model = get_model()
+        compiled = compiled_model
+        if model is None:
+            for rows in misses.values():
+                for i in rows:
+                    results[i] = {"error": "ML model not available"}
+        else:
+            try:
+                # One model call for every distinct miss
+                sample = [results[rows[0]]["row"] for rows in misses.values()]
+                with span("model_predict"):
+                    if compiled is not None and len(sample) <= COMPILED_MAX_BATCH:
+                        predicted = compiled.predict(sample)
+                    else:
+                        import pandas as pd
+                        predicted = model.predict(pd.DataFrame(sample))
+            except Exception as e:
+                predicted = None
+                error = {"error": f"Prediction error: {str(e)}"}
+                for rows in misses.values():
+                    for i in rows:
+                        results[i] = error
+
+            if predicted is not None:
+                for (key, rows), days in zip(misses.items(), predicted):
+                    days = float(days)
+                    prediction_cache.set(key, days)
+                    for i in rows:
+                        pred_days[i] = (days, "model")
+
+    for i, (days, source) in pred_days.items():
+        # Calculate expiry date
+        expiry_date = results[i]["buy_date"] + timedelta(days=int(round(days)))
+        results[i] = {
+            "predicted_expiry_date": expiry_date.strftime("%Y-%m-%d"),
+            "source": source
+        }
+    return results
+
 def predict_expiry(
     product_name: str, 
     web_category: str, 
@@ -56,38 +295,7 @@ def predict_expiry(
     Returns:
         dict: Prediction result or error message
     """
-    # Validate model is loaded
-    if model is None:
-        return {"error": "ML model not available"}
-        
-    # Get and validate category
-    category_id = get_category_id(web_category)
-    if category_id is None:
-        return {"error": f"Unknown category: {web_category}"}
-        
-    try:
-        # Prepare data for prediction
-        sample = pd.DataFrame({
-            'Name': [product_name],
-            'Category_ID': [category_id],
-            'HighLevelCategory': [web_category.lower()]
-        })
-        
-        # Get prediction
-        pred_days = model.predict(sample)[0]
-        
-        # Parse and validate buy date
-        try:
-            buy_date = datetime.strptime(buy_date_str, "%Y-%m-%d")
-        except ValueError:
-            return {"error": "buy_date must be in YYYY-MM-DD format"}
-            
-        # Calculate expiry date
-        expiry_date = buy_date + timedelta(days=int(round(pred_days)))
-        return {"predicted_expiry_date": expiry_date.strftime("%Y-%m-%d")}
-        
-    except Exception as e:
-        return {"error": f"Prediction error: {str(e)}"}
+    return predict_expiry_batch([(product_name, web_category, buy_date_str)])[0]
 
 @prediction_bp.route('/predict', methods=['GET'])
 def predict() -> tuple[Dict[str, Any], int]:
@@ -121,3 +329,60 @@ def predict() -> tuple[Dict[str, Any], int]:
             "error": "Server error",
             "message": str(e)
         }), 500
+
+@prediction_bp.route('/predict-batch', methods=['POST'])
+def predict_batch() -> tuple[Dict[str, Any], int]:
+    """Endpoint to predict expiry dates for many products at once.
+
+    Expects {"items": [{"name": ..., "category": ..., "buy_date": ...}, ...]}
+    and returns one result per item, in order. Invalid items get an
+    "error" entry instead of failing the whole batch.
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    try:
+        data = request.get_json(silent=True)
+        items = data.get("items") if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                "error": "Provide a non-empty 'items' list"
+            }), 400
+        if len(items) > PREDICTION_BATCH_LIMIT:
+            return jsonify({
+                "error": f"At most {PREDICTION_BATCH_LIMIT} items per batch"
+            }), 400
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        batch = []
+        positions = []
+        for i, item in enumerate(items):
+            item = item if isinstance(item, dict) else {}
+            fields = tuple(item.get(key) for key in ("name", "category", "buy_date"))
+            if not all(isinstance(field, str) and field for field in fields):
+                results[i] = {
+                    "error": "Missing required fields. Provide 'name', 'category', and 'buy_date'"
+                }
+                continue
+            batch.append(fields)
+            positions.append(i)
+
+        for i, result in zip(positions, predict_expiry_batch(batch)):
+            results[i] = result
+
+        return jsonify({"results": results}), 200
+
+    except Exception as e:
+        return jsonify({
+            "error": "Server error",
+            "message": str(e)
+        }), 500
+
+@prediction_bp.route('/cache-stats', methods=['GET'])
+def cache_stats() -> tuple[Dict[str, Any], int]:
+    """Endpoint exposing prediction cache hit/miss counters.
+
+    Returns:
+        tuple: (response_json, status_code)
+    """
+    return jsonify(prediction_cache.stats()), 200
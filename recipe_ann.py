@@ -0,0 +1,284 @@
+"""Approximate nearest-neighbour search over the recipe index.
+
+The exact search (recipe_index.top_k_similar) scores every recipe sharing
+a term with the query, so its cost grows with the corpus. The ANN mode
+scores a fixed-size candidate set instead:
+
+1. embeddings: a TruncatedSVD of the TF-IDF matrix projects each recipe
+   to RECIPE_ANN_DIMS dense dimensions (L2-normalized, float32);
+2. IVF: spherical k-means splits the embeddings into lists around
+   centroids; each recipe is stored, contiguously, in its nearest list;
+3. a query is projected the same way and the RECIPE_ANN_NPROBE lists
+   with the closest centroids are probed. Their recipes (or, with
+   RECIPE_ANN_RERANK set, that many of them closest in embedding space)
+   are re-scored with the exact TF-IDF cosine, so returned rows are
+   ordered (and tie-broken) like the exact search.
+
+The embeddings only pick where to look: ranking 128 SVD dimensions
+directly loses the rare shared terms that decide the exact top 10.
+nprobe and rerank trade recall for latency per query; benchmark them
+with benchmarks/bench_ann_recall.py. The structure is built offline and
+stored in an "ann" directory inside the index artifact:
+
+    python recipe_ann.py build        # for the current RECIPES_PATH index
+
+or with `python recipe_index.py build --ann`. Merged indexes
+(recipe_updates) get one when the index they replace had one.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+RECIPE_ANN_DIMS = int(os.getenv("RECIPE_ANN_DIMS", "128"))
+# Number of IVF lists; 0 picks about sqrt(recipes)
+RECIPE_ANN_LISTS = int(os.getenv("RECIPE_ANN_LISTS", "0"))
+RECIPE_ANN_NPROBE = int(os.getenv("RECIPE_ANN_NPROBE", "8"))
+# Candidates re-scored exactly; 0 re-scores every recipe in the probed lists
+RECIPE_ANN_RERANK = int(os.getenv("RECIPE_ANN_RERANK", "0"))
+
+ANN_DIR = "ann"
+ANN_FORMAT_VERSION = 1
+
+# k-means runs on a sample of this many points per list
+TRAIN_POINTS_PER_LIST = 64
+KMEANS_ITERATIONS = 10
+# Rows multiplied at a time when assigning recipes to lists
+ASSIGN_BATCH = 65536
+
+
+def _normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _assign(vectors, centroids):
+    """Index of the closest centroid (highest dot product) for each vector."""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BATCH):
+        labels[start:start + ASSIGN_BATCH] = np.argmax(
+            vectors[start:start + ASSIGN_BATCH] @ centroids.T, axis=1
+        )
+    return labels
+
+
+def spherical_kmeans(vectors, n_lists, rng, iterations=KMEANS_ITERATIONS):
+    """Unit-norm centroids of n_lists clusters of unit-norm vectors."""
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=n_lists)
+        # Empty lists restart from random points
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        centroids = _normalize_rows(sums).astype(np.float32)
+    return centroids
+
+
+class AnnIndex:
+    """SVD projection plus IVF lists over a recipe matrix.
+
+    projection:   (terms x dims) TF-IDF -> embedding projection
+    centroids:    (lists x dims) unit-norm list centroids
+    list_indptr:  list i holds positions list_indptr[i]:list_indptr[i + 1]
+    list_rows:    recipe row at each position
+    list_vectors: (recipes x dims) embedding at each position
+    """
+
+    def __init__(self, projection, centroids, list_indptr, list_rows, list_vectors, params=None):
+        self.projection = projection
+        self.centroids = centroids
+        self.list_indptr = list_indptr
+        self.list_rows = list_rows
+        self.list_vectors = list_vectors
+        self.params = params or {}
+
+    def embed(self, query_vec):
+        """Unit-norm embedding of a (1 x terms) TF-IDF query."""
+        query_vec = sp.csr_matrix(query_vec)
+        # Only the rows of the query's terms are read
+        embedded = query_vec.data @ self.projection[query_vec.indices]
+        norm = np.linalg.norm(embedded)
+        return embedded / norm if norm > 0 else embedded
+
+    def candidates(self, query_vec, nprobe=None, count=None):
+        """Rows of the recipes in the nprobe lists closest to the query.
+
+        With count, only the count of them closest in embedding space.
+        """
+        nprobe = min(nprobe or RECIPE_ANN_NPROBE, len(self.centroids))
+        query = self.embed(query_vec).astype(np.float32)
+        centroid_scores = self.centroids @ query
+        lists = np.argpartition(centroid_scores, len(centroid_scores) - nprobe)[-nprobe:]
+        # Lists are contiguous, so each is read as one slice
+        bounds = [(self.list_indptr[i], self.list_indptr[i + 1]) for i in lists]
+        if count and sum(end - start for start, end in bounds) > count:
+            positions = np.concatenate([np.arange(start, end) for start, end in bounds])
+            scores = np.concatenate([self.list_vectors[start:end] @ query for start, end in bounds])
+            top = np.argpartition(scores, len(scores) - count)[-count:]
+            return np.asarray(self.list_rows[positions[top]])
+        return np.concatenate([self.list_rows[start:end] for start, end in bounds])
+
+
+def fit_ann(matrix, dims=None, n_lists=None, seed=0):
+    """Build an AnnIndex for a row-normalized TF-IDF matrix."""
+    from sklearn.decomposition import TruncatedSVD
+
+    rng = np.random.default_rng(seed)
+    n_recipes, n_terms = matrix.shape
+    dims = max(1, min(dims or RECIPE_ANN_DIMS, n_terms - 1, n_recipes - 1))
+    n_lists = n_lists or RECIPE_ANN_LISTS or int(round(np.sqrt(n_recipes)))
+    n_lists = max(1, min(n_lists, n_recipes))
+
+    svd = TruncatedSVD(n_components=dims, algorithm="randomized", random_state=seed)
+    embeddings = _normalize_rows(svd.fit_transform(matrix)).astype(np.float32)
+    train = embeddings
+    if len(embeddings) > TRAIN_POINTS_PER_LIST * n_lists:
+        sample = rng.choice(len(embeddings), TRAIN_POINTS_PER_LIST * n_lists, replace=False)
+        train = embeddings[sample]
+    centroids = spherical_kmeans(train, n_lists, rng)
+
+    labels = _assign(embeddings, centroids)
+    list_rows = np.argsort(labels, kind="stable").astype(np.int32)
+    list_indptr = np.zeros(n_lists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=n_lists), out=list_indptr[1:])
+    params = {
+        "format_version": ANN_FORMAT_VERSION,
+        "dims": dims,
+        "lists": n_lists,
+        "seed": seed,
+        "explained_variance": float(svd.explained_variance_ratio_.sum()),
+    }
+    return AnnIndex(
+        np.ascontiguousarray(svd.components_.T, dtype=np.float32),
+        centroids,
+        list_indptr,
+        list_rows,
+        embeddings[list_rows],
+        params,
+    )
+
+
+def search(matrix, ann, query_vec, top_n, nprobe=None, rerank=None):
+    """Rows of the top_n recipes of a row-normalized matrix, found through ann.
+
+    Candidates are re-scored with the exact cosine similarity and ordered
+    like recipe_index.top_k_similar(); returns (rows, similarities).
+    """
+    from recipe_index import top_k, zero_score_rows
+
+    query_vec = sp.csr_matrix(query_vec)
+    n_rows = matrix.shape[0]
+    top_n = min(top_n, n_rows)
+    rerank = rerank if rerank is not None else RECIPE_ANN_RERANK
+    rows = np.unique(ann.candidates(query_vec, nprobe, rerank and max(rerank, top_n)))
+
+    norm = np.sqrt(np.dot(query_vec.data, query_vec.data))
+    if norm > 0 and len(rows):
+        scores = np.asarray(matrix[rows] @ query_vec.T.toarray()).ravel() / norm
+        # Candidates sharing no term rank with the zero-score fill below
+        keep = scores > 0
+        rows, scores = rows[keep], scores[keep]
+    else:
+        rows, scores = rows[:0], np.zeros(0)
+
+    top, top_scores = top_k(rows, scores, top_n)
+    if len(top) < top_n:
+        zero = zero_score_rows(rows, n_rows, top_n - len(top))
+        top = np.concatenate([top, zero])
+        top_scores = np.concatenate([top_scores, np.zeros(len(zero))])
+    return top, top_scores
+
+
+def write_ann(ann, artifact):
+    """Store ann in artifact/ann, replacing any previous one atomically."""
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-ann-", dir=artifact)
+    try:
+        np.save(os.path.join(tmp_dir, "projection.npy"), ann.projection)
+        np.save(os.path.join(tmp_dir, "centroids.npy"), ann.centroids)
+        np.save(os.path.join(tmp_dir, "list_indptr.npy"), ann.list_indptr)
+        np.save(os.path.join(tmp_dir, "list_rows.npy"), ann.list_rows)
+        np.save(os.path.join(tmp_dir, "list_vectors.npy"), ann.list_vectors)
+        with open(os.path.join(tmp_dir, "ann.json"), "w", encoding="utf-8") as f:
+            json.dump(ann.params, f, indent=2)
+        target = os.path.join(artifact, ANN_DIR)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.rename(tmp_dir, target)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_ann(artifact):
+    """Memory-map the ANN structure of an artifact, or None if it has none."""
+    path = os.path.join(artifact, ANN_DIR)
+    try:
+        with open(os.path.join(path, "ann.json"), "r", encoding="utf-8") as f:
+            params = json.load(f)
+    except FileNotFoundError:
+        return None
+    if params.get("format_version") != ANN_FORMAT_VERSION:
+        print(f"Ignoring ANN index at {path}: incompatible format")
+        return None
+
+    def mapped(name):
+        return np.load(os.path.join(path, name), mmap_mode="r")
+
+    return AnnIndex(
+        mapped("projection.npy"),
+        # Scanned whole on every query, so kept in memory
+        np.load(os.path.join(path, "centroids.npy")),
+        mapped("list_indptr.npy"),
+        mapped("list_rows.npy"),
+        mapped("list_vectors.npy"),
+        params,
+    )
+
+
+def build_ann(artifact, dims=None, n_lists=None, seed=0):
+    """Fit and store the ANN structure for a written index artifact."""
+    from recipe_index import load_index
+
+    start = time.perf_counter()
+    ann = fit_ann(load_index(artifact).matrix, dims, n_lists, seed)
+    write_ann(ann, artifact)
+    print(
+        f"ANN index for {artifact}: {ann.params['dims']} dims, {ann.params['lists']} lists, "
+        f"{ann.params['explained_variance']:.1%} variance kept, {time.perf_counter() - start:.1f} s"
+    )
+    return ann
+
+
+def main():
+    from recipe_updates import corpus_path, read_state
+    from recipe_index import RECIPE_INDEX_DIR, RECIPES_PATH, artifact_path
+
+    parser = argparse.ArgumentParser(description="Build the ANN structure of the recipe index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="fit and write the ANN structure")
+    build.add_argument("--source", default=RECIPES_PATH, help="recipe corpus")
+    build.add_argument("--out", default=RECIPE_INDEX_DIR, help="index directory")
+    build.add_argument("--dims", type=int, help="embedding dimensions (RECIPE_ANN_DIMS)")
+    build.add_argument("--lists", type=int, help="IVF lists (RECIPE_ANN_LISTS)")
+    args = parser.parse_args()
+
+    # The artifact being served: the last merge's, else the source's
+    state = read_state(args.source, args.out)
+    artifact = artifact_path(state["corpus_sha256"], args.out)
+    if not os.path.isdir(artifact):
+        from recipe_index import build_index
+
+        build_index(corpus_path(state, args.source, args.out), args.out, state["corpus_sha256"])
+    build_ann(artifact, args.dims, args.lists)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+"""Persisted TF-IDF index over the recipe corpus.
+
+Fitting the TfidfVectorizer over recipes.json is done once, offline:
+
+    python recipe_index.py build
+
+The fitted vocabulary, IDF weights, the CSR recipe matrix, its CSC copy
+(term -> recipe postings, used to skip recipes sharing no term with a
+query), the ingredient-token index used by pantry matching and the recipe
+metadata are written to a versioned directory under RECIPE_INDEX_DIR.
+Workers load it with read-only memory maps, so every process on a host
+shares the same pages through the OS page cache. When the artifact is
+missing or was built from a different recipes.json, load_or_build()
+falls back to building it on demand.
+
+Builds stream the corpus (recipe_stream), so their memory does not grow
+with the number of recipes; fit_index() is the in-memory equivalent.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import recipe_ann
+from ingredient_index import IngredientIndex
+
+# Bump whenever the on-disk layout changes so stale artifacts are rebuilt
+FORMAT_VERSION = 3
+
+RECIPES_PATH = os.getenv("RECIPES_PATH", "recipes.json")
+RECIPE_INDEX_DIR = os.getenv("RECIPE_INDEX_DIR", "recipe_index")
+
+# Parameters the vectorizer is fitted with; recorded in the manifest
+VECTORIZER_PARAMS = {"stop_words": "english"}
+
+# Recipe fields kept alongside the matrix, in output order
+METADATA_FIELDS = ("id", "title", "instructions", "picture_link")
+
+
+def source_digest(source_path):
+    """SHA-256 of the recipe corpus, used to detect stale artifacts."""
+    digest = hashlib.sha256()
+    with open(source_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def artifact_path(digest, index_dir=RECIPE_INDEX_DIR):
+    """Directory holding the artifact for a given corpus digest."""
+    return os.path.join(index_dir, f"v{FORMAT_VERSION}-{digest[:16]}")
+
+
+class RecipeIndex:
+    """Fitted vocabulary, recipe matrix and metadata for the recipe corpus."""
+
+    def __init__(
+        self, vocabulary, idf, matrix, metadata, ingredients, manifest=None, postings=None,
+        path=None,
+    ):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.matrix = matrix
+        self.postings = postings if postings is not None else matrix.tocsc()
+        self.metadata = metadata
+        self.ingredients = ingredients
+        self.manifest = manifest or {}
+        # Artifact directory, for indexes loaded from disk
+        self.path = path
+        self._ann = None
+        self.vectorizer = _make_vectorizer(vocabulary, idf)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def search(self, query_vec, top_n):
+        """Rows of the top_n recipes by cosine similarity to query_vec."""
+        return top_k_similar(self.postings, query_vec, top_n)
+
+    def search_scored(self, query_vec, top_n):
+        """(rows, similarities) of the top_n recipes, as search() orders them."""
+        return top_k_scored(self.postings, query_vec, top_n)
+
+    def search_ann(self, query_vec, top_n, nprobe=None, rerank=None):
+        """search_scored() through the ANN structure (see recipe_ann).
+
+        Falls back to the exact search when the artifact has none.
+        """
+        ann = self.get_ann()
+        if ann is None:
+            return self.search_scored(query_vec, top_n)
+        return recipe_ann.search(self.matrix, ann, query_vec, top_n, nprobe, rerank)
+
+    def get_ann(self):
+        """The artifact's ANN structure, loaded on first use; None if not built."""
+        if self._ann is None and self.path is not None:
+            self._ann = recipe_ann.load_ann(self.path)
+        return self._ann
+
+    def match(self, pantry_items, top_n):
+        """Recipes ranked by pantry coverage, see IngredientIndex.match."""
+        return self.ingredients.match(pantry_items, top_n)
+
+    def records(self, rows):
+        """Metadata dicts for the given matrix rows, in the given order."""
+        return [
+            {field: self.metadata[field][row] for field in METADATA_FIELDS}
+            for row in rows
+        ]
+
+
+class StringColumn:
+    """Read-only column of strings stored as one UTF-8 blob plus offsets."""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, values):
+        encoded = [value.encode("utf-8") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return bytes(self.blob[start:end]).decode("utf-8")
+
+
+def top_k_similar(postings, query_vec, top_n):
+    """Top-n rows of a row-normalized matrix by cosine similarity to a query.
+
+    postings is the matrix in CSC form, i.e. an inverted index from term to
+    the recipes containing it. Only recipes sharing at least one term with
+    the query are scored, so the cost follows the query terms' posting-list
+    lengths rather than the corpus size, and the winners are picked with a
+    partial selection instead of a full sort. Ties are broken by the higher
+    row, matching a reversed stable argsort over all similarities; recipes
+    with no overlap (similarity 0) fill any remaining slots the same way.
+    """
+    return top_k_scored(postings, query_vec, top_n)[0]
+
+
+def top_k_scored(postings, query_vec, top_n):
+    """top_k_similar() plus the similarity of each returned row."""
+    query_vec = sp.csr_matrix(query_vec)
+    n_rows = postings.shape[0]
+    top_n = min(top_n, n_rows)
+    norm = np.sqrt(np.dot(query_vec.data, query_vec.data))
+
+    if query_vec.nnz and norm > 0:
+        selected = postings[:, query_vec.indices]
+        contributions = selected.data * np.repeat(
+            query_vec.data / norm, np.diff(selected.indptr)
+        )
+        candidates, inverse = np.unique(selected.indices, return_inverse=True)
+        scores = np.bincount(inverse, weights=contributions, minlength=len(candidates))
+    else:
+        candidates = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0)
+
+    top, top_scores = top_k(candidates, scores, top_n)
+    if len(top) < top_n:
+        zero = zero_score_rows(candidates, n_rows, top_n - len(top))
+        top = np.concatenate([top, zero])
+        top_scores = np.concatenate([top_scores, np.zeros(len(zero))])
+    return top, top_scores
+
+
+def top_k(rows, scores, k):
+    """The k (row, score) pairs with the highest scores, ordered by (score, row) descending.
+
+    Every search path (exact, approximate, digest) ranks with this, so
+    they break ties the same way.
+    """
+    if k <= 0:
+        return rows[:0], scores[:0]
+    if len(scores) > k:
+        cut = len(scores) - k
+        kth_score = scores[np.argpartition(scores, cut)[cut]]
+        above = np.flatnonzero(scores > kth_score)
+        tied = np.flatnonzero(scores == kth_score)
+        tied = tied[np.argsort(rows[tied])[::-1][: k - len(above)]]
+        keep = np.concatenate([above, tied])
+        rows, scores = rows[keep], scores[keep]
+    order = np.lexsort((-rows, -scores))
+    return rows[order], scores[order]
+
+
+def zero_score_rows(candidates, n_rows, count):
+    """The highest count rows that are not candidates."""
+    taken = set(candidates.tolist())
+    rows = []
+    row = n_rows - 1
+    while len(rows) < count and row >= 0:
+        if row not in taken:
+            rows.append(row)
+        row -= 1
+    return np.array(rows, dtype=candidates.dtype)
+
+
+def _make_vectorizer(vocabulary, idf):
+    """Rebuild a fitted TfidfVectorizer without refitting it."""
+    vectorizer = TfidfVectorizer(vocabulary=vocabulary, **VECTORIZER_PARAMS)
+    vectorizer.idf_ = idf
+    return vectorizer
+
+
+def read_recipes(source_path):
+    """Load the corpus into metadata columns and per-recipe ingredient lists."""
+    from recipe_stream import iter_recipes
+
+    columns = {field: [] for field in METADATA_FIELDS}
+    ingredient_lists = []
+    for rec_id, rec in iter_recipes(source_path):
+        columns["id"].append(str(rec_id))
+        columns["title"].append(rec.get("title") or "")
+        columns["instructions"].append(rec.get("instructions") or "")
+        columns["picture_link"].append(rec.get("picture_link") or "")
+        ingredient_lists.append(rec.get("ingredients", []))
+    return columns, ingredient_lists
+
+
+def fit_index(source_path):
+    """Fit the vectorizer over the corpus and return an in-memory index."""
+    columns, ingredient_lists = read_recipes(source_path)
+
+    vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+    matrix = vectorizer.fit_transform(
+        " ".join(ingredients) for ingredients in ingredient_lists
+    ).tocsr()
+    matrix.sort_indices()
+
+    metadata = {field: StringColumn.from_strings(columns[field]) for field in METADATA_FIELDS}
+    return RecipeIndex(
+        vectorizer.vocabulary_,
+        vectorizer.idf_,
+        matrix,
+        metadata,
+        IngredientIndex.build(ingredient_lists),
+    )
+
+
+def write_index(index, path, manifest):
+    """Write an index to path atomically.
+
+    The artifact is assembled in a temporary sibling directory and renamed
+    into place, so concurrent builders never expose a partial artifact.
+    Returns False if another process already published the same path.
+    """
+    parent = os.path.dirname(path) or "."
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+    try:
+        terms = [None] * len(index.vocabulary)
+        for term, col in index.vocabulary.items():
+            terms[col] = term
+        with open(os.path.join(tmp_dir, "vocabulary.json"), "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+
+        np.save(os.path.join(tmp_dir, "idf.npy"), np.asarray(index.idf, dtype=np.float64))
+        np.save(os.path.join(tmp_dir, "data.npy"), index.matrix.data)
+        np.save(os.path.join(tmp_dir, "indices.npy"), index.matrix.indices)
+        np.save(os.path.join(tmp_dir, "indptr.npy"), index.matrix.indptr)
+        np.save(os.path.join(tmp_dir, "postings_data.npy"), index.postings.data)
+        np.save(os.path.join(tmp_dir, "postings_indices.npy"), index.postings.indices)
+        np.save(os.path.join(tmp_dir, "postings_indptr.npy"), index.postings.indptr)
+
+        ingredients = index.ingredients
+        with open(os.path.join(tmp_dir, "ingredient_terms.json"), "w", encoding="utf-8") as f:
+            json.dump(ingredients.terms, f, ensure_ascii=False)
+        np.save(os.path.join(tmp_dir, "ingredient_indptr.npy"), ingredients.indptr)
+        np.save(os.path.join(tmp_dir, "ingredient_lines.npy"), ingredients.lines)
+        np.save(os.path.join(tmp_dir, "line_recipe.npy"), ingredients.line_recipe)
+        np.save(os.path.join(tmp_dir, "recipe_line_count.npy"), ingredients.recipe_line_count)
+
+        for field in METADATA_FIELDS:
+            column = index.metadata[field]
+            np.asarray(column.blob, dtype=np.uint8).tofile(
+                os.path.join(tmp_dir, f"meta_{field}.bin")
+            )
+            np.save(os.path.join(tmp_dir, f"meta_{field}_offsets.npy"), column.offsets)
+
+        return publish(tmp_dir, path, manifest, *index.matrix.shape)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def publish(tmp_dir, path, manifest, n_recipes, n_terms):
+    """Write the manifest into a finished artifact directory and rename it to path.
+
+    The manifest goes last: its presence marks a complete artifact.
+    Returns False if another process already published the same path.
+    """
+    manifest = dict(
+        manifest,
+        format_version=FORMAT_VERSION,
+        vectorizer_params=VECTORIZER_PARAMS,
+        n_recipes=int(n_recipes),
+        n_terms=int(n_terms),
+    )
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    try:
+        os.rename(tmp_dir, path)
+    except OSError:
+        if os.path.exists(os.path.join(path, "manifest.json")):
+            return False
+        raise
+    return True
+
+
+def load_index(path):
+    """Memory-map a previously written index.
+
+    Raises ValueError if the artifact was written in a different format.
+    """
+    with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if (
+        manifest.get("format_version") != FORMAT_VERSION
+        or manifest.get("vectorizer_params") != VECTORIZER_PARAMS
+    ):
+        raise ValueError(f"Recipe index at {path} has an incompatible format")
+
+    with open(os.path.join(path, "vocabulary.json"), "r", encoding="utf-8") as f:
+        terms = json.load(f)
+    vocabulary = {term: col for col, term in enumerate(terms)}
+
+    def mapped(name):
+        return np.load(os.path.join(path, name), mmap_mode="r")
+
+    matrix = sp.csr_matrix(
+        (mapped("data.npy"), mapped("indices.npy"), mapped("indptr.npy")),
+        shape=(manifest["n_recipes"], manifest["n_terms"]),
+        copy=False,
+    )
+    postings = sp.csc_matrix(
+        (
+            mapped("postings_data.npy"),
+            mapped("postings_indices.npy"),
+            mapped("postings_indptr.npy"),
+        ),
+        shape=(manifest["n_recipes"], manifest["n_terms"]),
+        copy=False,
+    )
+
+    metadata = {}
+    for field in METADATA_FIELDS:
+        blob_path = os.path.join(path, f"meta_{field}.bin")
+        if os.path.getsize(blob_path):
+            blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        else:
+            # Empty files cannot be memory-mapped
+            blob = np.zeros(0, dtype=np.uint8)
+        metadata[field] = StringColumn(blob, mapped(f"meta_{field}_offsets.npy"))
+
+    with open(os.path.join(path, "ingredient_terms.json"), "r", encoding="utf-8") as f:
+        ingredient_terms = json.load(f)
+    ingredients = IngredientIndex(
+        ingredient_terms,
+        mapped("ingredient_indptr.npy"),
+        mapped("ingredient_lines.npy"),
+        mapped("line_recipe.npy"),
+        mapped("recipe_line_count.npy"),
+    )
+
+    return RecipeIndex(
+        vocabulary, mapped("idf.npy"), matrix, metadata, ingredients, manifest, postings, path
+    )
+
+
+def build_index(source_path=RECIPES_PATH, index_dir=RECIPE_INDEX_DIR, digest=None):
+    """Build and persist the index for source_path. Returns its directory."""
+    from recipe_stream import write_streaming
+
+    digest = digest or source_digest(source_path)
+    path = artifact_path(digest, index_dir)
+    write_streaming(
+        source_path, path, {"source": os.path.basename(source_path), "source_sha256": digest}
+    )
+    return path
+
+
+def load_or_build(source_path=RECIPES_PATH, index_dir=RECIPE_INDEX_DIR, digest=None):
+    """Load the index for source_path, building it if missing or stale."""
+    digest = digest or source_digest(source_path)
+    path = artifact_path(digest, index_dir)
+    try:
+        return load_index(path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Ignoring unreadable recipe index at {path}: {e}")
+
+    print(f"Recipe index for {source_path} not found, building it now")
+    try:
+        return load_index(build_index(source_path, index_dir, digest))
+    except Exception as e:
+        # A read-only filesystem should not stop us from serving
+        print(f"Could not persist recipe index: {e}")
+        return fit_index(source_path)
+
+
+def prune_artifacts(*keep, index_dir=RECIPE_INDEX_DIR):
+    """Remove every artifact directory except those in keep."""
+    if not os.path.isdir(index_dir):
+        return
+    keep = {os.path.abspath(path) for path in keep}
+    for name in os.listdir(index_dir):
+        path = os.path.join(index_dir, name)
+        if name.startswith("v") and os.path.isdir(path) and os.path.abspath(path) not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the persisted recipe index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="fit and write the index")
+    build.add_argument(
+        "--source", default=RECIPES_PATH, help="recipe corpus (JSON or JSON Lines)"
+    )
+    build.add_argument("--out", default=RECIPE_INDEX_DIR, help="index directory")
+    build.add_argument(
+        "--keep-old", action="store_true", help="do not delete older artifacts"
+    )
+    build.add_argument(
+        "--chunk-size", type=int, help="recipes vectorized at a time (RECIPE_INDEX_CHUNK)"
+    )
+    build.add_argument(
+        "--ann", action="store_true", help="also build the ANN structure (see recipe_ann)"
+    )
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if args.chunk_size:
+            import recipe_stream
+
+            recipe_stream.RECIPE_INDEX_CHUNK = args.chunk_size
+        path = build_index(args.source, args.out)
+        if args.ann:
+            recipe_ann.build_ann(path)
+        if not args.keep_old:
+            from recipe_updates import live_artifact
+
+            # The artifact serving merged updates stays until the next merge
+            live = live_artifact(args.source, args.out)
+            prune_artifacts(path, *([live] if live else []), index_dir=args.out)
+        print(f"Recipe index written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,19 @@
 from flask import Blueprint, request, jsonify
-from recipes_recommender import recommend_recipes
-from datetime import datetime
-from db import get_db_connection
+from recipes_recommender import get_index, recommend_recipes, recommend_from_pantry
+from db import db_connection
+from recommendation_cache import (
+    RECOMMENDATION_MODES,
+    get_recommendations,
+    pantry_fingerprint,
+    recommendation_cache,
+    set_recommendations,
+)
 
 recipe_bp = Blueprint("recipe_bp", __name__)
 
+# Assumed days left for items without an expiry date
+DEFAULT_DAYS_UNTIL_EXPIRY = 30
+
 
 def get_user_pantry(user_id):
     """
@@ -14,31 +23,28 @@ def get_user_pantry(user_id):
       - ingredients: list of item names.
       - expiry_info: dict mapping item_name to days until expiry.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    query = "SELECT item_name, expiry_date FROM pantry_items WHERE user_id = %s"
-    cursor.execute(query, (user_id,))
-    rows = cursor.fetchall()
-    conn.close()
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            # Days left are computed by the database (expiry_date is a DATE)
+            query = """
+                SELECT item_name, expiry_date - CURRENT_DATE
+                FROM pantry_items WHERE user_id = %s
+            """
+            cursor.execute(query, (user_id,))
+            rows = cursor.fetchall()
 
     if not rows:
         return [], {}
 
     ingredients = []
     expiry_info = {}
-    today = datetime.today()
 
-    for item_name, expiry_date_str in rows:
+    for item_name, days_until in rows:
         ingredients.append(item_name)
-        try:
-            if expiry_date_str:  # Ensure expiry_date is not NULL
-                expiry_date = datetime.strptime(expiry_date_str, "%Y-%m-%d")
-                days_until = (expiry_date - today).days
-                expiry_info[item_name] = days_until
-            else:
-                expiry_info[item_name] = 30  # Default if expiry date is missing
-        except Exception:
-            expiry_info[item_name] = 30  # Default if parsing fails
+        if days_until is not None:
+            expiry_info[item_name] = days_until
+        else:
+            expiry_info[item_name] = DEFAULT_DAYS_UNTIL_EXPIRY
 
     return ingredients, expiry_info
 
@@ -49,9 +55,36 @@ def get_recipes():
     if not user_id:
         return jsonify({"error": "Missing 'user_id' parameter."}), 400
 
+    # "similarity" ranks by TF-IDF similarity weighted by expiry,
+    # "ann" approximates it through the ANN index (recipe_ann),
+    # "pantry" ranks by how much of each recipe the pantry already covers
+    mode = request.args.get("mode", "similarity")
+    if mode not in RECOMMENDATION_MODES:
+        return jsonify({
+            "error": f"Unknown mode '{mode}'. Use one of: {', '.join(RECOMMENDATION_MODES)}."
+        }), 400
+
     pantry, expiry_info = get_user_pantry(user_id)
     if not pantry:
         return jsonify({"error": "No pantry ingredients found for this user."}), 404
 
-    recommendations = recommend_recipes(pantry, expiry_info, top_n=10)
+    top_n = 10
+    # One snapshot for the whole request: a merge may swap in another at any time
+    index = get_index()
+    fingerprint = pantry_fingerprint(pantry, expiry_info, top_n, index.version)
+    recommendations = get_recommendations(user_id, mode, fingerprint)
+    if recommendations is None:
+        if mode == "pantry":
+            recommendations = recommend_from_pantry(pantry, top_n=top_n, index=index)
+        else:
+            recommendations = recommend_recipes(
+                pantry, expiry_info, top_n=top_n, approximate=mode == "ann", index=index
+            )
+        set_recommendations(user_id, mode, fingerprint, recommendations)
     return jsonify({"recipes": recommendations})
+
+
+@recipe_bp.route("/cache-stats", methods=["GET"])
+def cache_stats():
+    """Hit/miss counters of the recommendation cache."""
+    return jsonify(recommendation_cache.stats()), 200
@@ -0,0 +1,442 @@
+"""Streaming build of the persisted recipe index.
+
+recipe_index.fit_index() json.loads the whole corpus and keeps every
+recipe, its text and the full matrix in memory at once, so peak memory is
+several times the corpus size. write_streaming() produces the same
+artifact (same vocabulary, IDF weights, matrices, ingredient index and
+metadata) with memory bounded by the vocabulary and one chunk of recipes,
+however many recipes there are:
+
+1. iter_recipes() parses the corpus incrementally: a JSON object of
+   id -> recipe (the recipes.json layout), a JSON array of recipes, or
+   JSON Lines (.jsonl / .ndjson), one recipe per line;
+2. a first pass counts document frequencies, which fixes the vocabulary
+   and IDF weights exactly as TfidfVectorizer.fit would;
+3. a second pass vectorizes RECIPE_INDEX_CHUNK recipes at a time with
+   that vocabulary and appends rows, metadata and ingredient lines to
+   spool files on disk;
+4. the term -> recipe postings (CSC copy) and token -> line postings are
+   produced from the spools by partitioning them by key range into
+   bucket spools until a bucket fits RECIPE_INDEX_BLOCK entries, which
+   are then sorted in memory; never the whole matrix.
+
+Every array is written to its .npy file in chunks.
+"""
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from ingredient_index import tokenize
+from recipe_index import METADATA_FIELDS, VECTORIZER_PARAMS, publish
+
+# Recipes vectorized per chunk, and entries grouped per postings block
+RECIPE_INDEX_CHUNK = int(os.getenv("RECIPE_INDEX_CHUNK", "5000"))
+RECIPE_INDEX_BLOCK = int(os.getenv("RECIPE_INDEX_BLOCK", "500000"))
+# Bucket spools written per partitioning pass (open files per pass: this
+# times 3)
+RECIPE_INDEX_FANOUT = int(os.getenv("RECIPE_INDEX_FANOUT", "64"))
+
+# Characters read from the corpus at a time
+READ_SIZE = 1 << 20
+
+JSON_LINES_EXTENSIONS = (".jsonl", ".ndjson")
+
+
+def iter_recipes(source_path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (recipe id, recipe) pairs without loading the whole corpus.
+
+    Recipes in an array or in JSON Lines use their "id" field, or their
+    position when they have none.
+    """
+    with open(source_path, "r", encoding="utf-8") as f:
+        if source_path.endswith(JSON_LINES_EXTENSIONS):
+            for position, line in enumerate(f):
+                if line.strip():
+                    rec = json.loads(line)
+                    yield str(rec.get("id", position)), rec
+            return
+        yield from _iter_json_container(f)
+
+
+def _iter_json_container(f) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Members of a top-level JSON object or array, decoded one at a time."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def more():
+        # Drop what was consumed and append the next chunk
+        nonlocal buf, pos, eof
+        chunk = f.read(max(READ_SIZE, len(buf) - pos))
+        buf = buf[pos:] + chunk
+        pos = 0
+        eof = not chunk
+
+    def skip_space():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            more()
+
+    def decode():
+        # A value only counts as complete when something follows it, so a
+        # number cut off at the end of the buffer is never taken for whole
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+                if end < len(buf) or eof:
+                    pos = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            more()
+
+    def expect(chars):
+        nonlocal pos
+        skip_space()
+        if pos >= len(buf) or buf[pos] not in chars:
+            raise ValueError(f"Expected one of {chars!r} in recipe corpus")
+        pos += 1
+        return buf[pos - 1]
+
+    opening = expect("{[")
+    closing = "}" if opening == "{" else "]"
+    skip_space()
+    if pos < len(buf) and buf[pos] == closing:
+        return
+    position = 0
+    while True:
+        skip_space()
+        if opening == "{":
+            key = decode()
+            expect(":")
+            skip_space()
+            rec = decode()
+        else:
+            rec = decode()
+            key = rec.get("id", position) if isinstance(rec, dict) else position
+        yield str(key), rec
+        position += 1
+        if expect("," + closing) == closing:
+            return
+
+
+def _chunks(source_path: str, size: int) -> Iterator[List[Tuple[str, Dict[str, Any]]]]:
+    chunk = []
+    for item in iter_recipes(source_path):
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _ingredient_text(rec: Dict[str, Any]) -> str:
+    return " ".join(rec.get("ingredients", []))
+
+
+class _Spool:
+    """Append-only array on disk, converted to .npy at the end."""
+
+    def __init__(self, path: str, dtype):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.size = 0
+        self._file = open(path, "wb")
+
+    def append(self, values) -> None:
+        values = np.asarray(values, dtype=self.dtype)
+        values.tofile(self._file)
+        self.size += len(values)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def read(self, start: int, count: int) -> np.ndarray:
+        """count values starting at index start (file must be closed)."""
+        with open(self.path, "rb") as f:
+            f.seek(start * self.dtype.itemsize)
+            return np.fromfile(f, dtype=self.dtype, count=count)
+
+    def chunks(self, size: int) -> Iterator[np.ndarray]:
+        with open(self.path, "rb") as f:
+            while True:
+                values = np.fromfile(f, dtype=self.dtype, count=size)
+                if not len(values):
+                    return
+                yield values
+
+    def save(self, npy_path: str, chunk: int = RECIPE_INDEX_BLOCK) -> None:
+        """Write the spool as a 1-d .npy file, chunk by chunk, and delete it."""
+        self.close()
+        with open(npy_path, "wb") as out:
+            np.lib.format.write_array_header_1_0(out, {
+                "descr": np.lib.format.dtype_to_descr(self.dtype),
+                "fortran_order": False,
+                "shape": (self.size,),
+            })
+            for values in self.chunks(chunk):
+                values.tofile(out)
+        os.remove(self.path)
+
+
+def _group(keys: _Spool, payloads: List[_Spool], counts: np.ndarray, outputs: List[_Spool],
+           first: int = 0) -> None:
+    """Reorder payload entries by key, keeping their order within a key.
+
+    counts[k] is the number of entries with key first + k. Up to
+    RECIPE_INDEX_BLOCK entries are sorted in memory; larger inputs are
+    split by key range into at most RECIPE_INDEX_FANOUT bucket spools in
+    one pass, and each bucket is grouped the same way, in key order. Every
+    entry is read and written once per level, and there are
+    log_FANOUT(entries / BLOCK) levels.
+    """
+    total = int(counts.sum())
+    if not total:
+        return
+    if len(counts) == 1:
+        # One key: already in order
+        for payload, output in zip(payloads, outputs):
+            for values in payload.chunks(RECIPE_INDEX_BLOCK):
+                output.append(values)
+        return
+    if total <= RECIPE_INDEX_BLOCK:
+        block_keys = keys.read(0, total)
+        order = np.argsort(block_keys, kind="stable")
+        for payload, output in zip(payloads, outputs):
+            output.append(payload.read(0, total)[order])
+        return
+
+    # Bucket b holds keys first + starts[b] up to the next start, about
+    # the same number of entries each; at least two buckets, so every
+    # bucket has fewer keys than its input
+    bounds = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+    targets = np.arange(1, RECIPE_INDEX_FANOUT) * (total / RECIPE_INDEX_FANOUT)
+    starts = np.unique(np.concatenate(([0, 1], np.searchsorted(bounds, targets, side="right") - 1)))
+
+    directory = os.path.dirname(keys.path)
+    prefix = f"{os.path.basename(keys.path)}.{first}"
+    buckets = [
+        [_Spool(os.path.join(directory, f"{prefix}.{b}.{i}"), spool.dtype)
+         for i, spool in enumerate([keys] + payloads)]
+        for b in range(len(starts))
+    ]
+    try:
+        for chunk in zip(*(spool.chunks(RECIPE_INDEX_BLOCK) for spool in [keys] + payloads)):
+            bucket = np.searchsorted(starts, chunk[0] - first, side="right") - 1
+            order = np.argsort(bucket, kind="stable")
+            edges = np.searchsorted(bucket[order], np.arange(len(starts) + 1))
+            for i, values in enumerate(chunk):
+                values = values[order]
+                for b in np.flatnonzero(np.diff(edges)):
+                    buckets[b][i].append(values[edges[b]:edges[b + 1]])
+        for bucket in buckets:
+            for spool in bucket:
+                spool.close()
+        for b, start in enumerate(starts):
+            end = starts[b + 1] if b + 1 < len(starts) else len(counts)
+            _group(buckets[b][0], buckets[b][1:], counts[start:end], outputs, first + int(start))
+            for spool in buckets[b]:
+                os.remove(spool.path)
+    finally:
+        for bucket in buckets:
+            for spool in bucket:
+                spool.close()
+                if os.path.exists(spool.path):
+                    os.remove(spool.path)
+
+
+def _scan(source_path: str):
+    """First pass: document frequencies and ingredient-token line counts.
+
+    doc_freq is ordered by each term's first occurrence in the corpus, the
+    order TfidfVectorizer.fit keeps the entries of each row in.
+    """
+    analyzer = TfidfVectorizer(**VECTORIZER_PARAMS).build_analyzer()
+    doc_freq: Dict[str, int] = {}
+    token_lines: Dict[str, int] = {}
+    n_recipes = 0
+    for _, rec in iter_recipes(source_path):
+        n_recipes += 1
+        for term in dict.fromkeys(analyzer(_ingredient_text(rec))):
+            doc_freq[term] = doc_freq.get(term, 0) + 1
+        for line in rec.get("ingredients", []):
+            for token in tokenize(line):
+                token_lines[token] = token_lines.get(token, 0) + 1
+    return n_recipes, doc_freq, token_lines
+
+
+def _vectorize(counter, idf, first_seen, texts):
+    """TF-IDF rows for texts, bit-for-bit what fit_transform gives them.
+
+    fit_transform leaves each row's entries in first-occurrence order, and
+    the L2 norm is summed in that order; summed in column order instead,
+    the weights can differ in the last bit. So the counts are put in that
+    order before weighting and sorted by column afterwards.
+    """
+    matrix = counter.transform(texts)
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    order = np.lexsort((first_seen[matrix.indices], rows))
+    matrix.indices = matrix.indices[order]
+    matrix.data = matrix.data[order]
+    matrix.has_sorted_indices = False
+    matrix.data *= idf[matrix.indices]
+    matrix = normalize(matrix, copy=False)
+    matrix.sort_indices()
+    return matrix
+
+
+def write_streaming(source_path: str, path: str, manifest: Dict[str, Any]) -> bool:
+    """Build the index for source_path and publish it at path.
+
+    Returns False if another process already published the same path.
+    """
+    n_recipes, doc_freq, token_lines = _scan(source_path)
+
+    terms = sorted(doc_freq)
+    vocabulary = {term: col for col, term in enumerate(terms)}
+    df = np.array([doc_freq[term] for term in terms], dtype=np.float64)
+    # TfidfTransformer's smoothed IDF, computed the same way
+    idf = np.full_like(df, n_recipes + 1)
+    idf /= df + 1
+    np.log(idf, out=idf)
+    idf += 1.0
+    # Column -> position of the term's first occurrence, see _vectorize()
+    first_seen = np.empty(len(terms), dtype=np.int64)
+    first_seen[[vocabulary[term] for term in doc_freq]] = np.arange(len(terms))
+    counter = CountVectorizer(vocabulary=vocabulary, dtype=np.float64, **VECTORIZER_PARAMS)
+    del doc_freq
+
+    ingredient_terms = sorted(token_lines)
+    token_ids = {token: i for i, token in enumerate(ingredient_terms)}
+    token_counts = np.array([token_lines[token] for token in ingredient_terms], dtype=np.int64)
+    del token_lines
+
+    # scipy picks int32 index arrays until they would overflow
+    nnz = int(df.sum())
+    index_dtype = np.int32 if nnz < np.iinfo(np.int32).max else np.int64
+
+    parent = os.path.dirname(path) or "."
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+    try:
+        def spool(name, dtype):
+            return _Spool(os.path.join(tmp_dir, name + ".spool"), dtype)
+
+        with open(os.path.join(tmp_dir, "vocabulary.json"), "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, "ingredient_terms.json"), "w", encoding="utf-8") as f:
+            json.dump(ingredient_terms, f, ensure_ascii=False)
+        np.save(os.path.join(tmp_dir, "idf.npy"), idf)
+
+        data, indices, rows = spool("data", np.float64), spool("indices", index_dtype), spool("rows", index_dtype)
+        indptr = spool("indptr", index_dtype)
+        indptr.append([0])
+        blobs = {}
+        offsets = {}
+        for field in METADATA_FIELDS:
+            blobs[field] = open(os.path.join(tmp_dir, f"meta_{field}.bin"), "wb")
+            offsets[field] = spool(f"meta_{field}_offsets", np.int64)
+            offsets[field].append([0])
+        line_recipe, recipe_line_count = spool("line_recipe", np.int32), spool("recipe_line_count", np.int32)
+        pair_tokens, pair_lines = spool("pair_tokens", np.int32), spool("pair_lines", np.int32)
+
+        row = 0
+        line_id = 0
+        blob_sizes = dict.fromkeys(METADATA_FIELDS, 0)
+        for chunk in _chunks(source_path, RECIPE_INDEX_CHUNK):
+            matrix = _vectorize(counter, idf, first_seen, [_ingredient_text(rec) for _, rec in chunk])
+            data.append(matrix.data)
+            indices.append(matrix.indices)
+            rows.append(np.repeat(np.arange(row, row + len(chunk)), np.diff(matrix.indptr)))
+            indptr.append(matrix.indptr[1:] + data.size - matrix.nnz)
+
+            # Buffered per chunk: one spool write per array, not per recipe
+            ends = {field: [] for field in METADATA_FIELDS}
+            recipes, counts, tokens, lines = [], [], [], []
+            for rec_id, rec in chunk:
+                values = {
+                    "id": str(rec_id),
+                    "title": rec.get("title") or "",
+                    "instructions": rec.get("instructions") or "",
+                    "picture_link": rec.get("picture_link") or "",
+                }
+                for field in METADATA_FIELDS:
+                    encoded = values[field].encode("utf-8")
+                    blobs[field].write(encoded)
+                    blob_sizes[field] += len(encoded)
+                    ends[field].append(blob_sizes[field])
+
+                count = 0
+                for line in rec.get("ingredients", []):
+                    line_tokens = tokenize(line)
+                    if not line_tokens:
+                        continue
+                    recipes.append(row)
+                    tokens.extend(token_ids[token] for token in line_tokens)
+                    lines.extend([line_id] * len(line_tokens))
+                    line_id += 1
+                    count += 1
+                counts.append(count)
+                row += 1
+
+            for field in METADATA_FIELDS:
+                offsets[field].append(ends[field])
+            line_recipe.append(recipes)
+            recipe_line_count.append(counts)
+            pair_tokens.append(tokens)
+            pair_lines.append(lines)
+
+        for blob in blobs.values():
+            blob.close()
+        for array in (data, indices, indptr, line_recipe, recipe_line_count):
+            array.close()
+        for field in METADATA_FIELDS:
+            offsets[field].save(os.path.join(tmp_dir, f"meta_{field}_offsets.npy"))
+
+        # Term -> recipe postings: the matrix entries regrouped by column
+        rows.close()
+        postings_rows, postings_data = spool("postings_indices", index_dtype), spool("postings_data", np.float64)
+        _group(indices, [rows, data], df.astype(np.int64), [postings_rows, postings_data])
+        postings_indptr = np.concatenate(([0], np.cumsum(df, dtype=np.int64))).astype(index_dtype)
+        np.save(os.path.join(tmp_dir, "postings_indptr.npy"), postings_indptr)
+        postings_rows.save(os.path.join(tmp_dir, "postings_indices.npy"))
+        postings_data.save(os.path.join(tmp_dir, "postings_data.npy"))
+        os.remove(rows.path)
+
+        # Token -> ingredient line postings
+        pair_tokens.close()
+        pair_lines.close()
+        ingredient_lines = spool("ingredient_lines", np.int32)
+        _group(pair_tokens, [pair_lines], token_counts, [ingredient_lines])
+        ingredient_lines.save(os.path.join(tmp_dir, "ingredient_lines.npy"))
+        np.save(
+            os.path.join(tmp_dir, "ingredient_indptr.npy"),
+            np.concatenate(([0], np.cumsum(token_counts, dtype=np.int64))),
+        )
+        os.remove(pair_tokens.path)
+        os.remove(pair_lines.path)
+
+        for name, array in (
+            ("data", data), ("indices", indices), ("indptr", indptr),
+            ("line_recipe", line_recipe), ("recipe_line_count", recipe_line_count),
+        ):
+            array.save(os.path.join(tmp_dir, f"{name}.npy"))
+
+        return publish(tmp_dir, path, manifest, n_recipes, len(terms))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
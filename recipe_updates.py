@@ -0,0 +1,575 @@
+"""Adding and deleting recipes without rebuilding the index.
+
+Changes are appended to an update log in RECIPE_INDEX_DIR, one JSON line
+per operation:
+
+    {"op": "add", "id": "r42", "recipe": {"title": ..., "ingredients": [...], ...}}
+    {"op": "delete", "id": "r7"}
+
+Adding an id that already exists replaces that recipe. From the command
+line:
+
+    python recipe_updates.py add new_recipes.json   # JSON object/array or JSON Lines
+    python recipe_updates.py delete r7 r8
+    python recipe_updates.py merge                  # fold the log into a new base
+    python recipe_updates.py status
+
+Every worker serves a LiveIndex: the base index (the memory-mapped
+artifact) plus a small in-memory delta segment holding the logged
+recipes, with the base rows they delete or replace masked out
+(tombstones). The delta is vectorized with the base vocabulary and IDF
+weights, so words the base has never seen do not count until the next
+merge. Workers poll the log every RECIPE_INDEX_REFRESH_INTERVAL seconds
+and rebuild the delta in a background thread; requests keep using the
+previous snapshot until the new one is swapped in.
+
+A merge writes the base corpus with the log applied to a new JSON Lines
+corpus, builds its index with the streaming builder (refitting the
+vocabulary and IDF) and then switches the CURRENT pointer file to it,
+together with a fresh log holding any operations appended meanwhile.
+Workers notice the new pointer, map the new artifact, touch its pages
+and swap it in. Once the log holds RECIPE_INDEX_MERGE_THRESHOLD
+operations, a worker starts the merge in a low-priority child process
+(RECIPE_INDEX_AUTO_MERGE=0 leaves merging to the command above, e.g. from
+cron). A lock file keeps one merge at a time per index directory.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from recipe_index import (
+    METADATA_FIELDS,
+    RECIPE_INDEX_DIR,
+    RECIPES_PATH,
+    IngredientIndex,
+    RecipeIndex,
+    StringColumn,
+    load_or_build,
+    source_digest,
+)
+
+RECIPE_INDEX_REFRESH_INTERVAL = float(os.getenv("RECIPE_INDEX_REFRESH_INTERVAL", "2"))
+RECIPE_INDEX_MERGE_THRESHOLD = int(os.getenv("RECIPE_INDEX_MERGE_THRESHOLD", "1000"))
+RECIPE_INDEX_AUTO_MERGE = os.getenv("RECIPE_INDEX_AUTO_MERGE", "1") == "1"
+
+CURRENT_FILE = "CURRENT"
+LOG_LOCK_FILE = "updates.lock"
+MERGE_LOCK_FILE = "merge.lock"
+
+
+# --- CURRENT pointer and update log -------------------------------------------
+
+_digests: Dict[Tuple[str, int, int], str] = {}
+
+
+def _source_digest(source_path: str) -> str:
+    """source_digest(), remembered while the file is unchanged."""
+    st = os.stat(source_path)
+    key = (os.path.abspath(source_path), st.st_mtime_ns, st.st_size)
+    if key not in _digests:
+        _digests[key] = source_digest(source_path)
+    return _digests[key]
+
+
+def read_state(source_path: str = RECIPES_PATH, index_dir: str = RECIPE_INDEX_DIR) -> Dict[str, Any]:
+    """The CURRENT pointer for source_path, or the initial state.
+
+    Keys: source_sha256, generation, corpus (None: source_path itself),
+    corpus_sha256 and log (file name of the update log). A pointer left
+    by an earlier version of source_path is ignored.
+    """
+    digest = _source_digest(source_path)
+    try:
+        with open(os.path.join(index_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("source_sha256") == digest:
+            return state
+    except FileNotFoundError:
+        pass
+    return {
+        "source_sha256": digest,
+        "generation": 0,
+        "corpus": None,
+        "corpus_sha256": digest,
+        "log": f"updates-{digest[:16]}-0.jsonl",
+    }
+
+
+def _signature(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _write_state(state: Dict[str, Any], index_dir: str) -> None:
+    # Written to a temporary file and renamed, so readers see old or new
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=index_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(index_dir, CURRENT_FILE))
+
+
+def corpus_path(state: Dict[str, Any], source_path: str, index_dir: str) -> str:
+    return os.path.join(index_dir, state["corpus"]) if state["corpus"] else source_path
+
+
+def live_artifact(source_path: str = RECIPES_PATH, index_dir: str = RECIPE_INDEX_DIR) -> Optional[str]:
+    """Artifact directory of the last merge for source_path, if any."""
+    from recipe_index import artifact_path
+
+    try:
+        state = read_state(source_path, index_dir)
+    except FileNotFoundError:
+        return None
+    return artifact_path(state["corpus_sha256"], index_dir) if state["corpus"] else None
+
+
+@contextmanager
+def _locked(index_dir: str, name: str, blocking: bool = True) -> Iterator[bool]:
+    """Hold an exclusive lock on index_dir/name; yields False if busy and not blocking."""
+    import fcntl
+
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, name), "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def append_operations(
+    operations: Iterable[Dict[str, Any]],
+    source_path: str = RECIPES_PATH,
+    index_dir: str = RECIPE_INDEX_DIR,
+) -> int:
+    """Append operations to the update log. Returns how many were written."""
+    lines = "".join(json.dumps(op, ensure_ascii=False) + "\n" for op in operations)
+    if not lines:
+        return 0
+    with _locked(index_dir, LOG_LOCK_FILE):
+        # Read under the lock: a merge switches logs while holding it
+        state = read_state(source_path, index_dir)
+        with open(os.path.join(index_dir, state["log"]), "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+    return lines.count("\n")
+
+
+def add_recipes(
+    recipes: Iterable[Tuple[str, Dict[str, Any]]],
+    source_path: str = RECIPES_PATH,
+    index_dir: str = RECIPE_INDEX_DIR,
+) -> int:
+    """Add (id, recipe) pairs, replacing recipes with the same id."""
+    return append_operations(
+        ({"op": "add", "id": str(rec_id), "recipe": rec} for rec_id, rec in recipes),
+        source_path,
+        index_dir,
+    )
+
+
+def delete_recipes(
+    ids: Iterable[str], source_path: str = RECIPES_PATH, index_dir: str = RECIPE_INDEX_DIR
+) -> int:
+    """Delete recipes by id; unknown ids are ignored."""
+    return append_operations(
+        ({"op": "delete", "id": str(rec_id)} for rec_id in ids), source_path, index_dir
+    )
+
+
+def read_log(path: str, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+    """Complete operations after byte offset, and the offset after them."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], offset
+    # A line still being written has no newline yet
+    end = data.rfind(b"\n") + 1
+    ops = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    return ops, offset + end
+
+
+class Delta:
+    """Recipes added since the base was built and base ids they mask."""
+
+    def __init__(self):
+        self.recipes: Dict[str, Dict[str, Any]] = {}
+        # Base ids deleted or replaced; ids the base lacks are harmless
+        self.masked = set()
+        self.operations = 0
+
+    def apply(self, ops: Iterable[Dict[str, Any]]) -> None:
+        for op in ops:
+            rec_id = str(op["id"])
+            # A re-added recipe moves to the end, as it will after a merge
+            self.recipes.pop(rec_id, None)
+            self.masked.add(rec_id)
+            if op["op"] == "add":
+                self.recipes[rec_id] = op["recipe"]
+            self.operations += 1
+
+
+# --- Serving --------------------------------------------------------------------
+
+class IdLookup:
+    """Row of a base recipe id, from hashes of the id column (16 bytes per row)."""
+
+    def __init__(self, ids: StringColumn):
+        self.ids = ids
+        hashes = np.fromiter((hash(ids[row]) for row in range(len(ids))), dtype=np.int64, count=len(ids))
+        self.order = np.argsort(hashes, kind="stable")
+        self.hashes = hashes[self.order]
+
+    def rows(self, ids: Iterable[str]) -> List[int]:
+        found = []
+        for rec_id in ids:
+            h = hash(rec_id)
+            start = np.searchsorted(self.hashes, h, side="left")
+            end = np.searchsorted(self.hashes, h, side="right")
+            found.extend(int(row) for row in self.order[start:end] if self.ids[row] == rec_id)
+        return found
+
+
+def build_segment(base: RecipeIndex, recipes: Dict[str, Dict[str, Any]]) -> Optional[RecipeIndex]:
+    """In-memory index of recipes, vectorized with the base's vocabulary and IDF."""
+    if not recipes:
+        return None
+    ingredient_lists = [rec.get("ingredients", []) for rec in recipes.values()]
+    matrix = base.vectorizer.transform(" ".join(ingredients) for ingredients in ingredient_lists).tocsr()
+    matrix.sort_indices()
+    columns = {
+        "id": list(recipes),
+        "title": [rec.get("title") or "" for rec in recipes.values()],
+        "instructions": [rec.get("instructions") or "" for rec in recipes.values()],
+        "picture_link": [rec.get("picture_link") or "" for rec in recipes.values()],
+    }
+    metadata = {field: StringColumn.from_strings(columns[field]) for field in METADATA_FIELDS}
+    return RecipeIndex(
+        base.vocabulary, base.idf, matrix, metadata, IngredientIndex.build(ingredient_lists)
+    )
+
+
+class LiveIndex:
+    """A base index plus a delta segment, searched as one index.
+
+    Rows below len(base) are base rows; delta row i is len(base) + i, so
+    ties keep going to the higher (newer) row. Masked base rows are
+    dropped from every result.
+    """
+
+    def __init__(self, base: RecipeIndex, delta: Optional[RecipeIndex] = None, masked=(), version: str = ""):
+        self.base = base
+        self.delta = delta
+        self.masked = np.unique(np.asarray(list(masked), dtype=np.int64))
+        self.version = version
+        self.vocabulary = base.vocabulary
+        self.vectorizer = base.vectorizer
+        self._n_base = len(base)
+
+    def __len__(self):
+        return self._n_base - len(self.masked) + (len(self.delta) if self.delta else 0)
+
+    def search(self, query_vec, top_n, approximate=False):
+        """Rows of the top_n recipes by cosine similarity to query_vec.
+
+        approximate searches the base through its ANN structure (the delta
+        is always searched exactly).
+        """
+        unchanged = self.delta is None and not len(self.masked)
+        if unchanged and not approximate:
+            return self.base.search(query_vec, top_n)
+        search = self.base.search_ann if approximate else self.base.search_scored
+        rows, scores = search(query_vec, top_n + len(self.masked))
+        if unchanged:
+            return rows
+        keep = ~np.isin(rows, self.masked)
+        rows, scores = rows[keep], scores[keep]
+        if self.delta is not None:
+            delta_rows, delta_scores = self.delta.search_scored(query_vec, top_n)
+            rows = np.concatenate([rows, delta_rows + self._n_base])
+            scores = np.concatenate([scores, delta_scores])
+        order = np.lexsort((-rows, -scores))[:top_n]
+        return rows[order]
+
+    def match(self, pantry_items, top_n):
+        """Recipes ranked by pantry coverage, see IngredientIndex.match."""
+        if self.delta is None and not len(self.masked):
+            return self.base.match(pantry_items, top_n)
+        masked = set(self.masked.tolist())
+        matches = [m for m in self.base.match(pantry_items, top_n + len(masked)) if m[0] not in masked]
+        if self.delta is not None:
+            matches.extend(
+                (row + self._n_base, matched, missing, coverage)
+                for row, matched, missing, coverage in self.delta.match(pantry_items, top_n)
+            )
+        matches.sort(key=lambda m: (m[2], -m[3], -m[1], m[0]))
+        return matches[:top_n]
+
+    def records(self, rows):
+        """Metadata dicts for the given rows, in the given order."""
+        return [
+            self.base.records([row])[0] if row < self._n_base
+            else self.delta.records([row - self._n_base])[0]
+            for row in rows
+        ]
+
+
+def _prefault(index: RecipeIndex) -> None:
+    """Read one value per page of the mapped arrays, so requests do not fault them in."""
+    arrays = [
+        index.matrix.data, index.matrix.indices, index.matrix.indptr,
+        index.postings.data, index.postings.indices, index.postings.indptr,
+        index.ingredients.indptr, index.ingredients.lines,
+        index.ingredients.line_recipe, index.ingredients.recipe_line_count, index.idf,
+    ]
+    for column in index.metadata.values():
+        arrays.extend([column.blob, column.offsets])
+    for array in arrays:
+        if len(array):
+            np.asarray(array[:: max(1, 4096 // array.itemsize)]).sum()
+
+
+class LiveRecipes:
+    """The serving side: keeps a LiveIndex in step with CURRENT and the log."""
+
+    def __init__(self, source_path: str = RECIPES_PATH, index_dir: str = RECIPE_INDEX_DIR):
+        self.source_path = source_path
+        self.index_dir = index_dir
+        self._refresh_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self._merge: Optional[subprocess.Popen] = None
+        self._checked = 0.0
+        self._seen: Tuple[Any, ...] = ()
+        self._state: Optional[Dict[str, Any]] = None
+        self.index: Optional[LiveIndex] = None
+        self.refresh()
+
+    def current(self) -> LiveIndex:
+        """The latest snapshot; starts a refresh when the files have changed."""
+        now = time.monotonic()
+        if now - self._checked >= RECIPE_INDEX_REFRESH_INTERVAL:
+            self._checked = now
+            if self._stat() != self._seen:
+                self._refresh_in_background()
+        return self.index
+
+    def _stat(self) -> Tuple[Any, ...]:
+        """(CURRENT, log) file signatures; a change means there is work to do."""
+        paths = [os.path.join(self.index_dir, CURRENT_FILE)]
+        if self._state is not None:
+            paths.append(os.path.join(self.index_dir, self._state["log"]))
+        return tuple(_signature(path) for path in paths)
+
+    def _refresh_in_background(self) -> None:
+        # One thread per process: gunicorn may fork after the first load
+        if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+            return
+        self._thread = threading.Thread(target=self._refresh_quietly, name="recipe-index-refresh", daemon=True)
+        self._thread_pid = os.getpid()
+        self._thread.start()
+
+    def _refresh_quietly(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Recipe index refresh failed: {e}")
+
+    def refresh(self) -> LiveIndex:
+        """Load a new base if CURRENT moved on, apply new log entries and swap."""
+        with self._refresh_lock:
+            current_path = os.path.join(self.index_dir, CURRENT_FILE)
+            while True:
+                # Signatures are taken before reading, so a change made while
+                # reading is seen by the next poll
+                current = _signature(current_path)
+                state = read_state(self.source_path, self.index_dir)
+                # A missing log with CURRENT since rewritten: merged meanwhile
+                log_path = os.path.join(self.index_dir, state["log"])
+                if os.path.exists(log_path) or _signature(current_path) == current:
+                    break
+            new_base = self._state is None or state["generation"] != self._state["generation"]
+            if new_base:
+                base = load_or_build(
+                    corpus_path(state, self.source_path, self.index_dir),
+                    self.index_dir,
+                    state["corpus_sha256"],
+                )
+                if self.index is not None:
+                    _prefault(base)
+                self._base, self._lookup = base, None
+                self._delta, self._offset = Delta(), 0
+            self._state = state
+            self._seen = (current, _signature(log_path))
+
+            ops, self._offset = read_log(log_path, self._offset)
+            if ops or new_base:
+                self._delta.apply(ops)
+                masked = []
+                if self._delta.masked:
+                    if self._lookup is None:
+                        self._lookup = IdLookup(self._base.metadata["id"])
+                    masked = self._lookup.rows(self._delta.masked)
+                self.index = LiveIndex(
+                    self._base,
+                    build_segment(self._base, self._delta.recipes),
+                    masked,
+                    f"{state['corpus_sha256'][:16]}:{self._offset}",
+                )
+
+            if RECIPE_INDEX_AUTO_MERGE and self._delta.operations >= RECIPE_INDEX_MERGE_THRESHOLD:
+                self._start_merge()
+            return self.index
+
+    def _start_merge(self) -> None:
+        if self._merge is not None and self._merge.poll() is None:
+            return
+        env = dict(
+            os.environ,
+            RECIPES_PATH=self.source_path,
+            RECIPE_INDEX_DIR=self.index_dir,
+            RECIPE_INDEX_MERGE_NICE=os.getenv("RECIPE_INDEX_MERGE_NICE", "10"),
+        )
+        # A separate, niced process: the build never holds this worker's GIL
+        self._merge = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "merge"], env=env, start_new_session=True
+        )
+
+
+# --- Merging --------------------------------------------------------------------
+
+def merge(source_path: str = RECIPES_PATH, index_dir: str = RECIPE_INDEX_DIR) -> Optional[Dict[str, Any]]:
+    """Fold the update log into a new base index and point CURRENT at it.
+
+    Returns the new state, or None if another merge is running or there
+    is nothing to merge.
+    """
+    from recipe_ann import ANN_DIR, build_ann
+    from recipe_index import artifact_path, build_index
+    from recipe_stream import iter_recipes
+
+    with _locked(index_dir, MERGE_LOCK_FILE, blocking=False) as acquired:
+        if not acquired:
+            print("Another recipe index merge is running")
+            return None
+
+        with _locked(index_dir, LOG_LOCK_FILE):
+            state = read_state(source_path, index_dir)
+        log_path = os.path.join(index_dir, state["log"])
+        ops, merged_to = read_log(log_path)
+        if not ops:
+            return None
+        delta = Delta()
+        delta.apply(ops)
+
+        # Base recipes still live, in order, then the delta's
+        fd, tmp_corpus = tempfile.mkstemp(prefix=".tmp-", suffix=".jsonl", dir=index_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for rec_id, rec in iter_recipes(corpus_path(state, source_path, index_dir)):
+                    if rec_id not in delta.masked:
+                        f.write(json.dumps(dict(rec, id=rec_id), ensure_ascii=False) + "\n")
+                for rec_id, rec in delta.recipes.items():
+                    f.write(json.dumps(dict(rec, id=rec_id), ensure_ascii=False) + "\n")
+            digest = source_digest(tmp_corpus)
+            corpus = f"corpus-{digest[:16]}.jsonl"
+            os.replace(tmp_corpus, os.path.join(index_dir, corpus))
+        finally:
+            if os.path.exists(tmp_corpus):
+                os.remove(tmp_corpus)
+        artifact = build_index(os.path.join(index_dir, corpus), index_dir, digest)
+        if os.path.isdir(os.path.join(artifact_path(state["corpus_sha256"], index_dir), ANN_DIR)):
+            build_ann(artifact)
+
+        generation = state["generation"] + 1
+        new_state = dict(
+            state,
+            generation=generation,
+            corpus=corpus,
+            corpus_sha256=digest,
+            log=f"updates-{state['source_sha256'][:16]}-{generation}.jsonl",
+        )
+        with _locked(index_dir, LOG_LOCK_FILE):
+            # Operations appended while building carry over to the new log
+            with open(log_path, "rb") as f:
+                f.seek(merged_to)
+                tail = f.read()
+            with open(os.path.join(index_dir, new_state["log"]), "wb") as f:
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            _write_state(new_state, index_dir)
+
+        # A worker that read the old CURRENT may still be about to open the
+        # old log, so it is kept until the next merge; the one before goes
+        previous_log = os.path.join(
+            index_dir, f"updates-{state['source_sha256'][:16]}-{state['generation'] - 1}.jsonl"
+        )
+        if state["generation"] > 0 and os.path.exists(previous_log):
+            os.remove(previous_log)
+        # Workers still mapping the old files keep them until they swap
+        if state["corpus"] and state["corpus"] != corpus:
+            os.remove(os.path.join(index_dir, state["corpus"]))
+            from recipe_index import prune_artifacts
+
+            prune_artifacts(
+                artifact_path(digest, index_dir),
+                artifact_path(state["source_sha256"], index_dir),
+                index_dir=index_dir,
+            )
+        print(f"Merged {delta.operations} recipe updates into generation {generation}")
+        return new_state
+
+
+def main(argv: List[str]) -> int:
+    from recipe_stream import iter_recipes
+
+    usage = "usage: python recipe_updates.py add FILE | delete ID... | merge | status"
+    if not argv or argv[0] not in ("add", "delete", "merge", "status"):
+        print(usage)
+        return 2
+    command, args = argv[0], argv[1:]
+    if command == "add" and len(args) == 1:
+        print(f"Logged {add_recipes(iter_recipes(args[0]))} recipes")
+    elif command == "delete" and args:
+        print(f"Logged {delete_recipes(args)} deletions")
+    elif command == "merge" and not args:
+        if hasattr(os, "nice"):
+            os.nice(int(os.getenv("RECIPE_INDEX_MERGE_NICE", "0")))
+        merge()
+    elif command == "status" and not args:
+        state = read_state()
+        ops, _ = read_log(os.path.join(RECIPE_INDEX_DIR, state["log"]))
+        delta = Delta()
+        delta.apply(ops)
+        print(f"generation {state['generation']}, corpus {state['corpus'] or RECIPES_PATH}")
+        print(f"{delta.operations} logged operations: {len(delta.recipes)} recipes added or "
+              f"replaced, {len(delta.masked)} base ids masked")
+    else:
+        print(usage)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,32 +1,34 @@
-import json
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+import scipy.sparse as sp
 import re
+import threading
+from metrics import span, timed
+from normalize import canonical_names, canonicalize
+
+_live = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    The current recipe index snapshot: the persisted index, loaded on first
+    use (built on demand if missing or stale), plus recipes added or deleted
+    since (see recipe_updates). recipe_index pulls in scikit-learn, so it is
+    only imported here rather than when the app starts.
+    """
+    global _live
+    if _live is None:
+        with _index_lock:
+            if _live is None:
+                from recipe_updates import LiveRecipes
+                _live = LiveRecipes()
+    return _live.current()
 
-# Load recipes from a JSON file (adjust file name if needed)
-with open("recipes.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-# Convert JSON recipes into a DataFrame.
-recipes_list = []
-for rec_id, rec in data.items():
-    ingredients_text = " ".join(rec.get("ingredients", []))
-    recipes_list.append(
-        {
-            "id": rec_id,
-            "title": rec.get("title", ""),
-            "instructions": rec.get("instructions", ""),
-            "ingredients_text": ingredients_text,
-            "picture_link": rec.get("picture_link", ""),
-        }
-    )
-recipes = pd.DataFrame(recipes_list)
 
-# Vectorize the ingredients text.
-vectorizer = TfidfVectorizer(stop_words="english")
-recipe_vectors = vectorizer.fit_transform(recipes["ingredients_text"])
+def loaded_index():
+    """get_index() if the index has already been loaded, else None (never loads it)."""
+    live = _live
+    return live.current() if live is not None else None
 
 
 def format_instructions(instr_text):
@@ -45,36 +47,110 @@ def format_instructions(instr_text):
     return steps
 
 
-def recommend_recipes(pantry_ingredients, expiry_info, top_n=10):
+def format_recipe(rec):
+    """Shape an index record for the API response."""
+    return {
+        "title": rec["title"],
+        "steps": format_instructions(rec["instructions"]),
+        "picture_link": rec["picture_link"],
+    }
+
+
+def ingredient_weights(pantry_ingredients, expiry_info):
+    """
+    Weight each ingredient by how soon it expires:
+    Weight = 1.0 + bonus, where bonus = (30 - days_left)/30 if days_left < 30 else 0.
+    This yields a weight between 1.0 and 2.0 for items that have not expired yet.
+    """
+    days_left = np.array(
+        [expiry_info.get(ing, 30) for ing in pantry_ingredients],  # default 30 if not found
+        dtype=np.float64,
+    )
+    return 1.0 + np.where(days_left < 30, (30 - days_left) / 30.0, 0.0)
+
+
+def query_texts(vectorizer, pantry_ingredients):
+    """
+    The text to vectorize for each pantry name. A name whose words are all
+    in the vocabulary is used as typed, so clean names ("fresh basil") rank
+    as they would without normalization; only names with words the
+    vocabulary lacks (typos, label noise such as "1gal") are replaced by
+    their canonical form.
+    """
+    analyze = vectorizer.build_analyzer()
+    vocabulary = vectorizer.vocabulary_
+    return [
+        name if all(token in vocabulary for token in analyze(name)) else canonicalize(name).text
+        for name in pantry_ingredients
+    ]
+
+
+def build_query_vector(pantry_ingredients, expiry_info, vectorizer=None):
+    """
+    Average of the ingredients' TF-IDF vectors, weighted by ingredient_weights().
+
+    All ingredients are vectorized in one transform() call and combined with a
+    single (1 x n) @ (n x vocab) sparse product instead of a Python-level sum.
+    vectorizer is that of the index snapshot the query will be scored against
+    (default: the current one).
+    """
+    if vectorizer is None:
+        vectorizer = get_index().vectorizer
+    if not pantry_ingredients:
+        return vectorizer.transform([""])
+
+    weights = ingredient_weights(pantry_ingredients, expiry_info)
+    # Names with unknown words are normalized: label noise dropped, typos fixed
+    ingredient_vectors = vectorizer.transform(query_texts(vectorizer, pantry_ingredients))
+    return (sp.csr_matrix(weights) @ ingredient_vectors) / len(pantry_ingredients)
+
+
+@timed("recommend_recipes")
+def recommend_recipes(pantry_ingredients, expiry_info, top_n=10, approximate=False, index=None):
     """
     Build a weighted query vector by computing each ingredient’s TF-IDF vector,
     scaled by a weight that gives extra emphasis to ingredients expiring soon.
-    Then, average these vectors and compute cosine similarity against all recipes.
+    Then, average these vectors and rank recipes by cosine similarity to it.
 
     pantry_ingredients: list of ingredient names, e.g. ["mutton", "chicken", ...]
     expiry_info: dict mapping ingredient to days until expiry, e.g. {"mutton": 2, "chicken": 10}
     top_n: number of recipes to return.
+    approximate: search through the ANN structure (recipe_ann) instead of
+        scoring every recipe that shares a term with the query.
+    index: the index snapshot to use throughout (default: the current one).
+        A merge can swap snapshots at any time, and a query vector built with
+        one vocabulary must not be scored against another's matrix.
     """
-    # For each ingredient, calculate a weight:
-    # Weight = 1.0 + bonus, where bonus = (30 - days_left)/30 if days_left < 30 else 0.
-    # This yields a weight between 1.0 and 2.0.
-
-    weighted_vectors = []
-    for ing in pantry_ingredients:
-        days_left = expiry_info.get(ing, 30)  # default 30 if not found
-        bonus = (30 - days_left) / 30.0 if days_left < 30 else 0.0
-        weight = 1.0 + bonus
-        vec = vectorizer.transform([ing])
-        weighted_vectors.append(weight * vec)
-
-    # Compute the average weighted query vector.
-    if weighted_vectors:
-        query_vec = sum(weighted_vectors) / len(weighted_vectors)
-    else:
-        query_vec = vectorizer.transform([""])
+    if index is None:
+        index = get_index()
+    with span("tfidf_query_vector"):
+        query_vec = build_query_vector(pantry_ingredients, expiry_info, index.vectorizer)
+
+    with span("ann_search" if approximate else "tfidf_search"):
+        top_indices = index.search(query_vec, top_n, approximate=approximate)
+    return [format_recipe(rec) for rec in index.records(top_indices)]
+
 
-    similarities = cosine_similarity(query_vec, recipe_vectors).flatten()
-    top_indices = np.argsort(similarities)[::-1][:top_n]
-    recs = recipes.iloc[top_indices].copy()
-    recs["steps"] = recs["instructions"].apply(format_instructions)
-    return recs[["title", "steps", "picture_link"]].to_dict(orient="records")
+@timed("recommend_from_pantry")
+def recommend_from_pantry(pantry_ingredients, top_n=10, index=None):
+    """
+    "Cook with what I have": rank recipes by how many of their ingredients the
+    pantry already covers, using the inverted ingredient index. Only recipes
+    sharing an ingredient with the pantry are considered.
+
+    Recipes with the fewest missing ingredients come first, then those with the
+    highest coverage (fraction of their ingredients found in the pantry).
+    index: the index snapshot to use (default: the current one).
+    """
+    if index is None:
+        index = get_index()
+    matches = index.match(canonical_names(pantry_ingredients), top_n)
+    records = index.records([row for row, _, _, _ in matches])
+    recs = []
+    for rec, (_, matched, missing, coverage) in zip(records, matches):
+        rec = format_recipe(rec)
+        rec["matched_count"] = matched
+        rec["missing_count"] = missing
+        rec["coverage"] = round(coverage, 3)
+        recs.append(rec)
+    return recs
@@ -0,0 +1,100 @@
+"""Per-user cache of /recipe/get-recipes results.
+
+Entries are stored per (user, mode) together with a fingerprint of the
+pantry they were computed from: a hash of the item names plus a coarse
+expiry bucket for each, and the version of the recipe index. A cached
+ranking is only served while the pantry still has the same fingerprint,
+so any change that could move the ranking (an item added, removed,
+renamed, or crossing an expiry bucket as days pass, or a recipe update)
+is a miss, in every worker process.
+
+The pantry blueprint also invalidates a user's entries after each
+write, which frees them immediately in the process that handled it.
+
+By default the cache is an in-process TTLCache. Setting
+RECOMMENDATION_CACHE_URL (e.g. redis://localhost:6379/0) shares it
+between workers through Redis instead.
+"""
+import hashlib
+import os
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional
+
+from cache import RedisCache, TTLCache
+
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "1024"))
+RECOMMENDATION_CACHE_TTL = float(os.getenv("RECOMMENDATION_CACHE_TTL", "3600"))
+RECOMMENDATION_CACHE_URL = os.getenv("RECOMMENDATION_CACHE_URL")
+
+# Modes of /recipe/get-recipes; results are cached per user and mode
+RECOMMENDATION_MODES = ("similarity", "pantry", "ann")
+
+# Days-left bucket boundaries: expired | 0-2 | 3-6 | 7-13 | 14-29 | 30+ (or unknown)
+EXPIRY_BUCKET_EDGES = (0, 3, 7, 14, 30)
+
+
+def _make_cache():
+    if RECOMMENDATION_CACHE_URL:
+        try:
+            return RedisCache(
+                RECOMMENDATION_CACHE_URL,
+                ttl=RECOMMENDATION_CACHE_TTL,
+                prefix="fridgepilot:recommendations:",
+            )
+        except Exception as e:
+            print(f"Falling back to in-process recommendation cache: {e}")
+    return TTLCache(RECOMMENDATION_CACHE_SIZE, RECOMMENDATION_CACHE_TTL)
+
+
+recommendation_cache = _make_cache()
+
+
+def expiry_bucket(days_left: Optional[int]) -> int:
+    """Coarse urgency bucket for a days-until-expiry value."""
+    if days_left is None:
+        return len(EXPIRY_BUCKET_EDGES)
+    return bisect_right(EXPIRY_BUCKET_EDGES, days_left)
+
+
+def pantry_fingerprint(
+    pantry: List[str], expiry_info: Dict[str, int], top_n: int, index_version: str = ""
+) -> str:
+    """Order-independent hash of a pantry's item names and expiry buckets.
+
+    index_version identifies the recipe index snapshot, so rankings from
+    before a recipe update are not served after it.
+    """
+    entries = sorted(
+        f"{name}\x1f{expiry_bucket(expiry_info.get(name))}" for name in pantry
+    )
+    digest = hashlib.sha256(f"{top_n}\x1e{index_version}\x1e".encode("utf-8"))
+    for entry in entries:
+        digest.update(entry.encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def _key(user_id: str, mode: str) -> str:
+    return f"{mode}:{user_id}"
+
+
+def get_recommendations(user_id: str, mode: str, fingerprint: str) -> Optional[List[Any]]:
+    """Cached recommendations for this pantry fingerprint, or None."""
+    cached = recommendation_cache.get(_key(user_id, mode))
+    if cached is None or cached[0] != fingerprint:
+        return None
+    return cached[1]
+
+
+def set_recommendations(
+    user_id: str, mode: str, fingerprint: str, recommendations: List[Any]
+) -> None:
+    recommendation_cache.set(_key(user_id, mode), (fingerprint, recommendations))
+
+
+def invalidate_recommendations(user_id: Optional[str]) -> None:
+    """Drop a user's cached recommendations (call after pantry writes)."""
+    if not user_id:
+        return
+    for mode in RECOMMENDATION_MODES:
+        recommendation_cache.delete(_key(user_id, mode))
@@ -14,5 +14,8 @@ pip install wheel
 pip install numpy==1.24.3
 pip install -r requirements.txt
 
+echo "Applying database migrations..."
+python migrations.py upgrade
+
 echo "Starting the server..."
 python app.py 
\ No newline at end of file
@@ -11,5 +11,8 @@ source venv/bin/activate
 echo "Installing dependencies..."
 pip install -r requirements.txt
 
+echo "Applying database migrations..."
+python migrations.py upgrade
+
 echo "Starting the server..."
 python app.py 
\ No newline at end of file
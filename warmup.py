@@ -0,0 +1,102 @@
+"""Warm-up of heavy resources and readiness reporting.
+
+Importing the app no longer loads the shelf-life model, the recipe index
+or the FoodKeeper data; each is loaded on first use. APP_WARMUP decides
+when that first use happens:
+
+- "background" (default): a daemon thread loads them right after import,
+  so the worker answers /healthz (and anything not needing them) at once
+  and /readyz turns 200 when loading is done.
+- "eager": load them during import, before serving (what the app used to
+  do; also the mode to use when preloading in a gunicorn master).
+- "lazy": never warm up; the first request needing a resource pays for it.
+
+A resource that fails to load is reported by /readyz but does not keep
+the instance unready: the endpoints using it degrade on their own.
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+APP_WARMUP = os.getenv("APP_WARMUP", "background").lower()
+
+
+def _shelf_life_model():
+    import prediction
+    if prediction.get_model() is None:
+        raise RuntimeError("shelf-life model not available")
+
+
+def _recipe_index():
+    import recipes_recommender
+    recipes_recommender.get_index()
+
+
+def _foodkeeper():
+    import foodkeeper
+    if foodkeeper.get_index() is None:
+        raise RuntimeError("FoodKeeper data not available")
+
+
+def _normalizer():
+    import normalize
+    normalize.get_normalizer()
+
+
+# The normalizer indexes the vocabularies of the other three, so it goes last
+TASKS: List[Tuple[str, Callable[[], Any]]] = [
+    ("recipe_index", _recipe_index),
+    ("shelf_life_model", _shelf_life_model),
+    ("foodkeeper", _foodkeeper),
+    ("normalizer", _normalizer),
+]
+
+_lock = threading.Lock()
+_status: Dict[str, Dict[str, Any]] = {name: {"state": "pending"} for name, _ in TASKS}
+_done = threading.Event()
+_started = False
+
+
+def _run() -> None:
+    for name, task in TASKS:
+        start = time.perf_counter()
+        try:
+            task()
+            entry = {"state": "ready"}
+        except Exception as e:
+            print(f"Warm-up of {name} failed: {e}")
+            entry = {"state": "failed", "error": str(e)}
+        entry["seconds"] = round(time.perf_counter() - start, 3)
+        with _lock:
+            _status[name] = entry
+    _done.set()
+
+
+def start(mode: str = None) -> None:
+    """Start warming up according to mode (default APP_WARMUP). Idempotent."""
+    global _started
+    mode = mode or APP_WARMUP
+    with _lock:
+        if _started:
+            return
+        _started = True
+    if mode == "eager":
+        _run()
+    elif mode == "lazy":
+        with _lock:
+            for entry in _status.values():
+                entry["state"] = "lazy"
+        _done.set()
+    else:
+        threading.Thread(target=_run, name="warmup", daemon=True).start()
+
+
+def is_ready() -> bool:
+    return _done.is_set()
+
+
+def status() -> Dict[str, Dict[str, Any]]:
+    """Per-resource warm-up state: pending, ready, failed or lazy."""
+    with _lock:
+        return {name: dict(entry) for name, entry in _status.items()}